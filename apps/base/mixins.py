@@ -1,3 +1,22 @@
+import hashlib
+import json
+
+from django.utils.cache import (
+    get_conditional_response,
+)
+from rest_framework.exceptions import (
+    ValidationError,
+)
+from django.utils.http import (
+    http_date,
+    quote_etag,
+)
+
+from .utils import (
+    CacheVersionUtil,
+)
+
+
 class GetSerializerClassMixin:
 
     def get_serializer_class(self):
@@ -5,3 +24,130 @@ class GetSerializerClassMixin:
             return self.serializer_action_classes[self.action]
         except (KeyError, AttributeError):
             return super().get_serializer_class()
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified for `list` and `retrieve`.\n
+    Both are derived from the change counters of `conditional_collections`
+    (see CacheVersionUtil) and the request URL, so `304 Not Modified`
+    is answered without touching the queryset or the serializer.
+    """
+
+    conditional_collections = ()
+
+    def get_conditional_collections(self):
+        return self.conditional_collections
+
+    def get_etag(self, request) -> str:
+        versions = [
+            CacheVersionUtil.get_version(collection)
+            for collection in self.get_conditional_collections()
+        ]
+        return quote_etag(hashlib.md5(json.dumps([
+            versions,
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ]).encode('utf8')).hexdigest())
+
+    def get_last_modified(self):
+        timestamps = [
+            CacheVersionUtil.get_last_modified(collection)
+            for collection in self.get_conditional_collections()
+        ]
+        if None in timestamps or not timestamps:
+            return None
+        return int(max(timestamps))
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified()
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class SparseFieldsetMixin:
+    """`?fields=a,b` for `list` and `retrieve`.\n
+    Drives both the serializer fields (the serializer must use
+    SparseFieldsetSerializerMixin) and `QuerySet.only()`, so columns that
+    are not serialized are never read. Without `?fields` the action's
+    `default_fieldsets` entry is used, or else all the serializer fields.
+    """
+
+    fields_query_param = 'fields'
+    sparse_fieldset_actions = ('list', 'retrieve')
+    default_fieldsets = {}
+
+    def get_fieldset(self):
+        if self.action not in self.sparse_fieldset_actions:
+            return None
+
+        if not hasattr(self, '_fieldset'):
+            value = self.request.query_params.get(self.fields_query_param)
+            if value:
+                fieldset = tuple(dict.fromkeys(
+                    name.strip() for name in value.split(',') if name.strip()
+                ))
+                unknown = set(fieldset) - set(self.get_available_fields())
+                if unknown:
+                    raise ValidationError({
+                        self.fields_query_param:
+                            f'unknown fields: {", ".join(sorted(unknown))}'
+                    })
+            else:
+                fieldset = self.default_fieldsets.get(self.action)
+            self._fieldset = fieldset
+
+        return self._fieldset
+
+    def get_available_fields(self):
+        return self.get_serializer_class()().fields
+
+    def get_fieldset_columns(self, model, fieldset):
+        serializer_fields = self.get_available_fields()
+        if fieldset is None:
+            fieldset = serializer_fields
+
+        concrete_fields = {field.name for field in model._meta.concrete_fields}
+        sources = [
+            serializer_fields[name].source.split('.')[0] for name in fieldset
+        ]
+        # the paginator reads the ordering fields of the boundary rows
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        sources += [order.lstrip('-') for order in ordering]
+        return {model._meta.pk.name} | {
+            source for source in sources if source in concrete_fields
+        }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.sparse_fieldset_actions:
+            queryset = queryset.only(*self.get_fieldset_columns(
+                queryset.model, self.get_fieldset()
+            ))
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fieldset()
+        return context
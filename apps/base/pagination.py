@@ -0,0 +1,148 @@
+import json
+
+from django.db.models import (
+    Q,
+)
+
+from rest_framework.exceptions import (
+    NotFound,
+)
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    _reverse_ordering,
+)
+from rest_framework.utils.urls import (
+    remove_query_param,
+)
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque cursor pagination over a composite, unique ordering.\n
+    Unlike `CursorPagination`, the cursor stores the values of all the
+    ordering fields of the boundary row, so every page is fetched with a
+    single keyset predicate (bounded on the leading ordering field, so it
+    is an index range scan) and no OFFSET.
+    The last ordering field must be unique (e.g. `id`) and none of the
+    ordering fields may be nullable.
+    """
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            values = self.decode_position(position)
+            queryset = queryset.filter(
+                self.get_keyset_filter(ordering, values)
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self._get_position_from_instance(
+                self.page[0], self.ordering
+            )
+        ))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values
+
+    @staticmethod
+    def get_keyset_filter(ordering, values):
+        """
+        (a, b) after (x, y) <=> a >= x AND (a > x OR (a == x AND b > y))
+        with `<` instead of `>` for descending fields; the redundant
+        `a >= x` bounds the index range scan (the OR alone can't), and
+        unlike a `(a, b) > (x, y)` row comparison it allows mixed directions
+        """
+        keyset_filter = Q()
+        equal_prefix = {}
+        for order, value in zip(ordering, values):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            keyset_filter |= Q(
+                **equal_prefix, **{f'{field_name}__{lookup}': value}
+            )
+            equal_prefix[field_name] = value
+
+        leading_order = ordering[0]
+        leading_lookup = 'lte' if leading_order.startswith('-') else 'gte'
+        return Q(**{
+            f'{leading_order.lstrip("-")}__{leading_lookup}': values[0]
+        }) & keyset_filter
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            values.append(str(value))
+
+        return json.dumps(values)
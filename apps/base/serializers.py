@@ -0,0 +1,10 @@
+class SparseFieldsetSerializerMixin:
+    """Keeps only the fields listed in `context['fields']` (if given)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
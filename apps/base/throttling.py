@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import (
+    cache,
+)
+
+from rest_framework.settings import (
+    api_settings,
+)
+from rest_framework.throttling import (
+    BaseThrottle,
+)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket per `throttle_scope` of the view and per identity,
+    kept in the shared cache (CACHES must be shared by all the workers,
+    or every worker gets a bucket of its own).\n
+    Rates come from `REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']`
+    (`"<<capacity>>/<<s|m|h|d>>"`: a full bucket holds `capacity` tokens
+    and refills at `capacity` per period) under
+    `<<throttle_scope>><<rate_suffix>>`; scopes without a rate are not
+    throttled.\n
+    The bucket is stored as the time its level gets back to full (in
+    microseconds, GCRA style): taking a token is an atomic `incr` of that
+    time by the refill interval of one token, and the request is allowed
+    while the time stays within one period from now. A denied request
+    gives its token back with `decr`, so it is not counted. An idle
+    bucket (whose time is in the past) is restarted full with `set`;
+    requests racing on that restart may get up to one extra token each.
+    Denied identities are also remembered in-process until a token is
+    refilled, so bursts are rejected without a cache round trip.
+    """
+
+    KEY_PREFIX = 'throttle'
+    PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+    # of a bucket restarted full, longer than any period
+    KEY_TIMEOUT = 2 * 24 * 60 * 60
+
+    rate_suffix = ''
+
+    LOCAL_MAX_SIZE = 10000
+    _denied_until = {}
+    _lock = threading.Lock()
+
+    def get_bucket_ident(self, request, view):
+        """
+        Identity the bucket belongs to, None to skip throttling
+        """
+        raise NotImplementedError('.get_bucket_ident() must be overridden')
+
+    @classmethod
+    def parse_rate(cls, rate: str) -> tuple:
+        """
+        `(capacity, period in seconds)`
+        """
+        capacity, period = rate.split('/')
+        return int(capacity), cls.PERIODS[period[0]]
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(
+            f'{scope}{self.rate_suffix}'
+        )
+        return None if rate is None else self.parse_rate(rate)
+
+    def get_key(self, view, ident) -> str:
+        digest = hashlib.sha256(str(ident).encode('utf8')).hexdigest()
+        return f'{self.KEY_PREFIX}:{view.throttle_scope}{self.rate_suffix}' \
+               f':{digest}'
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+        ident = self.get_bucket_ident(request, view)
+        if ident is None:
+            return True
+
+        key = self.get_key(view, ident)
+        now = time.time()
+
+        with self._lock:
+            denied_until = self._denied_until.get(key)
+        if denied_until is not None:
+            if denied_until > now:
+                self.wait_seconds = denied_until - now
+                return False
+            with self._lock:
+                self._denied_until.pop(key, None)
+
+        capacity, period = rate
+        now_us = int(now * 1000000)
+        period_us = period * 1000000
+        # rounded up: never more than `capacity` tokens per period
+        interval_us = -(-period_us // capacity)
+
+        full_at = self.take(key, interval_us, now_us)
+        if full_at - now_us <= period_us:
+            return True
+
+        # not counted
+        cache.decr(key, interval_us)
+        self.wait_seconds = (full_at - period_us - now_us) / 1000000
+        self.remember_denied(key, now + self.wait_seconds)
+        return False
+
+    @classmethod
+    def take(cls, key: str, interval_us: int, now_us: int) -> int:
+        """
+        Takes a token, returns the time the bucket is full again
+        """
+        try:
+            full_at = cache.incr(key, interval_us)
+        except ValueError:
+            full_at = None
+
+        if full_at is None or full_at - interval_us < now_us:
+            # missing or idle: a full bucket, minus this token
+            full_at = now_us + interval_us
+            cache.set(key, full_at, timeout=cls.KEY_TIMEOUT)
+
+        return full_at
+
+    @classmethod
+    def remember_denied(cls, key: str, until: float):
+        with cls._lock:
+            if len(cls._denied_until) >= cls.LOCAL_MAX_SIZE:
+                now = time.time()
+                for expired_key in [k for k, v in cls._denied_until.items()
+                                    if v <= now]:
+                    del cls._denied_until[expired_key]
+                if len(cls._denied_until) >= cls.LOCAL_MAX_SIZE:
+                    cls._denied_until.clear()
+            cls._denied_until[key] = until
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per client IP, rate `<<throttle_scope>>`."""
+
+    def get_bucket_ident(self, request, view):
+        return self.get_ident(request)
+
+
+class AccountTokenBucketThrottle(TokenBucketThrottle):
+    """Bucket per account, rate `<<throttle_scope>>_account`:
+    the authenticated user, or the email / username being logged into or
+    registered (read from the request body, no DB access).
+    """
+
+    rate_suffix = '_account'
+    ACCOUNT_FIELDS = ('username', 'email')
+
+    def get_bucket_ident(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.id}'
+
+        if not hasattr(request.data, 'get'):
+            return None
+        for field in self.ACCOUNT_FIELDS:
+            value = request.data.get(field)
+            if isinstance(value, str) and value:
+                return f'{field}:{value.strip().lower()}'
+
+        return None
@@ -1,3 +1,6 @@
 # flake8:noqa
 
-from .image_tag_util import ImageTagUtil
\ No newline at end of file
+from .cache_version_util import CacheVersionUtil
+from .image_tag_util import ImageTagUtil
+from .stream_util import StreamUtil
+from .upsert_util import UpsertUtil
@@ -0,0 +1,77 @@
+import time
+
+from django.core.cache import (
+    cache,
+)
+from django.db import (
+    transaction,
+)
+from django.db.models import (
+    Model,
+)
+
+
+class CacheVersionUtil:
+    """Per-collection change counters kept in the shared cache.\n
+    Cached data derived from a collection is stored under a key containing
+    the collection version, so bumping the version invalidates it on every
+    worker at once.
+    """
+
+    KEY_PREFIX = 'collection_version'
+
+    @classmethod
+    def get_key(cls, collection: str) -> str:
+        return f'{cls.KEY_PREFIX}:{collection}'
+
+    @staticmethod
+    def get_initial_version() -> int:
+        # an evicted counter must never restart from an already used value
+        return int(time.time() * 1000)
+
+    @classmethod
+    def get_version(cls, collection: str) -> int:
+        key = cls.get_key(collection)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, cls.get_initial_version(), timeout=None)
+            version = cache.get(key)
+
+        return version
+
+    @classmethod
+    def get_last_modified(cls, collection: str):
+        """
+        Timestamp of the last bump, None if unknown
+        """
+        return cache.get(f'{cls.get_key(collection)}:modified')
+
+    @classmethod
+    def bump_now(cls, collection: str) -> int:
+        key = cls.get_key(collection)
+        cache.set(f'{key}:modified', time.time(), timeout=None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, cls.get_initial_version(), timeout=None)
+            return cache.get(key)
+
+    @classmethod
+    def bump(cls, collection: str):
+        """
+        Bumps the version once the current transaction is committed,
+        so that nobody caches pre-commit data under the new version
+        """
+        transaction.on_commit(lambda: cls.bump_now(collection))
+
+    @staticmethod
+    def get_model_collection(model: Model) -> str:
+        return model._meta.label_lower
+
+    @classmethod
+    def get_model_version(cls, model: Model) -> int:
+        return cls.get_version(cls.get_model_collection(model))
+
+    @classmethod
+    def bump_model(cls, model: Model):
+        cls.bump(cls.get_model_collection(model))
@@ -0,0 +1,134 @@
+import csv
+import json
+from collections import (
+    deque,
+)
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
+from itertools import (
+    islice,
+)
+from typing import (
+    IO,
+    Callable,
+    Iterable,
+    Iterator,
+)
+
+
+class InvalidRow:
+    """What `StreamUtil.read_rows` yields for a line it can't decode, so
+    that the error is reported with the row number and reading goes on.
+    """
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+class StreamUtil:
+    """Constant memory CSV / JSON Lines reading and writing"""
+
+    FORMAT_CSV = 'csv'
+    FORMAT_JSONL = 'jsonl'
+    FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+
+    @classmethod
+    def get_format(cls, path: str, format_: str = None) -> str:
+        """
+        Explicit format or the one of the file extension
+        """
+        if format_ is None:
+            format_ = path.rsplit('.', 1)[-1].lower() if path else ''
+        if format_ == 'json':
+            format_ = cls.FORMAT_JSONL
+        if format_ not in cls.FORMATS:
+            raise ValueError(f'unknown format: {format_}')
+        return format_
+
+    @classmethod
+    def read_rows(cls, file: IO, format_: str) -> Iterator[dict]:
+        """
+        Rows as read: check them with `check_row`
+        (an undecodable JSON line is an InvalidRow)
+        """
+        if format_ == cls.FORMAT_CSV:
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield InvalidRow(f'invalid JSON: {e}')
+
+    @staticmethod
+    def check_row(row) -> dict:
+        """
+        The row, raises ValueError unless it is an object
+        """
+        if isinstance(row, InvalidRow):
+            raise ValueError(row.error)
+        if not isinstance(row, dict):
+            raise ValueError('row must be an object')
+        return row
+
+    @staticmethod
+    def get_text(row: dict, field: str) -> str:
+        """
+        The field's string value, '' if missing or null;
+        raises ValueError for other JSON values
+        """
+        value = row.get(field)
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            raise ValueError(f'{field} must be a string')
+        return value
+
+    @classmethod
+    def write_rows(cls, file: IO, format_: str, fieldnames: tuple,
+                   rows: Iterable[dict]) -> int:
+        count = 0
+        if format_ == cls.FORMAT_CSV:
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False, default=str))
+                file.write('\n')
+                count += 1
+
+        return count
+
+    @staticmethod
+    def batched(iterable: Iterable, size: int) -> Iterator[list]:
+        iterator = iter(iterable)
+        batch = list(islice(iterator, size))
+        while batch:
+            yield batch
+            batch = list(islice(iterator, size))
+
+    @staticmethod
+    def parallel_map(function: Callable, iterable: Iterable,
+                     workers: int) -> Iterator:
+        """
+        Ordered `map` over a process pool, with at most `2 * workers` items
+        in flight so that the input is consumed lazily
+        (unlike `Executor.map` and `Pool.imap`)
+        """
+        if workers <= 1:
+            yield from map(function, iterable)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+            for item in iterable:
+                futures.append(executor.submit(function, item))
+                if len(futures) >= 2 * workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
@@ -0,0 +1,107 @@
+from django.db import (
+    IntegrityError,
+    connection,
+    transaction,
+)
+from django.db.models import (
+    F,
+    Model,
+)
+
+
+class UpsertUtil:
+    """Set-based "insert or increment" for models with a unique key.\n
+    PostgreSQL and SQLite (3.24+) get a single
+    `INSERT ... ON CONFLICT (key) DO UPDATE SET f = f + EXCLUDED.f`
+    statement, other backends fall back to UPDATE-then-INSERT per row.
+    """
+
+    UPSERT_VENDORS = ('postgresql', 'sqlite')
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def get_db_value(value):
+        # model instances are stored by their primary key
+        return getattr(value, 'pk', value)
+
+    @classmethod
+    def upsert_increment(cls, model: Model, key_fields: tuple, rows: list,
+                         increment_fields: tuple, insert_fields: tuple = ()):
+        """
+        rows: `[{field name: value}]` with all of `key_fields`,
+        `increment_fields` and `insert_fields` (stored only on insert);
+        `key_fields` must be unique together
+        """
+        if not rows:
+            return
+
+        if connection.vendor in cls.UPSERT_VENDORS:
+            for start in range(0, len(rows), cls.BATCH_SIZE):
+                cls._upsert_increment_sql(
+                    model, key_fields, rows[start:start + cls.BATCH_SIZE],
+                    increment_fields, insert_fields
+                )
+        else:
+            cls._upsert_increment_orm(
+                model, key_fields, rows, increment_fields, insert_fields
+            )
+
+    @classmethod
+    def _upsert_increment_sql(cls, model, key_fields, rows, increment_fields,
+                              insert_fields):
+        qn = connection.ops.quote_name
+        meta = model._meta
+        table = qn(meta.db_table)
+        field_names = (*key_fields, *increment_fields, *insert_fields)
+        columns = [qn(meta.get_field(name).column) for name in field_names]
+        key_columns = columns[:len(key_fields)]
+        increment_columns = \
+            columns[len(key_fields):len(key_fields) + len(increment_fields)]
+
+        row_placeholder = f'({", ".join(["%s"] * len(columns))})'
+        sql = (
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'VALUES {", ".join([row_placeholder] * len(rows))} '
+            f'ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET '
+            + ', '.join(
+                f'{column} = {table}.{column} + EXCLUDED.{column}'
+                for column in increment_columns
+            )
+        )
+        params = [
+            meta.get_field(name).get_db_prep_save(
+                cls.get_db_value(row[name]), connection
+            )
+            for row in rows for name in field_names
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @classmethod
+    def _upsert_increment_orm(cls, model, key_fields, rows, increment_fields,
+                              insert_fields):
+        attnames = {
+            name: model._meta.get_field(name).attname
+            for name in (*key_fields, *increment_fields, *insert_fields)
+        }
+        for row in rows:
+            key = {
+                attnames[name]: cls.get_db_value(row[name])
+                for name in key_fields
+            }
+            increments = {
+                name: F(name) + row[name] for name in increment_fields
+            }
+            with transaction.atomic():
+                if model.objects.filter(**key).update(**increments):
+                    continue
+                try:
+                    with transaction.atomic():
+                        model.objects.create(**key, **{
+                            attnames[name]: cls.get_db_value(row[name])
+                            for name in (*increment_fields, *insert_fields)
+                        })
+                except IntegrityError:
+                    # inserted concurrently
+                    model.objects.filter(**key).update(**increments)
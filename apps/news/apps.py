@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class NewsConfig(AppConfig):
-    name = 'news'
+    name = 'apps.news'
+    label = 'news'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -24,6 +24,7 @@ class News(models.Model):
         upload_to='news_images/', null=True, blank=True
     )
     edit_logs = GenericRelation(LogEntry)
+    updated_at = models.DateTimeField('updated at', auto_now=True)
 
     def __str__(self):
         return f'News article: {self.title}'
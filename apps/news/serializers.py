@@ -11,6 +11,9 @@ from .models import (
     News,
     NewsImage,
 )
+from apps.base.serializers import (
+    SparseFieldsetSerializerMixin,
+)
 
 
 class NewsImageSerializer(ModelSerializer):
@@ -25,12 +28,12 @@ class LogEntrySerializer(ModelSerializer):
         fields = ('action_time', 'user', 'change_message')
 
 
-class NewsDetailSerializer(ModelSerializer):
+class NewsDetailSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     class Meta:
         model = News
         fields = (
             'news_id', 'title', 'description', 'content', 'main_image',
-            'images', 'edit_logs',
+            'images', 'edit_logs', 'updated_at',
         )
 
     news_id = IntegerField(source='id', read_only=True)
@@ -38,11 +41,11 @@ class NewsDetailSerializer(ModelSerializer):
     edit_logs = LogEntrySerializer(many=True, read_only=True)
 
 
-class NewsListSerializer(ModelSerializer):
+class NewsListSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     class Meta:
         model = News
         fields = (
-            'news_id', 'title', 'description', 'main_image',
+            'news_id', 'title', 'description', 'main_image', 'updated_at',
         )
 
     news_id = IntegerField(source='id')
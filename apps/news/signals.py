@@ -0,0 +1,33 @@
+from django.contrib.admin.models import (
+    LogEntry,
+)
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.dispatch import (
+    receiver,
+)
+
+from .models import (
+    News,
+    NewsImage,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
+)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=NewsImage)
+@receiver(post_delete, sender=NewsImage)
+def bump_news_version(sender, **kwargs):
+    CacheVersionUtil.bump_model(News)
+
+
+@receiver(post_save, sender=LogEntry)
+def bump_news_version_on_edit_log(sender, instance, **kwargs):
+    # edit logs are a part of the news detail
+    if instance.content_type.model_class() is News:
+        CacheVersionUtil.bump_model(News)
@@ -1,3 +1,45 @@
-from django.test import TestCase  # noqa
+from django.core.cache import (
+    cache,
+)
+from django.test import (
+    TransactionTestCase,
+)
+from rest_framework.test import (
+    APIClient,
+)
 
-# Create your tests here.
+from apps.news.models import (
+    News,
+)
+
+
+class NewsConditionalGetTestCase(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.news = News.objects.create(
+            title='title', description='description', content='<p>c</p>'
+        )
+
+    def test_unchanged_news_are_not_modified(self):
+        for url in ('/news/', f'/news/{self.news.id}/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+                with self.assertNumQueries(0):
+                    not_modified = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_added_news_are_modified(self):
+        etag = self.client.get('/news/')['ETag']
+
+        News.objects.create(
+            title='other', description='description', content='<p>c</p>'
+        )
+
+        response = self.client.get('/news/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
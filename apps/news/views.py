@@ -16,11 +16,19 @@ from .serializers import (
     NewsDetailSerializer,
     NewsListSerializer,
 )
+from apps.base.pagination import (
+    KeysetPagination,
+)
 from apps.base.permissions import (
     IsReadOnlyPermission,
 )
 from apps.base.mixins import (
+    ConditionalGetMixin,
     GetSerializerClassMixin,
+    SparseFieldsetMixin,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
 )
 from apps.user.permissions import (
     IsAdminPermission,
@@ -28,13 +36,17 @@ from apps.user.permissions import (
 )
 
 
-class NewsViewSet(GetSerializerClassMixin, ModelViewSet):
+class NewsViewSet(ConditionalGetMixin,
+                  SparseFieldsetMixin,
+                  GetSerializerClassMixin,
+                  ModelViewSet):
     permission_classes = (
         IsReadOnlyPermission | IsAdminPermission | IsModeratorPermission,
     )
 
     filter_backends = (rf_filters.DjangoFilterBackend,)
     filterset_class = NewsSearchFilterSet
+    pagination_class = KeysetPagination
 
     serializer_class = NewsDetailSerializer
     serializer_action_classes = {
@@ -42,3 +54,5 @@ class NewsViewSet(GetSerializerClassMixin, ModelViewSet):
     }
 
     queryset = News.objects.all()
+
+    conditional_collections = (CacheVersionUtil.get_model_collection(News),)
@@ -5,9 +5,16 @@ from .forms import (
 )
 from .models import (
     Category,
+    CategorySalesDaily,
     Order,
     OrderProductM2M,
     Product,
+    ProductSalesDaily,
+    ProductStockShard,
+)
+from .utils import (
+    OrderStatusUtil,
+    OrderTotalsUtil,
 )
 
 
@@ -20,9 +27,78 @@ class OrderAdmin(admin.ModelAdmin):
     model = Order
     form = OrderForm
     inlines = (OrderProductM2MInline,)
-    readonly_fields = ('status',)
+    readonly_fields = ('status', 'total', 'item_count', 'created_at',
+                       'updated_at')
+    actions = ('close_orders',)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        OrderTotalsUtil.refresh([form.instance.id])
+
+    def close_orders(self, request, queryset):
+        outcomes = OrderStatusUtil.close(
+            queryset.values_list('id', flat=True)
+        )
+        self.message_user(
+            request,
+            f'{len(outcomes[OrderStatusUtil.UPDATED])} orders closed, '
+            f'{len(outcomes[OrderStatusUtil.WRONG_STATUS])} were not paid.'
+        )
+    close_orders.short_description = 'Close selected paid orders'
+
+
+class ProductStockShardInline(admin.TabularInline):
+    """Shards are added and removed by StockUtil.set_stock."""
+
+    model = ProductStockShard
+    extra = 0
+    can_delete = False
+    readonly_fields = ('shard', 'stock')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class ProductAdmin(admin.ModelAdmin):
+    """The stock is set with the set_product_stock command
+    (StockUtil.set_stock).
+    """
+
+    model = Product
+    inlines = (ProductStockShardInline,)
+    readonly_fields = ('stock', 'stock_shard_count')
+
+
+class SalesDailyAdmin(admin.ModelAdmin):
+    """Read-only rollup rows, written by SalesRollupUtil."""
+
+    date_hierarchy = 'day'
+    ordering = ('-day', '-revenue')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ProductSalesDailyAdmin(SalesDailyAdmin):
+    list_display = ('day', 'product', 'units', 'revenue', 'order_count')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+
+
+class CategorySalesDailyAdmin(SalesDailyAdmin):
+    list_display = ('day', 'category', 'units', 'revenue')
+    list_select_related = ('category',)
+    list_filter = ('category',)
 
 
 admin.site.register(Category)
 admin.site.register(Order, OrderAdmin)
-admin.site.register(Product)
+admin.site.register(Product, ProductAdmin)
+admin.site.register(ProductSalesDaily, ProductSalesDailyAdmin)
+admin.site.register(CategorySalesDaily, CategorySalesDailyAdmin)
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class ShopConfig(AppConfig):
-    name = 'shop'
+    name = 'apps.shop'
+    label = 'shop'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -3,9 +3,30 @@ from rest_framework.exceptions import (
 )
 from rest_framework.status import (
     HTTP_400_BAD_REQUEST,
+    HTTP_409_CONFLICT,
 )
 
 
 class NonPositiveCountException(APIException):
     status_code = HTTP_400_BAD_REQUEST
     default_detail = 'resulting count must be positive'
+
+
+class EmptyCartException(APIException):
+    status_code = HTTP_400_BAD_REQUEST
+    default_detail = 'cart is empty'
+
+
+class CartLimitException(APIException):
+    status_code = HTTP_400_BAD_REQUEST
+    default_detail = 'too many products in the cart'
+
+
+class OutOfStockException(APIException):
+    status_code = HTTP_409_CONFLICT
+    default_detail = 'not enough stock'
+
+    def __init__(self, product_ids: list):
+        super().__init__()
+        # set directly, APIException would turn the ids into strings
+        self.detail = {'detail': self.detail, 'product_ids': product_ids}
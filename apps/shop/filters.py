@@ -1,10 +1,22 @@
+from django.db.models import (
+    Exists,
+    OuterRef,
+)
 from django_filters import (
+    DateFilter,
     FilterSet,
+    IsoDateTimeFilter,
     NumberFilter,
     CharFilter,
 )
 from django.forms.fields import IntegerField, CharField
 
+from .models import (
+    Category,
+)
+from .utils import (
+    ProductSearchUtil,
+)
 from apps.base.filters import (
     MultipleValueFilter,
 )
@@ -23,6 +35,31 @@ class ProductFilterSet(FilterSet):
     category = MultipleValueFilter(
         field_class=CharField, field_name='category', lookup_expr='id__in'
     )
+    category_tree = MultipleValueFilter(
+        field_class=IntegerField, method='filter_category_tree'
+    )
+    search = CharFilter(
+        method='perform_search'
+    )
+
+    @staticmethod
+    def filter_category_tree(queryset, name, value):
+        """
+        Products of the given categories and all of their descendants,
+        as a single `lft`/`rght` range predicate per subtree
+        """
+        return queryset.filter(Exists(
+            Category.objects.filter(
+                id__in=value,
+                tree_id=OuterRef('category__tree_id'),
+                lft__lte=OuterRef('category__lft'),
+                rght__gte=OuterRef('category__rght'),
+            )
+        ))
+
+    @staticmethod
+    def perform_search(queryset, name, value):
+        return ProductSearchUtil.search(queryset, value)
 
 
 class CategoryFilterSet(FilterSet):
@@ -35,11 +72,71 @@ class CategoryFilterSet(FilterSet):
 
     @staticmethod
     def filter_descendants(queryset, name, value):
-        return queryset.filter(**{name: value}) \
-            .get_descendants(include_self=False)
+        return queryset.filter(Exists(
+            Category.objects.filter(**{
+                name: value,
+                'tree_id': OuterRef('tree_id'),
+                'lft__lt': OuterRef('lft'),
+                'rght__gt': OuterRef('rght'),
+            })
+        ))
 
 
 class UserFilterSet(FilterSet):
     user = MultipleValueFilter(
         field_class=IntegerField, field_name='user'
     )
+
+
+class OrderFilterSet(UserFilterSet):
+    status = MultipleValueFilter(
+        field_class=CharField, field_name='status'
+    )
+    created_after = IsoDateTimeFilter(
+        field_name='created_at', lookup_expr='gte'
+    )
+    created_before = IsoDateTimeFilter(
+        field_name='created_at', lookup_expr='lt'
+    )
+
+
+class SalesFilterSet(FilterSet):
+    date_from = DateFilter(
+        field_name='day', lookup_expr='gte', required=True
+    )
+    date_to = DateFilter(
+        field_name='day', lookup_expr='lte', required=True
+    )
+
+
+class ProductSalesFilterSet(SalesFilterSet):
+    product = MultipleValueFilter(
+        field_class=IntegerField, field_name='product'
+    )
+    category_tree = MultipleValueFilter(
+        field_class=IntegerField, method='filter_category_tree'
+    )
+
+    @staticmethod
+    def filter_category_tree(queryset, name, value):
+        """
+        Sales of the products of the given categories and all of their
+        descendants, as ProductFilterSet.filter_category_tree
+        """
+        return queryset.filter(Exists(
+            Category.objects.filter(
+                id__in=value,
+                tree_id=OuterRef('product__category__tree_id'),
+                lft__lte=OuterRef('product__category__lft'),
+                rght__gte=OuterRef('product__category__rght'),
+            )
+        ))
+
+
+class CategorySalesFilterSet(SalesFilterSet):
+    category = MultipleValueFilter(
+        field_class=IntegerField, field_name='category'
+    )
+    parent = NumberFilter(
+        field_name='category__parent'
+    )
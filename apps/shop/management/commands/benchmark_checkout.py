@@ -0,0 +1,161 @@
+import threading
+import time
+import uuid
+from decimal import (
+    Decimal,
+)
+
+from django.contrib.auth.hashers import (
+    make_password,
+)
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    connections,
+)
+
+from apps.shop.exceptions import (
+    OutOfStockException,
+)
+from apps.shop.models import (
+    Cart,
+    CartProductM2M,
+    Order,
+    OrderProductM2M,
+    Product,
+    ProductStockShard,
+)
+from apps.shop.utils import (
+    CheckoutUtil,
+    StockUtil,
+)
+from apps.user.models import (
+    User,
+)
+
+
+class Command(BaseCommand):
+    help = 'Checks out the carts of many throwaway users, all holding the ' \
+           'same product, from concurrent threads; reports checkouts per ' \
+           'second and verifies that the stock was never oversold. ' \
+           'Creates and removes its own data: run it against a ' \
+           'development PostgreSQL database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--stock', type=int, default=1000)
+        parser.add_argument('--shards', type=int, default=0,
+                            help='stock shards of the product, 0 for none')
+        parser.add_argument('--count', type=int, default=1,
+                            help='product count in every cart')
+
+    def handle(self, checkouts, threads, stock, shards, count, **options):
+        if min(checkouts, threads, count) < 1 or min(stock, shards) < 0:
+            raise CommandError('invalid arguments')
+
+        run_id = uuid.uuid4().hex
+        product = Product.objects.create(
+            name=f'benchmark-{run_id[:16]}', description='',
+            price=Decimal('1.00')
+        )
+        StockUtil.set_stock(product.id, stock, shards)
+        try:
+            users = self.create_users(run_id, checkouts, product, count)
+            statuses, elapsed = self.run_checkouts(users, threads)
+            self.report(product, stock, count, statuses, elapsed)
+        finally:
+            Order.objects.filter(
+                user__email__startswith=f'benchmark-{run_id}'
+            ).delete()
+            User.objects.filter(
+                email__startswith=f'benchmark-{run_id}'
+            ).delete()
+            product.delete()
+
+    @staticmethod
+    def create_users(run_id, checkouts, product, count) -> list:
+        password = make_password(None)
+        User.objects.bulk_create(
+            User(email=f'benchmark-{run_id}-{i}@example.invalid',
+                 password=password, is_active=True)
+            for i in range(checkouts)
+        )
+        users = list(User.objects.filter(
+            email__startswith=f'benchmark-{run_id}'
+        ))
+        Cart.objects.bulk_create(Cart(user=user) for user in users)
+        CartProductM2M.objects.bulk_create(
+            CartProductM2M(cart_id=cart_id, product=product,
+                           product_count=count)
+            for cart_id in Cart.objects.filter(
+                user__in=users
+            ).values_list('id', flat=True)
+        )
+
+        return users
+
+    @staticmethod
+    def run_checkouts(users, threads) -> tuple:
+        statuses = {}
+        lock = threading.Lock()
+
+        def checkout_users(users):
+            try:
+                for user in users:
+                    try:
+                        CheckoutUtil.checkout(user)
+                        status = 'ordered'
+                    except OutOfStockException:
+                        status = 'out of stock'
+                    except Exception as e:
+                        status = type(e).__name__
+                    with lock:
+                        statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                # the thread's own connection
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=checkout_users, args=(users[i::threads],))
+            for i in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return statuses, time.perf_counter() - started
+
+    def report(self, product, stock, count, statuses, elapsed):
+        attempts = sum(statuses.values())
+        self.stdout.write(
+            f'{attempts} checkouts in {elapsed:.2f}s '
+            f'({attempts / elapsed:.0f}/s), '
+            + ', '.join(f'{status}: {number}'
+                        for status, number in sorted(statuses.items()))
+        )
+
+        ordered = OrderProductM2M.objects.filter(product=product).count()
+        remaining = StockUtil.get_stock(product.id)
+        negative_shards = ProductStockShard.objects.filter(
+            product=product, stock__lt=0
+        ).count()
+        self.stdout.write(
+            f'stock: {stock} initial, {ordered * count} ordered, '
+            f'{remaining} remaining'
+        )
+
+        if remaining < 0 or negative_shards \
+                or ordered * count + remaining != stock \
+                or ordered != statuses.get('ordered', 0):
+            raise CommandError('stock and orders do not add up')
+        if stock >= attempts * count and ordered != attempts:
+            raise CommandError('checkouts failed with stock left')
+        self.stdout.write(self.style.SUCCESS(
+            'never oversold: ordered + remaining == initial stock, '
+            'remaining >= 0'
+        ))
@@ -0,0 +1,54 @@
+from django.core.management.base import (
+    BaseCommand,
+)
+
+from apps.shop.utils import (
+    ProductRecommendationUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Counts the product pairs of the orders closed since the last ' \
+           'run and rescores the "frequently bought together" ' \
+           'recommendations of their products and of these products\' ' \
+           'neighbours. With --metric lift, also run it with --rebuild ' \
+           'periodically: the lift values of the other products follow ' \
+           'the total order count of their last rescoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metric', choices=ProductRecommendationUtil.METRICS,
+            default=ProductRecommendationUtil.METRIC_COSINE
+        )
+        parser.add_argument('--top-k', type=int,
+                            default=ProductRecommendationUtil.TOP_K)
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='orders counted per transaction')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='forget all the counts and start over from the first '
+                 'closed order (e.g. after changing --metric, or '
+                 'periodically with --metric lift)'
+        )
+
+    def handle(self, metric, top_k, batch_size, rebuild, **options):
+        if rebuild:
+            ProductRecommendationUtil.reset()
+
+        orders = products = recommendations = 0
+        for batch_orders, batch_products, batch_recommendations in \
+                ProductRecommendationUtil.update(
+                    metric=metric, top_k=top_k, batch_size=batch_size
+                ):
+            orders += batch_orders
+            products += batch_products
+            recommendations += batch_recommendations
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{orders} orders, {products} products rescored'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{orders} orders counted, {products} products rescored, '
+            f'{recommendations} recommendations written'
+        ))
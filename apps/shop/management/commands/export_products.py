@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.shop.utils import (
+    ProductImportUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Exports all products to a CSV or JSON Lines file ' \
+           '("-" for stdout) in the import_products format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=StreamUtil.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, path, format, chunk_size, **options):
+        try:
+            format_ = StreamUtil.get_format(path, format)
+        except ValueError as e:
+            raise CommandError(f'{e}, use --format')
+
+        file = sys.stdout if path == '-' \
+            else open(path, 'w', newline='', encoding='utf8')
+
+        try:
+            count = StreamUtil.write_rows(
+                file, format_, ProductImportUtil.FIELDNAMES,
+                ProductImportUtil.export_rows(chunk_size=chunk_size)
+            )
+        finally:
+            if file is not sys.stdout:
+                file.close()
+
+        if file is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'{count} exported'))
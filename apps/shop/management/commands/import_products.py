@@ -0,0 +1,68 @@
+import sys
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.shop.utils import (
+    ProductImportUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Imports products from a CSV or JSON Lines file ("-" for stdin);' \
+           ' rows with an id update existing products, the rest are created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=StreamUtil.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='processes parsing and validating rows'
+        )
+        parser.add_argument(
+            '--create-categories', action='store_true',
+            help='create missing categories instead of rejecting the rows'
+        )
+
+    def handle(self, path, format, batch_size, workers, create_categories,
+               **options):
+        try:
+            format_ = StreamUtil.get_format(path, format)
+        except ValueError as e:
+            raise CommandError(f'{e}, use --format')
+
+        file = sys.stdin if path == '-' \
+            else open(path, newline='', encoding='utf8')
+
+        created = updated = failed = 0
+        try:
+            for batch_created, batch_updated, errors in \
+                    ProductImportUtil.import_rows(
+                        StreamUtil.read_rows(file, format_),
+                        batch_size=batch_size,
+                        workers=workers,
+                        create_categories=create_categories,
+                    ):
+                created += batch_created
+                updated += batch_updated
+                failed += len(errors)
+                for line_number, error in errors:
+                    self.stderr.write(f'row {line_number}: {error}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'{created} created, {updated} updated, '
+                        f'{failed} failed'
+                    )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} created, {updated} updated, {failed} failed'
+        ))
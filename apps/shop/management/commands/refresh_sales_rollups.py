@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from apps.shop.utils import (
+    SalesRollupUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollups of a date range (both ends ' \
+           'included, by default every day with closed orders) from the ' \
+           'closed orders; days are replaced one by one, so it can be ' \
+           'rerun at will'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from',
+                            type=datetime.date.fromisoformat,
+                            help='YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to',
+                            type=datetime.date.fromisoformat,
+                            help='YYYY-MM-DD')
+
+    def handle(self, date_from, date_to, **options):
+        if date_from is None or date_to is None:
+            first_day, last_day = SalesRollupUtil.get_closed_date_range()
+            date_from = date_from or first_day
+            date_to = date_to or last_day
+            if date_from is None or date_to is None:
+                self.stdout.write('No closed orders')
+                return
+        if date_from > date_to:
+            raise CommandError('--from is after --to')
+
+        days = product_rows = category_rows = 0
+        for day, day_product_rows, day_category_rows \
+                in SalesRollupUtil.rebuild(date_from, date_to):
+            days += 1
+            product_rows += day_product_rows
+            category_rows += day_category_rows
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{day}: {day_product_rows} product rows, '
+                    f'{day_category_rows} category rows'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{days} days from {date_from} to {date_to} rebuilt: '
+            f'{product_rows} product rows, {category_rows} category rows'
+        ))
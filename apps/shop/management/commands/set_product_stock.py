@@ -0,0 +1,48 @@
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from apps.shop.models import (
+    Product,
+)
+from apps.shop.utils import (
+    StockUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Sets the stock of a product ("none" to stop tracking it), ' \
+           'optionally split over shards for products checked out by ' \
+           'many users at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_id', type=int)
+        parser.add_argument('quantity')
+        parser.add_argument('--shards', type=int, default=0,
+                            help='number of stock shards, 0 for none')
+
+    def handle(self, product_id, quantity, shards, **options):
+        if quantity.lower() == 'none':
+            quantity = None
+        else:
+            try:
+                quantity = int(quantity)
+            except ValueError:
+                quantity = -1
+            if quantity < 0:
+                raise CommandError('quantity must be "none" or an integer '
+                                   '>= 0')
+        if shards < 0:
+            raise CommandError('--shards must be >= 0')
+
+        try:
+            StockUtil.set_stock(product_id, quantity, shards)
+        except Product.DoesNotExist:
+            raise CommandError(f'unknown product: {product_id}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'product {product_id}: stock {StockUtil.get_stock(product_id)}'
+            + (f' over {shards} shards' if shards and quantity is not None
+               else '')
+        ))
@@ -0,0 +1,89 @@
+# Generated by Django 3.1.7 on 2026-10-18 08:41
+
+import re
+from html import unescape
+from itertools import islice
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+POSTGRES_SEARCH_INDEXES = (
+    ('shop_product_search_gin_idx', 'gin (search_vector)'),
+    ('shop_product_name_trgm_idx', 'gin (name gin_trgm_ops)'),
+    # makes `name__icontains` (UPPER(name) LIKE ...) indexable
+    ('shop_product_name_upper_trgm_idx', 'gin (UPPER(name) gin_trgm_ops)'),
+)
+
+
+BATCH_SIZE = 1000
+# a frozen copy of ProductSearchUtil.get_search_document: migrations must
+# not depend on app code that keeps changing
+TERM_REGEX = re.compile(r'\w+')
+
+
+def get_search_document(name, description):
+    plain_description = unescape(strip_tags(description or ''))
+    return ' '.join(
+        TERM_REGEX.findall(f'{name or ""} {plain_description}'.lower())
+    )
+
+
+def fill_search_fields(apps, schema_editor):
+    Product = apps.get_model('shop', 'Product')
+    products = Product.objects.only('id', 'name', 'description') \
+        .order_by('id').iterator(chunk_size=BATCH_SIZE)
+    batch = list(islice(products, BATCH_SIZE))
+    while batch:
+        for product in batch:
+            product.search_document = get_search_document(
+                product.name, product.description
+            )
+        Product.objects.bulk_update(batch, ('search_document',))
+        batch = list(islice(products, BATCH_SIZE))
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE shop_product SET search_vector = "
+            "setweight(to_tsvector('simple', name), 'A') || "
+            "setweight(to_tsvector('simple', search_document), 'B')"
+        )
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, definition in POSTGRES_SEARCH_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON shop_product USING {definition}'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, _ in POSTGRES_SEARCH_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_product_order_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_unit_prices_and_totals(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    OrderProductM2M = apps.get_model('shop', 'OrderProductM2M')
+    Product = apps.get_model('shop', 'Product')
+
+    OrderProductM2M.objects.update(unit_price=Subquery(
+        Product.objects.filter(id=OuterRef('product_id')).values('price')
+    ))
+
+    lines = OrderProductM2M.objects \
+        .filter(order_id=OuterRef('id')).order_by().values('order_id')
+    Order.objects.update(
+        total=Coalesce(Subquery(lines.annotate(total=Sum(
+            F('product_count') * F('unit_price'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )).values('total')), Decimal('0.00')),
+        item_count=Coalesce(Subquery(lines.annotate(
+            item_count=Sum('product_count')
+        ).values('item_count')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orderproductm2m',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(fill_unit_prices_and_totals, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderproductm2m',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10),
+        ),
+    ]
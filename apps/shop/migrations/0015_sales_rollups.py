@@ -0,0 +1,79 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:07
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def fill_closed_at(apps, schema_editor):
+    # best guess for the orders closed so far; run refresh_sales_rollups
+    # afterwards to build their rollups
+    Order = apps.get_model('shop', 'Order')
+    Order.objects.filter(status='closed').update(closed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_order_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySalesDaily',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'category sales per day',
+                'verbose_name_plural': 'category sales per day',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDaily',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'product sales per day',
+                'verbose_name_plural': 'product sales per day',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='closed at'),
+        ),
+        migrations.RunPython(fill_closed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['closed_at'], name='shop_order_closed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='productsalesdaily',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily', to='shop.product'),
+        ),
+        migrations.AddField(
+            model_name='categorysalesdaily',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily', to='shop.category'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productsalesdaily',
+            unique_together={('day', 'product')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='categorysalesdaily',
+            unique_together={('day', 'category')},
+        ),
+    ]
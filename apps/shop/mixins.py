@@ -0,0 +1,117 @@
+from django.db.models import (
+    Sum,
+)
+
+from rest_framework.exceptions import (
+    NotFound,
+    ValidationError,
+)
+from rest_framework.response import (
+    Response,
+)
+
+from .models import (
+    Product,
+)
+from .serializers import (
+    ProductCountSerializer,
+)
+from .utils import (
+    CartCacheUtil,
+    GuestCartUtil,
+)
+
+
+class ProductDeltasMixin:
+
+    @staticmethod
+    def get_product_deltas(data):
+        """
+        Accepts `{"product_id": <<int>>, "product_count": <<int != 0>>}`
+        or a list of them\n
+        Returns `({product_id: summed product_count != 0},
+        {product_id: current price})`, None if the data is invalid;
+        raises 404 on unknown products (all checked with a single query)
+        """
+        serializer = ProductCountSerializer(
+            data=data if isinstance(data, list) else [data], many=True
+        )
+        if not serializer.is_valid():
+            return None
+
+        deltas = {}
+        for product_count in serializer.validated_data:
+            product_id = product_count['product_id']
+            deltas[product_id] = \
+                deltas.get(product_id, 0) + product_count['product_count']
+
+        prices = dict(
+            Product.objects.filter(id__in=deltas).values_list('id', 'price')
+        )
+        if len(prices) != len(deltas):
+            raise NotFound('unknown product_id: ' + ', '.join(
+                str(product_id) for product_id in sorted(deltas)
+                if product_id not in prices
+            ))
+
+        return {
+            product_id: delta for product_id, delta in deltas.items() if delta
+        }, prices
+
+
+class CartSnapshotMixin:
+
+    @staticmethod
+    def get_cart_snapshot(request):
+        """
+        Current User's cached cart snapshot, or the guest cart's one
+        """
+        if request.user.is_authenticated:
+            return CartCacheUtil.get(request.user.id)
+        return GuestCartUtil.get_snapshot(GuestCartUtil.read(request))
+
+
+class SalesReportMixin:
+    """Sums the rollup rows of a list view over `group_by`, best selling
+    first; `?daily=true` keeps a row per day, `?limit=` caps the rows.
+    """
+
+    group_by = ()
+    aggregates = {'units': Sum('units'), 'revenue': Sum('revenue')}
+
+    daily_query_param = 'daily'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+    TRUE_VALUES = frozenset(('1', 'true', 'yes'))
+
+    def get_limit(self) -> int:
+        value = self.request.query_params.get(
+            self.limit_query_param, self.default_limit
+        )
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({
+                self.limit_query_param:
+                    f'must be an integer from 1 to {self.max_limit}'
+            })
+
+        return limit
+
+    def get_report_rows(self, queryset):
+        group_by = self.group_by
+        ordering = ('-revenue', *group_by)
+        if self.request.query_params.get(self.daily_query_param, '') \
+                .lower() in self.TRUE_VALUES:
+            group_by = ('day', *group_by)
+            ordering = ('day', *ordering)
+
+        return queryset.values(*group_by).annotate(**self.aggregates) \
+            .order_by(*ordering)[:self.get_limit()]
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_report_rows(self.filter_queryset(self.get_queryset()))
+        return Response(self.get_serializer(rows, many=True).data)
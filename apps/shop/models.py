@@ -1,5 +1,6 @@
 from decimal import Decimal
 
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -21,17 +22,32 @@ ORDER_STATUS_CHOICES = (
 class Category(mpttmodels.MPTTModel):
     class Meta:
         verbose_name_plural = 'categories'
+        indexes = (
+            # subtree range lookups
+            models.Index(fields=('tree_id', 'lft', 'rght'),
+                         name='shop_category_tree_range_idx'),
+        )
 
     name = models.CharField(max_length=64)
     parent = mpttmodels.TreeForeignKey(to='self', on_delete=models.CASCADE,
                                        null=True, blank=True,
                                        related_name='children')
+    updated_at = models.DateTimeField('updated at', auto_now=True)
 
     def __str__(self):
         return self.name
 
 
 class Product(models.Model):
+    class Meta:
+        indexes = (
+            # keyset pagination of the catalog, unfiltered and by category
+            models.Index(fields=('price', 'id'),
+                         name='shop_product_price_id_idx'),
+            models.Index(fields=('category', 'price', 'id'),
+                         name='shop_product_cat_price_id_idx'),
+        )
+
     category = models.ForeignKey(to=Category, on_delete=models.SET_NULL,
                                  null=True, blank=True)
     name = models.CharField(max_length=64)
@@ -40,10 +56,58 @@ class Product(models.Model):
         max_digits=10, decimal_places=2,
         validators=(MinValueValidator(Decimal('0.01')),)
     )
+    updated_at = models.DateTimeField('updated at', auto_now=True)
+
+    # None: not tracked; see StockUtil
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # > 0: the stock is split over that many ProductStockShard rows
+    # instead (set by StockUtil.set_stock)
+    stock_shard_count = models.PositiveSmallIntegerField(
+        default=0, editable=False
+    )
+
+    # maintained on save, see ProductSearchUtil;
+    # PostgreSQL GIN / trigram indexes are created in migration 0010
+    search_document = models.TextField(editable=False, default='')
+    search_vector = SearchVectorField(editable=False, null=True)
+
+    # written only by StockUtil's conditional updates
+    STOCK_FIELDS = frozenset(('stock', 'stock_shard_count'))
 
     def __str__(self):
         return f'{self.id}:{self.name}'
 
+    def save(self, *args, **kwargs):
+        # a full save of a loaded product (serializer, admin) would write
+        # back the stock read with it, undoing the reservations made since
+        if not self._state.adding and not kwargs.get('force_insert') \
+                and kwargs.get('update_fields') is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred_fields
+                and field.name not in self.STOCK_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class ProductStockShard(models.Model):
+    """A slice of the stock of a hot product, so that concurrent checkouts
+    decrement different rows.
+    """
+
+    class Meta:
+        unique_together = (('product', 'shard'),)
+
+    product = models.ForeignKey(to=Product, on_delete=models.CASCADE,
+                                related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'{self.product_id} - {self.shard} - {self.stock}'
+
 
 class Cart(models.Model):
     user = models.OneToOneField(to='user.User', on_delete=models.CASCADE,
@@ -55,12 +119,36 @@ class Cart(models.Model):
 
 
 class Order(models.Model):
+    class Meta:
+        indexes = (
+            # a user's orders, newest first (OrderPagination)
+            models.Index(fields=('user', 'created_at', 'id'),
+                         name='shop_order_user_created_idx'),
+            # status filters and the moderators' queue
+            models.Index(fields=('status', 'created_at', 'id'),
+                         name='shop_order_status_created_idx'),
+            # sales rollup rebuilds by date range
+            models.Index(fields=('closed_at',),
+                         name='shop_order_closed_at_idx'),
+        )
+
     user = models.ForeignKey(to='user.User', on_delete=models.SET_NULL,
                              null=True, related_name='orders')
     products = models.ManyToManyField(to=Product, through='OrderProductM2M')
     status = models.CharField(max_length=16, choices=ORDER_STATUS_CHOICES,
                               default=ORDER_STATUS_INCOMPLETE)
 
+    # denormalized from product_relations, see OrderTotalsUtil
+    total = models.DecimalField(max_digits=12, decimal_places=2,
+                                default=Decimal('0.00'), editable=False)
+    item_count = models.IntegerField(default=0, editable=False)
+
+    created_at = models.DateTimeField('created at', auto_now_add=True)
+    updated_at = models.DateTimeField('updated at', auto_now=True)
+    # set by OrderStatusUtil.close, the day the order counts as sold
+    closed_at = models.DateTimeField('closed at', null=True, blank=True,
+                                     editable=False)
+
     def __str__(self):
         return self.user.email
 
@@ -90,3 +178,109 @@ class OrderProductM2M(models.Model):
     product = models.ForeignKey(to=Product, on_delete=models.CASCADE,
                                 related_name='order_relations')
     product_count = models.IntegerField()
+    # product price at the time the product was ordered
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2,
+                                     blank=True)
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
+
+
+class ProductSalesDaily(models.Model):
+    """Units and revenue of the closed orders, per product and day;
+    maintained by SalesRollupUtil.
+    """
+
+    class Meta:
+        unique_together = (('day', 'product'),)
+        verbose_name = 'product sales per day'
+        verbose_name_plural = 'product sales per day'
+
+    day = models.DateField()
+    product = models.ForeignKey(to=Product, on_delete=models.CASCADE,
+                                related_name='sales_daily')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2,
+                                  default=Decimal('0.00'))
+    order_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.day} - {self.product_id}'
+
+
+class CategorySalesDaily(models.Model):
+    """ProductSalesDaily rolled up through the category tree: a category's
+    row includes the sales of all its descendants.
+    """
+
+    class Meta:
+        unique_together = (('day', 'category'),)
+        verbose_name = 'category sales per day'
+        verbose_name_plural = 'category sales per day'
+
+    day = models.DateField()
+    category = models.ForeignKey(to=Category, on_delete=models.CASCADE,
+                                 related_name='sales_daily')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2,
+                                  default=Decimal('0.00'))
+
+    def __str__(self):
+        return f'{self.day} - {self.category_id}'
+
+
+class ProductCoPurchase(models.Model):
+    """How many closed orders contain both products (`product_a` <
+    `product_b`); rows with `product_a` == `product_b` count the orders
+    containing the product. Maintained by ProductRecommendationUtil.
+    """
+
+    class Meta:
+        unique_together = (('product_a', 'product_b'),)
+        indexes = (
+            # the pairs of a product, from either side
+            models.Index(fields=('product_b', 'product_a'),
+                         name='shop_copurchase_b_a_idx'),
+        )
+
+    product_a = models.ForeignKey(to=Product, on_delete=models.CASCADE,
+                                  related_name='+')
+    product_b = models.ForeignKey(to=Product, on_delete=models.CASCADE,
+                                  related_name='+')
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.product_a_id} - {self.product_b_id} - {self.count}'
+
+
+class ProductRecommendation(models.Model):
+    """Top "frequently bought together" products of a product,
+    `rank` 0 first.
+    """
+
+    class Meta:
+        unique_together = (('product', 'rank'),)
+
+    product = models.ForeignKey(to=Product, on_delete=models.CASCADE,
+                                related_name='recommendations')
+    related_product = models.ForeignKey(to=Product,
+                                        on_delete=models.CASCADE,
+                                        related_name='recommended_for')
+    rank = models.SmallIntegerField()
+    score = models.FloatField()
+
+    def __str__(self):
+        return f'{self.product_id} - {self.rank} - {self.related_product_id}'
+
+
+class CoPurchaseWatermark(models.Model):
+    """The last closed order (by `closed_at`, `id`) counted in
+    ProductCoPurchase; a single row.
+    """
+
+    closed_at = models.DateTimeField(null=True)
+    order_id = models.IntegerField(null=True)
+    order_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField('updated at', auto_now=True)
@@ -0,0 +1,25 @@
+from apps.base.pagination import (
+    KeysetPagination,
+)
+
+
+class ProductPagination(KeysetPagination):
+    ordering = ('price', 'id')
+    search_ordering = ('-search_rank', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        # search results are paginated in order of relevance
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    # the moderators' queue is worked through oldest first
+    queue_ordering = ('created_at', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        if getattr(view, 'action', None) == 'queue':
+            return self.queue_ordering
+        return super().get_ordering(request, queryset, view)
@@ -1,22 +1,30 @@
 from rest_framework import serializers
 
+from .filters import (
+    OrderFilterSet,
+)
 from .models import (
     Category,
     Order,
     Product,
 )
+from apps.base.serializers import (
+    SparseFieldsetSerializerMixin,
+)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin,
+                        serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        fields = ('id', 'category', 'name', 'description', 'price',
+                  'updated_at')
 
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('id', 'name', 'parent')
+        fields = ('id', 'name', 'parent', 'updated_at')
 
 
 class ProductCountSerializer(serializers.Serializer):
@@ -36,14 +44,73 @@ class ProductCountSerializer(serializers.Serializer):
         return attrs
 
 
+class OrderProductCountSerializer(ProductCountSerializer):
+
+    unit_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
+
+
 class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
-        fields = ('order_id', 'user_id', 'user_email', 'status', 'products')
+        fields = ('order_id', 'user_id', 'user_email', 'status',
+                  'total', 'item_count', 'created_at', 'updated_at',
+                  'products')
 
     order_id = serializers.IntegerField(source='id')
     user_email = serializers.CharField(source='user.email')
 
-    products = ProductCountSerializer(
+    products = OrderProductCountSerializer(
         many=True, source='product_relations'
     )
+
+
+class BulkCloseOrderSerializer(serializers.Serializer):
+
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False
+    )
+    filter = serializers.DictField(required=False)
+
+    def validate_filter(self, value):
+        # a filter selecting nothing would close every paid order
+        if not value:
+            raise serializers.ValidationError('must not be empty')
+
+        unknown = sorted(set(value).difference(OrderFilterSet.get_filters()))
+        if unknown:
+            raise serializers.ValidationError(
+                'unknown filters: ' + ', '.join(unknown)
+            )
+
+        return value
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+
+        if ('order_ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                'exactly one of order_ids and filter is required'
+            )
+
+        return attrs
+
+
+class ProductSalesSerializer(serializers.Serializer):
+
+    day = serializers.DateField(required=False)
+    product_id = serializers.IntegerField()
+    product_name = serializers.CharField(source='product__name')
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    order_count = serializers.IntegerField()
+
+
+class CategorySalesSerializer(serializers.Serializer):
+
+    day = serializers.DateField(required=False)
+    category_id = serializers.IntegerField()
+    category_name = serializers.CharField(source='category__name')
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
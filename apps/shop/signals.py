@@ -0,0 +1,87 @@
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_save,
+)
+from django.dispatch import (
+    receiver,
+)
+
+from .models import (
+    Category,
+    Product,
+)
+from .utils import (
+    CartCacheUtil,
+    CategoryTreeUtil,
+    ProductSearchUtil,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
+)
+
+
+SEARCH_SOURCE_FIELDS = frozenset(('name', 'description'))
+SEARCH_FIELDS = frozenset(('search_document', 'search_vector'))
+
+
+@receiver(pre_save, sender=Product)
+def set_product_search_fields(sender, instance, update_fields, **kwargs):
+    # Product.save() turns full saves into all the fields but the stock
+    if update_fields is None or SEARCH_FIELDS <= update_fields:
+        for field, value in ProductSearchUtil.get_search_fields(
+                instance.name, instance.description).items():
+            setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_fields(sender, instance, update_fields, **kwargs):
+    # save(update_fields=...) can't be extended from pre_save
+    if update_fields is not None \
+            and SEARCH_SOURCE_FIELDS & update_fields \
+            and not SEARCH_FIELDS <= update_fields:
+        Product.objects.filter(pk=instance.pk).update(
+            **ProductSearchUtil.get_search_fields(
+                instance.name, instance.description
+            )
+        )
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    # __dict__ lookup: don't load a deferred field
+    instance._loaded_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender=Product)
+def invalidate_category_tree_on_product_save(sender, instance, created,
+                                             **kwargs):
+    if created or instance.category_id != instance._loaded_category_id:
+        CategoryTreeUtil.invalidate()
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_category_tree_on_product_delete(sender, instance, **kwargs):
+    if instance.category_id is not None:
+        CategoryTreeUtil.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    CategoryTreeUtil.invalidate()
+    CacheVersionUtil.bump_model(Category)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_version(sender, **kwargs):
+    CacheVersionUtil.bump_model(Product)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cart_product(sender, instance, **kwargs):
+    CartCacheUtil.invalidate_products([instance.pk])
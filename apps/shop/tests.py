@@ -1,3 +1,1028 @@
-from django.test import TestCase  # noqa
+import io
+import threading
+from datetime import (
+    timedelta,
+)
+from decimal import (
+    Decimal,
+)
+from unittest import (
+    skipUnless,
+)
 
-# Create your tests here.
+from django.core.cache import (
+    cache,
+)
+from django.db import (
+    connection,
+)
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+)
+from django.utils import (
+    timezone,
+)
+from rest_framework.test import (
+    APIClient,
+)
+
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.shop.exceptions import (
+    NonPositiveCountException,
+    OutOfStockException,
+)
+from apps.shop.models import (
+    Cart,
+    CartProductM2M,
+    Category,
+    Order,
+    OrderProductM2M,
+    ORDER_STATUS_CLOSED,
+    ORDER_STATUS_INCOMPLETE,
+    ORDER_STATUS_PAID,
+    Product,
+    ProductStockShard,
+)
+from apps.shop.utils import (
+    CategoryTreeUtil,
+    DeltaUtil,
+    OrderStatusUtil,
+    ProductImportUtil,
+    ProductRecommendationUtil,
+    SalesRollupUtil,
+    StockUtil,
+)
+from apps.user.models import (
+    User,
+)
+
+
+class CartLineMixin:
+    def create_cart_line(self):
+        user = User.objects.create_user('cart@example.com', None)
+        product = Product.objects.create(
+            name='product', description='', price=1
+        )
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return {'cart': cart, 'product': product}
+
+
+class AtomicDeltaTestCase(CartLineMixin, TestCase):
+    def setUp(self):
+        self.identifier = self.create_cart_line()
+
+    def get_count(self):
+        line = CartProductM2M.objects.filter(**self.identifier).first()
+        return line and line.product_count
+
+    def test_positive_delta_creates_then_increments(self):
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', 2
+        )
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', 3
+        )
+        self.assertEqual(self.get_count(), 5)
+
+    def test_negative_delta_decrements_then_deletes(self):
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', 3
+        )
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', -1
+        )
+        self.assertEqual(self.get_count(), 2)
+
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', -2
+        )
+        self.assertIsNone(self.get_count())
+
+    def test_negative_delta_below_zero_raises(self):
+        DeltaUtil.atomic_delta(
+            CartProductM2M, self.identifier, 'product_count', 1
+        )
+        with self.assertRaises(NonPositiveCountException):
+            DeltaUtil.atomic_delta(
+                CartProductM2M, self.identifier, 'product_count', -2
+            )
+        self.assertEqual(self.get_count(), 1)
+
+        CartProductM2M.objects.filter(**self.identifier).delete()
+        with self.assertRaises(NonPositiveCountException):
+            DeltaUtil.atomic_delta(
+                CartProductM2M, self.identifier, 'product_count', -1
+            )
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'concurrent writers need PostgreSQL')
+class ConcurrentDeltaTestCase(CartLineMixin, TransactionTestCase):
+    THREADS = 8
+    INCREMENTS = 50
+
+    def run_concurrently(self, target):
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.INCREMENTS):
+                    try:
+                        target()
+                    except Exception as e:
+                        errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return errors
+
+    def test_no_increment_is_lost(self):
+        identifier = self.create_cart_line()
+
+        errors = self.run_concurrently(lambda: DeltaUtil.atomic_delta(
+            CartProductM2M, identifier, 'product_count', 1
+        ))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            CartProductM2M.objects.get(**identifier).product_count,
+            self.THREADS * self.INCREMENTS
+        )
+
+    def test_decrements_never_go_below_zero(self):
+        identifier = self.create_cart_line()
+        initial_count = self.THREADS * self.INCREMENTS // 2
+        DeltaUtil.atomic_delta(
+            CartProductM2M, identifier, 'product_count', initial_count
+        )
+
+        errors = self.run_concurrently(lambda: DeltaUtil.atomic_delta(
+            CartProductM2M, identifier, 'product_count', -1
+        ))
+
+        self.assertTrue(all(
+            isinstance(e, NonPositiveCountException) for e in errors
+        ))
+        self.assertEqual(
+            len(errors), self.THREADS * self.INCREMENTS - initial_count
+        )
+        self.assertFalse(
+            CartProductM2M.objects.filter(**identifier).exists()
+        )
+
+
+class StockTestCase(TestCase):
+    SHARD_COUNTS = (0, 3)
+
+    def create_product(self, stock: int, shard_count: int) -> Product:
+        product = Product.objects.create(
+            name='product', description='', price=1
+        )
+        StockUtil.set_stock(product.id, stock, shard_count)
+        return product
+
+    @staticmethod
+    def get_line(product: Product, count: int) -> tuple:
+        product.refresh_from_db()
+        return product.id, count, product.stock, product.stock_shard_count
+
+    def test_reservation_never_goes_below_zero(self):
+        for shard_count in self.SHARD_COUNTS:
+            with self.subTest(shard_count=shard_count):
+                product = self.create_product(5, shard_count)
+
+                StockUtil.reserve([self.get_line(product, 4)])
+                with self.assertRaises(OutOfStockException):
+                    StockUtil.reserve([self.get_line(product, 2)])
+                # the last unit may be spread over the shards
+                StockUtil.reserve([self.get_line(product, 1)])
+                with self.assertRaises(OutOfStockException):
+                    StockUtil.reserve([self.get_line(product, 1)])
+
+                self.assertEqual(StockUtil.get_stock(product.id), 0)
+                self.assertFalse(ProductStockShard.objects.filter(
+                    product=product, stock__lt=0
+                ).exists())
+
+    def test_release_gives_the_stock_back(self):
+        for shard_count in self.SHARD_COUNTS:
+            with self.subTest(shard_count=shard_count):
+                product = self.create_product(5, shard_count)
+
+                StockUtil.reserve([self.get_line(product, 5)])
+                StockUtil.release([self.get_line(product, 3)])
+                self.assertEqual(StockUtil.get_stock(product.id), 3)
+
+    def test_untracked_stock_is_left_alone(self):
+        product = self.create_product(None, 0)
+
+        StockUtil.reserve([self.get_line(product, 10)])
+        StockUtil.release([self.get_line(product, 3)])
+        self.assertIsNone(StockUtil.get_stock(product.id))
+
+    def test_deleted_order_gives_its_stock_back(self):
+        user = User.objects.create_user('stock@example.com', None)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        for shard_count in self.SHARD_COUNTS:
+            with self.subTest(shard_count=shard_count):
+                product = self.create_product(5, shard_count)
+
+                client.patch('/shop/cart/products/', {
+                    'product_id': product.id, 'product_count': 2
+                }, format='json')
+                response = client.post('/shop/orders/make_from_cart/')
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(StockUtil.get_stock(product.id), 3)
+
+                order = Order.objects.filter(user=user).latest('id')
+                response = client.patch(f'/shop/orders/{order.id}/', {
+                    'product_id': product.id, 'product_count': 1
+                }, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(StockUtil.get_stock(product.id), 2)
+
+                response = client.delete(f'/shop/orders/{order.id}/')
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(StockUtil.get_stock(product.id), 5)
+
+
+class BulkCloseOrderTestCase(TestCase):
+    URL = '/shop/orders/close/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_superuser('admin@example.com', None)
+        )
+        self.users = [
+            User.objects.create_user(f'buyer{i}@example.com', None)
+            for i in range(2)
+        ]
+        for user in self.users:
+            Order.objects.create(user=user, status=ORDER_STATUS_PAID)
+
+    def get_closed_users(self) -> list:
+        return list(
+            Order.objects.filter(status=ORDER_STATUS_CLOSED)
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+
+    def test_filters_selecting_everything_are_rejected(self):
+        for data in ({}, {'filter': {}}, {'filter': {'usr': [1]}},
+                     {'filter': {'status': []}},
+                     {'order_ids': [1], 'filter': {'status': ['paid']}}):
+            with self.subTest(data=data):
+                response = self.client.post(self.URL, data, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.get_closed_users(), [])
+
+    def test_filter_closes_the_matching_orders(self):
+        response = self.client.post(self.URL, {
+            'filter': {'user': [self.users[0].id]}
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['updated']), 1)
+        self.assertEqual(self.get_closed_users(), [self.users[0].id])
+
+    def test_order_ids(self):
+        order_id = Order.objects.get(user=self.users[1]).id
+        response = self.client.post(self.URL, {
+            'order_ids': [order_id, order_id + 100]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [order_id])
+        self.assertEqual(response.data['missing'], [order_id + 100])
+        self.assertEqual(self.get_closed_users(), [self.users[1].id])
+
+
+class ProductImportTestCase(TestCase):
+    def import_text(self, text: str, format_: str) -> tuple:
+        created = updated = 0
+        errors = []
+        for batch_created, batch_updated, batch_errors in \
+                ProductImportUtil.import_rows(
+                    StreamUtil.read_rows(io.StringIO(text), format_),
+                    batch_size=2
+                ):
+            created += batch_created
+            updated += batch_updated
+            errors += batch_errors
+
+        return created, updated, [line_number for line_number, _ in errors]
+
+    def test_bad_csv_price_is_a_row_error(self):
+        result = self.import_text(
+            'name,description,price\n'
+            'first,,1.50\n'
+            'second,,abc\n'
+            'third,,1.234\n'
+            'fourth,,2\n',
+            StreamUtil.FORMAT_CSV
+        )
+
+        self.assertEqual(result, (2, 0, [2, 3]))
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', flat=True)),
+            ['first', 'fourth']
+        )
+
+    def test_bad_jsonl_lines_are_row_errors(self):
+        result = self.import_text(
+            '{"name": "first", "price": "1.50"}\n'
+            '{"name": "second", "price": \n'
+            '["x"]\n'
+            '{"name": ["x"], "price": "1"}\n'
+            '\n'
+            '{"name": "fifth", "price": 2}\n',
+            StreamUtil.FORMAT_JSONL
+        )
+
+        self.assertEqual(result, (2, 0, [2, 3, 4]))
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', flat=True)),
+            ['fifth', 'first']
+        )
+
+
+class CatalogMixin:
+    """Products and categories read through the API; the shared cache
+    (cached trees, facets, versions) is emptied before every test.
+    """
+
+    def setUp(self):
+        cache.clear()
+        CategoryTreeUtil._local_tree = (None, None, None)
+        self.client = APIClient()
+
+    @staticmethod
+    def create_product(name: str, price, category=None,
+                       description: str = '') -> Product:
+        return Product.objects.create(
+            name=name, description=description, price=Decimal(price),
+            category=category
+        )
+
+    def get_results(self, url: str) -> list:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+
+class CategoryTreeMixin(CatalogMixin):
+    """electronics > phones > smartphones, food > fruit"""
+
+    def setUp(self):
+        super().setUp()
+        self.electronics = Category.objects.create(name='electronics')
+        self.phones = Category.objects.create(
+            name='phones', parent=self.electronics
+        )
+        self.smartphones = Category.objects.create(
+            name='smartphones', parent=self.phones
+        )
+        self.food = Category.objects.create(name='food')
+        self.fruit = Category.objects.create(name='fruit', parent=self.food)
+
+        self.products = {
+            category.name: self.create_product(category.name, 1, category)
+            for category in (self.electronics, self.phones,
+                             self.smartphones, self.food, self.fruit)
+        }
+        self.create_product('uncategorized', 1)
+
+
+class KeysetPaginationTestCase(CatalogMixin, TestCase):
+    def test_cursor_walks_every_row_once_in_order(self):
+        for i in range(25):
+            # many equal prices: the id breaks the ties
+            self.create_product(f'product {i}', i % 4 + 1)
+        expected_ids = list(
+            Product.objects.order_by('price', 'id')
+            .values_list('id', flat=True)
+        )
+
+        pages = []
+        url = '/shop/products/?page_size=7'
+        while url:
+            response = self.client.get(url)
+            pages.append(
+                [product['id'] for product in response.data['results']]
+            )
+            url = response.data['next']
+
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual(sum(pages, []), expected_ids)
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [product['id'] for product in previous.data['results']],
+            pages[-2]
+        )
+        first = self.client.get('/shop/products/?page_size=7')
+        self.assertIsNone(first.data['previous'])
+
+    def test_page_size_is_capped(self):
+        Product.objects.bulk_create(
+            Product(name=f'product {i}', description='', price=1)
+            for i in range(101)
+        )
+
+        self.assertEqual(
+            len(self.get_results('/shop/products/?page_size=1000')), 100
+        )
+        self.assertEqual(len(self.get_results('/shop/products/')), 20)
+
+    def test_invalid_cursor_is_not_found(self):
+        self.create_product('product', 1)
+
+        for cursor in ('garbage', 'cD0lNUIlNUQ='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    f'/shop/products/?cursor={cursor}'
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class ProductSearchTestCase(CatalogMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ipad = self.create_product(
+            'Apple iPad', 100, description='<p>Great &amp; shiny</p>'
+        )
+        self.samsung = self.create_product(
+            'Samsung', 50, description='<p>android <b>phone</b></p>'
+        )
+        self.toaster = self.create_product('Toaster', 20)
+        # search fields follow name changes, even with update_fields
+        self.toaster.name = 'Toaster phone'
+        self.toaster.save(update_fields=('name',))
+
+    def search(self, value: str) -> list:
+        return [
+            product['id']
+            for product in self.get_results(f'/shop/products/?search={value}')
+        ]
+
+    def test_name_and_plain_text_description_are_searched(self):
+        self.assertEqual(
+            set(self.search('phone')), {self.samsung.id, self.toaster.id}
+        )
+        self.assertEqual(self.search('shiny'), [self.ipad.id])
+        # markup is not text
+        self.assertEqual(self.search('amp'), [])
+
+    def test_terms_are_prefixes_and_all_required(self):
+        self.assertEqual(self.search('ipa'), [self.ipad.id])
+        self.assertEqual(self.search('android phone'), [self.samsung.id])
+        self.assertEqual(self.search('shiny android'), [])
+
+    def test_name_matches_come_first(self):
+        self.assertEqual(
+            self.search('phone'), [self.toaster.id, self.samsung.id]
+        )
+
+    def test_results_are_paginated_by_relevance(self):
+        ids = []
+        url = '/shop/products/?search=phone&page_size=1'
+        while url:
+            response = self.client.get(url)
+            ids += [product['id'] for product in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(ids, self.search('phone'))
+
+
+class CategoryTreeFilterTestCase(CategoryTreeMixin, TestCase):
+    def get_names(self, query: str) -> set:
+        return {
+            product['name']
+            for product in self.get_results(f'/shop/products/?{query}')
+        }
+
+    def test_subtree_products(self):
+        self.assertEqual(
+            self.get_names(f'category_tree={self.phones.id}'),
+            {'phones', 'smartphones'}
+        )
+        self.assertEqual(
+            self.get_names(f'category_tree={self.smartphones.id}'),
+            {'smartphones'}
+        )
+
+    def test_several_subtrees(self):
+        self.assertEqual(
+            self.get_names(
+                f'category_tree={self.phones.id}'
+                f'&category_tree={self.fruit.id}'
+            ),
+            {'phones', 'smartphones', 'fruit'}
+        )
+
+    def test_unknown_and_invalid_categories(self):
+        self.assertEqual(self.get_names('category_tree=999'), set())
+        self.assertEqual(
+            self.client.get('/shop/products/?category_tree=x').status_code,
+            400
+        )
+
+
+class CategoryTreeEndpointTestCase(CategoryTreeMixin, TransactionTestCase):
+    URL = '/shop/categories/tree/'
+
+    def get_counts(self) -> dict:
+        """
+        {name: (parent name, product count, total product count)}
+        """
+        counts = {}
+
+        def walk(nodes, parent):
+            for node in nodes:
+                counts[node['name']] = (
+                    parent, node['product_count'],
+                    node['total_product_count']
+                )
+                walk(node['children'], node['name'])
+
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        walk(response.data, None)
+        return counts
+
+    def test_tree_with_product_counts(self):
+        self.assertEqual(self.get_counts(), {
+            'electronics': (None, 1, 3),
+            'phones': ('electronics', 1, 2),
+            'smartphones': ('phones', 1, 1),
+            'food': (None, 1, 2),
+            'fruit': ('food', 1, 1),
+        })
+
+    def test_tree_is_cached(self):
+        self.client.get(self.URL)
+        with self.assertNumQueries(0):
+            self.client.get(self.URL)
+
+    def test_tree_follows_product_and_category_changes(self):
+        self.get_counts()
+
+        product = self.products['fruit']
+        product.category = self.smartphones
+        product.save()
+        Category.objects.create(name='vegetables', parent=self.food)
+
+        counts = self.get_counts()
+        self.assertEqual(counts['electronics'], (None, 1, 4))
+        self.assertEqual(counts['smartphones'], ('phones', 2, 2))
+        self.assertEqual(counts['food'], (None, 1, 1))
+        self.assertEqual(counts['vegetables'], ('food', 0, 0))
+
+
+class ProductFacetTestCase(CategoryTreeMixin, TestCase):
+    PRICES = {
+        'electronics': 5, 'phones': 20, 'smartphones': 120, 'food': 60,
+        'fruit': 10, 'uncategorized': 600,
+    }
+
+    def setUp(self):
+        super().setUp()
+        for name, price in self.PRICES.items():
+            Product.objects.filter(name=name).update(price=price)
+
+    def get_facets(self, query: str) -> dict:
+        response = self.client.get(f'/shop/products/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data.get('facets')
+
+    def test_category_counts_roll_up_to_the_ancestors(self):
+        self.assertEqual(
+            self.get_facets('facets=category&page_size=1')['category'], [
+                {'id': self.electronics.id, 'count': 3},
+                {'id': self.phones.id, 'count': 2},
+                {'id': self.smartphones.id, 'count': 1},
+                {'id': self.food.id, 'count': 2},
+                {'id': self.fruit.id, 'count': 1},
+            ]
+        )
+
+    def test_counts_follow_the_filters(self):
+        self.assertEqual(
+            self.get_facets('facets=category&max_price=50')['category'], [
+                {'id': self.electronics.id, 'count': 2},
+                {'id': self.phones.id, 'count': 1},
+                {'id': self.food.id, 'count': 1},
+                {'id': self.fruit.id, 'count': 1},
+            ]
+        )
+
+    def test_fixed_price_buckets(self):
+        self.assertEqual(self.get_facets('facets=price')['price'], [
+            {'min': None, 'max': '10', 'count': 1},
+            {'min': '10', 'max': '50', 'count': 2},
+            {'min': '50', 'max': '100', 'count': 1},
+            {'min': '100', 'max': '500', 'count': 1},
+            {'min': '500', 'max': '1000', 'count': 1},
+        ])
+        # empty buckets are left out
+        self.assertEqual(
+            self.get_facets('facets=price&max_price=50')['price'], [
+                {'min': None, 'max': '10', 'count': 1},
+                {'min': '10', 'max': '50', 'count': 2},
+            ]
+        )
+
+    def test_adaptive_price_buckets_span_the_filtered_prices(self):
+        buckets = self.get_facets(
+            'facets=price&price_buckets=adaptive'
+            f'&category_tree={self.electronics.id}'
+        )['price']
+
+        self.assertEqual(sum(bucket['count'] for bucket in buckets), 3)
+        self.assertIsNone(buckets[0]['min'])
+        self.assertIsNone(buckets[-1]['max'])
+        self.assertTrue(all(
+            Decimal(bucket['max']) <= 120
+            for bucket in buckets if bucket['max'] is not None
+        ))
+
+    def test_facets_are_only_returned_when_asked_for(self):
+        self.assertIsNone(self.get_facets(''))
+        self.assertIsNone(self.get_facets('facets=bogus'))
+
+
+class ConditionalGetTestCase(CatalogMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='category')
+        self.product = self.create_product('product', 1, self.category)
+
+    def test_unchanged_resources_are_not_modified(self):
+        for url in ('/shop/products/', f'/shop/products/{self.product.id}/',
+                    '/shop/categories/', '/shop/categories/tree/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+                with self.assertNumQueries(0):
+                    not_modified = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_are_modified(self):
+        etag = self.client.get('/shop/products/')['ETag']
+
+        self.product.price = 2
+        self.product.save()
+
+        response = self.client.get('/shop/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['price'], '2.00')
+
+    def test_etag_depends_on_the_query(self):
+        self.assertNotEqual(
+            self.client.get('/shop/products/')['ETag'],
+            self.client.get('/shop/products/?page_size=1')['ETag']
+        )
+
+
+class SparseFieldsetTestCase(CatalogMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(
+            'product', 1, description='<p>description</p>'
+        )
+
+    def test_list_omits_the_description_by_default(self):
+        self.assertEqual(
+            set(self.get_results('/shop/products/')[0]),
+            {'id', 'category', 'name', 'price', 'updated_at'}
+        )
+
+    def test_detail_includes_the_description_by_default(self):
+        response = self.client.get(f'/shop/products/{self.product.id}/')
+        self.assertEqual(response.data['description'], '<p>description</p>')
+
+    def test_selected_fields(self):
+        self.assertEqual(
+            self.get_results('/shop/products/?fields=id,description'),
+            [{'id': self.product.id, 'description': '<p>description</p>'}]
+        )
+
+        response = self.client.get(
+            f'/shop/products/{self.product.id}/?fields=name'
+        )
+        self.assertEqual(response.data, {'name': 'product'})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/shop/products/?fields=id,bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+
+
+class CartBatchUpdateTestCase(CatalogMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_product('first', 1)
+        self.second = self.create_product('second', 2)
+
+    def get_counts(self) -> dict:
+        return {
+            line['product_id']: line['product_count']
+            for line in self.client.get('/shop/cart/products/').data
+        }
+
+    def patch(self, data):
+        return self.client.patch('/shop/cart/products/', data, format='json')
+
+    def assert_batch_update(self):
+        response = self.patch([
+            {'product_id': self.first.id, 'product_count': 2},
+            {'product_id': self.second.id, 'product_count': 1},
+            {'product_id': self.first.id, 'product_count': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        expected = {self.first.id: 3, self.second.id: 1}
+        self.assertEqual(
+            {line['product_id']: line['product_count']
+             for line in response.data},
+            expected
+        )
+        self.assertEqual(self.get_counts(), expected)
+
+        response = self.patch([
+            {'product_id': self.first.id, 'product_count': -1},
+            {'product_id': self.second.id, 'product_count': -2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_counts(), expected)
+
+        response = self.patch([
+            {'product_id': self.first.id, 'product_count': -1},
+            {'product_id': self.second.id + 100, 'product_count': 1},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.get_counts(), expected)
+
+        summary = self.client.get('/shop/cart/summary/').data
+        self.assertEqual(
+            (summary['line_count'], summary['item_count'], summary['total']),
+            (2, 4, '5.00')
+        )
+
+    def test_user_cart(self):
+        user = User.objects.create_user('cart@example.com', None)
+        self.client.force_authenticate(user)
+        self.assert_batch_update()
+        self.assertEqual(CartProductM2M.objects.count(), 2)
+
+    def test_guest_cart(self):
+        self.assert_batch_update()
+        self.assertFalse(Cart.objects.exists())
+
+    def test_guest_cart_is_merged_on_login(self):
+        user = User.objects.create_user(
+            'guest@example.com', 'password', is_active=True
+        )
+        cart = Cart.objects.create(user=user)
+        CartProductM2M.objects.create(
+            cart=cart, product=self.first, product_count=1
+        )
+        self.patch([
+            {'product_id': self.first.id, 'product_count': 2},
+            {'product_id': self.second.id, 'product_count': 1},
+        ])
+
+        response = self.client.post('/users/login/', {
+            'username': 'guest@example.com', 'password': 'password'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_counts(), {})
+
+        self.assertEqual(
+            dict(CartProductM2M.objects.filter(cart=cart)
+                 .values_list('product_id', 'product_count')),
+            {self.first.id: 3, self.second.id: 1}
+        )
+
+
+class OrderListTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = User.objects.create_user('buyer@example.com', None)
+        other = User.objects.create_user('other@example.com', None)
+        self.now = timezone.now()
+
+        # (user, status, days ago)
+        self.orders = []
+        for user, status, days in (
+                (self.buyer, ORDER_STATUS_PAID, 3),
+                (self.buyer, ORDER_STATUS_INCOMPLETE, 2),
+                (other, ORDER_STATUS_PAID, 1),
+                (self.buyer, ORDER_STATUS_CLOSED, 0)):
+            order = Order.objects.create(user=user, status=status)
+            Order.objects.filter(id=order.id).update(
+                created_at=self.now - timedelta(days=days)
+            )
+            self.orders.append(order.id)
+
+    def get_ids(self, url: str, params: dict = None) -> list:
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [order['order_id'] for order in response.data['results']]
+
+    def test_own_orders_newest_first(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(
+            self.get_ids('/shop/orders/'),
+            [self.orders[3], self.orders[1], self.orders[0]]
+        )
+
+    def test_filters(self):
+        self.client.force_authenticate(
+            User.objects.create_superuser('admin@example.com', None)
+        )
+        self.assertEqual(
+            self.get_ids('/shop/orders/', {
+                'created_after': (self.now - timedelta(days=2)).isoformat(),
+                'created_before': self.now.isoformat(),
+            }),
+            [self.orders[2], self.orders[1]]
+        )
+        self.assertEqual(
+            self.get_ids('/shop/orders/', {
+                'status': [ORDER_STATUS_PAID, ORDER_STATUS_CLOSED],
+                'user': self.buyer.id,
+            }),
+            [self.orders[3], self.orders[0]]
+        )
+
+    def test_queue_of_paid_orders_oldest_first(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(
+            self.client.get('/shop/orders/queue/').status_code, 403
+        )
+
+        self.client.force_authenticate(
+            User.objects.create_superuser('admin@example.com', None)
+        )
+        self.assertEqual(
+            self.get_ids('/shop/orders/queue/'),
+            [self.orders[0], self.orders[2]]
+        )
+
+
+class SalesReportTestCase(CatalogMixin, TestCase):
+    NAME_FIELDS = {'products': 'product_name', 'categories': 'category_name'}
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(
+            User.objects.create_superuser('admin@example.com', None)
+        )
+        electronics = Category.objects.create(name='electronics')
+        self.phones = Category.objects.create(
+            name='phones', parent=electronics
+        )
+        self.phone = self.create_product('phone', 100, self.phones)
+        self.cable = self.create_product('cable', 5, electronics)
+        self.buyer = User.objects.create_user('buyer@example.com', None)
+
+        order_ids = [
+            self.create_order({self.phone: 1, self.cable: 2}),
+            self.create_order({self.cable: 1}),
+            # never closed
+            self.create_order({self.phone: 5}),
+        ]
+        OrderStatusUtil.close(order_ids[:2])
+        self.today = timezone.localdate().isoformat()
+
+    def create_order(self, counts: dict) -> int:
+        order = Order.objects.create(user=self.buyer, status=ORDER_STATUS_PAID)
+        OrderProductM2M.objects.bulk_create(
+            OrderProductM2M(order=order, product=product,
+                            product_count=count, unit_price=product.price)
+            for product, count in counts.items()
+        )
+        return order.id
+
+    def get_report(self, report: str, query: str = '') -> list:
+        response = self.client.get(
+            f'/shop/reports/sales/{report}/'
+            f'?date_from={self.today}&date_to={self.today}{query}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row[self.NAME_FIELDS[report]], row['units'], row['revenue'])
+            for row in response.data
+        ]
+
+    def test_closed_orders_are_reported_best_selling_first(self):
+        self.assertEqual(self.get_report('products'), [
+            ('phone', 1, '100.00'), ('cable', 3, '15.00'),
+        ])
+        self.assertEqual(self.get_report('products', '&limit=1'), [
+            ('phone', 1, '100.00'),
+        ])
+        # categories include their descendants' sales
+        self.assertEqual(self.get_report('categories'), [
+            ('electronics', 4, '115.00'), ('phones', 1, '100.00'),
+        ])
+        self.assertEqual(
+            self.get_report('categories', f'&parent={self.phones.parent_id}'),
+            [('phones', 1, '100.00')]
+        )
+
+    def test_rebuild_matches_the_incremental_rows(self):
+        products = self.get_report('products')
+        categories = self.get_report('categories')
+
+        day = timezone.localdate()
+        self.assertEqual(list(SalesRollupUtil.rebuild(day, day)),
+                         [(day, 2, 2)])
+        self.assertEqual(self.get_report('products'), products)
+        self.assertEqual(self.get_report('categories'), categories)
+
+    def test_date_range_is_required(self):
+        response = self.client.get('/shop/reports/sales/products/')
+        self.assertEqual(response.status_code, 400)
+
+
+class RelatedProductTestCase(CatalogMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        electronics = Category.objects.create(name='electronics')
+        phones = Category.objects.create(name='phones', parent=electronics)
+        self.phone = self.create_product('phone', 1, phones)
+        self.products = {
+            name: self.create_product(name, 1)
+            for name in ('charger', 'earphones', 'sticker')
+        }
+        self.products['case'] = self.create_product('case', 1, phones)
+        self.products['cable'] = self.create_product('cable', 1, electronics)
+
+        buyer = User.objects.create_user('buyer@example.com', None)
+        # sticker is bought with the phone only once: not a pair
+        for name, times in (('charger', 3), ('earphones', 2), ('sticker', 1)):
+            for _ in range(times):
+                order = Order.objects.create(
+                    user=buyer, status=ORDER_STATUS_CLOSED
+                )
+                OrderProductM2M.objects.bulk_create(
+                    OrderProductM2M(order=order, product=product,
+                                    product_count=1, unit_price=1)
+                    for product in (self.phone, self.products[name])
+                )
+        Order.objects.update(closed_at=timezone.now() - timedelta(hours=1))
+
+        list(ProductRecommendationUtil.update())
+
+    def get_related(self, product: Product, limit: int) -> list:
+        response = self.client.get(
+            f'/shop/products/{product.id}/related/?limit={limit}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data]
+
+    def test_frequently_bought_together_first(self):
+        self.assertEqual(self.get_related(self.phone, 2),
+                         ['charger', 'earphones'])
+        self.assertEqual(self.get_related(self.products['charger'], 10),
+                         ['phone'])
+
+    def test_topped_up_with_the_category_subtree(self):
+        self.assertEqual(self.get_related(self.phone, 10),
+                         ['charger', 'earphones', 'case', 'cable'])
+
+    def test_unknown_product_and_invalid_limit(self):
+        self.assertEqual(
+            self.client.get('/shop/products/0/related/').status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(
+                f'/shop/products/{self.phone.id}/related/?limit=0'
+            ).status_code,
+            400
+        )
@@ -8,12 +8,16 @@ from rest_framework import (
 )
 
 from .views import (
+    AdminBulkCloseOrderView,
     AdminCloseOrderView,
     CartProductsView,
+    CartSummaryView,
+    CategorySalesReportView,
     CategoryViewset,
     CartToOrderView,
     ClearCartView,
     OrderViewSet,
+    ProductSalesReportView,
     ProductViewset,
 )
 
@@ -26,10 +30,15 @@ router.register('orders', OrderViewSet, 'order')
 
 urlpatterns = [
     path('orders/make_from_cart/', CartToOrderView.as_view()),
+    path('orders/close/', AdminBulkCloseOrderView.as_view()),
     path('orders/<int:order_id>/close/', AdminCloseOrderView.as_view()),
 
     path('cart/products/', CartProductsView.as_view()),
     path('cart/clear/', ClearCartView.as_view()),
+    path('cart/summary/', CartSummaryView.as_view()),
+
+    path('reports/sales/products/', ProductSalesReportView.as_view()),
+    path('reports/sales/categories/', CategorySalesReportView.as_view()),
 
     path('', include(router.urls)),
 ]
@@ -2,3 +2,37 @@
 from .delta_util import (
     DeltaUtil,
 )
+from .search_util import (
+    ProductSearchUtil,
+)
+from .category_tree_util import (
+    CategoryTreeUtil,
+)
+from .facet_util import (
+    ProductFacetUtil,
+)
+from .product_import_util import (
+    ProductImportUtil,
+)
+from .checkout_util import (
+    CheckoutUtil,
+    OrderTotalsUtil,
+)
+from .cart_cache_util import (
+    CartCacheUtil,
+)
+from .guest_cart_util import (
+    GuestCartUtil,
+)
+from .order_status_util import (
+    OrderStatusUtil,
+)
+from .sales_rollup_util import (
+    SalesRollupUtil,
+)
+from .recommendation_util import (
+    ProductRecommendationUtil,
+)
+from .stock_util import (
+    StockUtil,
+)
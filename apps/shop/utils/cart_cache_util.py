@@ -0,0 +1,179 @@
+from decimal import (
+    Decimal,
+)
+
+from django.core.cache import (
+    cache,
+)
+from django.db import (
+    transaction,
+)
+
+from apps.shop.models import (
+    CartProductM2M,
+    Product,
+)
+
+
+class CartCacheUtil:
+    """Per-user cart snapshot kept in the shared cache.\n
+    `{"lines": [{"product_id": <<int>>, "product_count": <<int>>,
+    "product_name": <<str>>} * n], "line_count": <<int>>,
+    "item_count": <<int>>, "total": <<decimal str>>}`\n
+    Two kinds of entries are cached: the cart lines
+    (`[(product id, product count)]`, written through by the cart views
+    after every mutation) and the name and price of every product in a
+    cart. Snapshots are assembled and priced on read, so a product rename
+    or price change only drops that product's entry, never the carts.
+    The timeout bounds the staleness left by two racing write-throughs of
+    the same cart.
+    """
+
+    CACHE_KEY = 'cart:{user_id}'
+    PRODUCT_CACHE_KEY = 'cart_product:{product_id}'
+    CACHE_TIMEOUT = 10 * 60
+
+    @classmethod
+    def get_key(cls, user_id: int) -> str:
+        return cls.CACHE_KEY.format(user_id=user_id)
+
+    @classmethod
+    def get_product_key(cls, product_id: int) -> str:
+        return cls.PRODUCT_CACHE_KEY.format(product_id=product_id)
+
+    @staticmethod
+    def get_empty_snapshot() -> dict:
+        return {
+            'lines': [],
+            'line_count': 0,
+            'item_count': 0,
+            'total': '0.00',
+        }
+
+    @classmethod
+    def make_snapshot(cls, lines) -> dict:
+        """
+        lines: `[(product_id, product_count, product_name, price)]`
+        """
+        snapshot = cls.get_empty_snapshot()
+        total = Decimal('0.00')
+        for product_id, product_count, product_name, price in lines:
+            snapshot['lines'].append({
+                'product_id': product_id,
+                'product_count': product_count,
+                'product_name': product_name,
+            })
+            snapshot['line_count'] += 1
+            snapshot['item_count'] += product_count
+            total += product_count * price
+        snapshot['total'] = str(total)
+
+        return snapshot
+
+    @classmethod
+    def get_products(cls, product_ids: list) -> dict:
+        """
+        `{product id: (name, price)}` from the cache, the missing ones with
+        a single query (deleted products are left out)
+        """
+        keys = {
+            cls.get_product_key(product_id): product_id
+            for product_id in product_ids
+        }
+        products = {
+            keys[key]: product for key, product
+            in cache.get_many(list(keys)).items()
+        }
+
+        missing = [
+            product_id for product_id in product_ids
+            if product_id not in products
+        ]
+        if missing:
+            fetched = {
+                product_id: (name, price) for product_id, name, price
+                in Product.objects.filter(id__in=missing)
+                .values_list('id', 'name', 'price')
+            }
+            cls.set_products(fetched)
+            products.update(fetched)
+
+        return products
+
+    @classmethod
+    def set_products(cls, products: dict):
+        cache.set_many({
+            cls.get_product_key(product_id): product
+            for product_id, product in products.items()
+        }, cls.CACHE_TIMEOUT)
+
+    @classmethod
+    def price_lines(cls, lines: list) -> dict:
+        """
+        Snapshot of `[(product id, product count)]`, priced at the current
+        prices
+        """
+        products = cls.get_products([product_id for product_id, _ in lines])
+        return cls.make_snapshot(
+            (product_id, product_count, *products[product_id])
+            for product_id, product_count in lines
+            if product_id in products
+        )
+
+    @classmethod
+    def get(cls, user_id: int) -> dict:
+        lines = cache.get(cls.get_key(user_id))
+        if lines is None:
+            return cls.refresh(user_id)
+
+        return cls.price_lines(lines)
+
+    @classmethod
+    def refresh(cls, user_id: int) -> dict:
+        """
+        Write-through: rebuilds the snapshot from the database (a single
+        query) and caches its lines and products
+        """
+        rows = list(
+            CartProductM2M.objects
+            .filter(cart__user_id=user_id)
+            .order_by('id')
+            .values_list('product_id', 'product_count',
+                         'product__name', 'product__price')
+        )
+        cache.set(
+            cls.get_key(user_id),
+            [(product_id, product_count)
+             for product_id, product_count, _, _ in rows],
+            cls.CACHE_TIMEOUT
+        )
+        cls.set_products({
+            product_id: (name, price) for product_id, _, name, price in rows
+        })
+
+        return cls.make_snapshot(rows)
+
+    @classmethod
+    def set_empty(cls, user_id: int) -> dict:
+        """
+        Write-through of a just cleared cart, no query
+        """
+        cache.set(cls.get_key(user_id), [], cls.CACHE_TIMEOUT)
+        return cls.get_empty_snapshot()
+
+    @classmethod
+    def invalidate(cls, user_id: int):
+        """
+        Drops the cart lines once the current transaction is committed
+        (for writes that bypass the cart views, e.g. the admin)
+        """
+        transaction.on_commit(lambda: cache.delete(cls.get_key(user_id)))
+
+    @classmethod
+    def invalidate_products(cls, product_ids: list):
+        """
+        Drops the cached names and prices once the current transaction is
+        committed
+        """
+        keys = [cls.get_product_key(product_id) for product_id in product_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,164 @@
+import time
+
+from django.core.cache import (
+    cache,
+)
+from django.db.models import (
+    Count,
+)
+
+from apps.base.utils import (
+    CacheVersionUtil,
+)
+from apps.shop.models import (
+    Category,
+)
+
+
+class CategoryTreeUtil:
+    """Whole category tree with direct and cumulative product counts.\n
+    The tree is built by a single MPTT-ordered query, stored in the shared
+    cache under the `category_tree` collection version and memoized by
+    every worker until the version is bumped.\n
+    After a bump a single worker (the holder of the `cache.add` lock)
+    rebuilds the tree; the others keep serving their previous tree, or
+    wait for the rebuilt one if they have none.
+    """
+
+    COLLECTION = 'category_tree'
+    CACHE_KEY = 'category_tree:{version}'
+    CACHE_TIMEOUT = 24 * 60 * 60
+    LOCK_KEY = 'category_tree:{version}:lock'
+    # longer than any rebuild, so that a crashed builder is replaced
+    LOCK_TIMEOUT = 30
+    WAIT_INTERVAL = 0.05
+
+    # (version, tree, parent map) of this worker
+    _local_tree = (None, None, None)
+
+    @classmethod
+    def get_tree(cls) -> list:
+        return cls._get_local_tree()[1]
+
+    @classmethod
+    def get_parent_map(cls) -> dict:
+        """
+        {category id: parent id or None}
+        """
+        return cls._get_local_tree()[2]
+
+    @classmethod
+    def get_ancestor_ids(cls, category_id: int, include_self=True) -> list:
+        parent_map = cls.get_parent_map()
+        ancestor_ids = [category_id] if include_self else []
+        parent_id = parent_map.get(category_id)
+        while parent_id is not None:
+            ancestor_ids.append(parent_id)
+            parent_id = parent_map.get(parent_id)
+
+        return ancestor_ids
+
+    @classmethod
+    def _get_local_tree(cls) -> tuple:
+        version = CacheVersionUtil.get_version(cls.COLLECTION)
+        if cls._local_tree[0] == version:
+            return cls._local_tree
+
+        tree = cls._get_shared_tree(version)
+        if tree is None:
+            # being rebuilt by another worker
+            return cls._local_tree
+
+        cls._local_tree = (version, tree, cls.build_parent_map(tree))
+        return cls._local_tree
+
+    @classmethod
+    def _get_shared_tree(cls, version: int):
+        """
+        The tree of the version, built here if this worker gets the lock;
+        None if another worker is building it and there is a previous tree
+        to serve meanwhile
+        """
+        key = cls.CACHE_KEY.format(version=version)
+        lock_key = cls.LOCK_KEY.format(version=version)
+        deadline = time.monotonic() + cls.LOCK_TIMEOUT
+        while True:
+            tree = cache.get(key)
+            if tree is not None:
+                return tree
+
+            if cache.add(lock_key, True, cls.LOCK_TIMEOUT) \
+                    or time.monotonic() > deadline:
+                try:
+                    tree = cls.build_tree()
+                    cache.set(key, tree, cls.CACHE_TIMEOUT)
+                finally:
+                    cache.delete(lock_key)
+                return tree
+
+            if cls._local_tree[1] is not None:
+                return None
+            time.sleep(cls.WAIT_INTERVAL)
+
+    @staticmethod
+    def build_tree() -> list:
+        categories = Category.objects \
+            .annotate(product_count=Count('product')) \
+            .order_by('tree_id', 'lft') \
+            .values_list('id', 'name', 'parent_id', 'product_count')
+
+        roots = []
+        nodes = {}
+        for category_id, name, parent_id, product_count in categories:
+            node = {
+                'id': category_id,
+                'name': name,
+                'product_count': product_count,
+                'total_product_count': product_count,
+                'children': [],
+            }
+            nodes[category_id] = (node, parent_id)
+            # MPTT order: a parent always precedes its children
+            if parent_id is None:
+                roots.append(node)
+            else:
+                nodes[parent_id][0]['children'].append(node)
+
+        # children follow their parents, so reversed order is bottom-up
+        for node, parent_id in reversed(list(nodes.values())):
+            if parent_id is not None:
+                nodes[parent_id][0]['total_product_count'] += \
+                    node['total_product_count']
+
+        return roots
+
+    @classmethod
+    def get_path_map(cls, separator: str = '/') -> dict:
+        """
+        {category id: "<root name>/.../<category name>"}
+        """
+        path_map = {}
+        stack = [(node, '') for node in cls.get_tree()]
+        while stack:
+            node, parent_path = stack.pop()
+            path = f'{parent_path}{separator}{node["name"]}' if parent_path \
+                else node['name']
+            path_map[node['id']] = path
+            stack.extend((child, path) for child in node['children'])
+
+        return path_map
+
+    @staticmethod
+    def build_parent_map(tree: list) -> dict:
+        parent_map = {}
+        stack = [(node, None) for node in tree]
+        while stack:
+            node, parent_id = stack.pop()
+            parent_map[node['id']] = parent_id
+            stack.extend((child, node['id']) for child in node['children'])
+
+        return parent_map
+
+    @classmethod
+    def invalidate(cls):
+        CacheVersionUtil.bump(cls.COLLECTION)
@@ -0,0 +1,121 @@
+from decimal import (
+    Decimal,
+)
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import (
+    Coalesce,
+)
+
+from .stock_util import (
+    StockUtil,
+)
+from apps.shop.exceptions import (
+    EmptyCartException,
+)
+from apps.shop.models import (
+    Cart,
+    CartProductM2M,
+    Order,
+    OrderProductM2M,
+    Product,
+)
+
+
+class OrderTotalsUtil:
+
+    @staticmethod
+    def refresh(order_ids: list) -> int:
+        """
+        Recomputes the denormalized Order.total / item_count from the order
+        lines, in a single UPDATE
+        """
+        lines = OrderProductM2M.objects \
+            .filter(order_id=OuterRef('id')).order_by().values('order_id')
+
+        return Order.objects.filter(id__in=order_ids).update(
+            total=Coalesce(Subquery(lines.annotate(total=Sum(
+                F('product_count') * F('unit_price'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )).values('total')), Decimal('0.00')),
+            item_count=Coalesce(Subquery(lines.annotate(
+                item_count=Sum('product_count')
+            ).values('item_count')), 0),
+        )
+
+
+class CheckoutUtil:
+
+    @staticmethod
+    def copy_cart_to_order(cart_id: int, order_id: int) -> int:
+        """
+        `INSERT INTO <order lines> SELECT <cart lines> JOIN <products>`,
+        with the current product prices as unit prices;
+        returns the number of copied lines
+        """
+        qn = connection.ops.quote_name
+        order_line = OrderProductM2M._meta
+        cart_line = CartProductM2M._meta
+        product = Product._meta
+
+        def column(meta, field_name):
+            return qn(meta.get_field(field_name).column)
+
+        sql = (
+            f'INSERT INTO {qn(order_line.db_table)} ('
+            f'{column(order_line, "order")}, '
+            f'{column(order_line, "product")}, '
+            f'{column(order_line, "product_count")}, '
+            f'{column(order_line, "unit_price")}) '
+            f'SELECT %s, c.{column(cart_line, "product")}, '
+            f'c.{column(cart_line, "product_count")}, '
+            f'p.{column(product, "price")} '
+            f'FROM {qn(cart_line.db_table)} c '
+            f'INNER JOIN {qn(product.db_table)} p '
+            f'ON p.{qn(product.pk.column)} = c.{column(cart_line, "product")} '
+            f'WHERE c.{column(cart_line, "cart")} = %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (order_id, cart_id))
+            return cursor.rowcount
+
+    @classmethod
+    def checkout(cls, user) -> Order:
+        """
+        Creates an Order from the user's Cart and clears the Cart, in one
+        transaction; the Cart row is locked, so concurrent checkouts of the
+        same cart are serialized (the second one finds the cart empty).
+        The products' stock is reserved first (see StockUtil).\n
+        May raise EmptyCartException, OutOfStockException
+        """
+        with transaction.atomic():
+            cart_id = Cart.objects.select_for_update() \
+                .filter(user=user).values_list('id', flat=True).first()
+            if cart_id is None:
+                raise EmptyCartException
+
+            lines = CartProductM2M.objects.filter(cart_id=cart_id) \
+                .values_list('product_id', 'product_count', 'product__stock',
+                             'product__stock_shard_count')
+            if not lines:
+                raise EmptyCartException
+            StockUtil.reserve(lines)
+
+            order = Order.objects.create(user=user)
+            if not cls.copy_cart_to_order(cart_id, order.id):
+                raise EmptyCartException
+
+            OrderTotalsUtil.refresh([order.id])
+            CartProductM2M.objects.filter(cart_id=cart_id).delete()
+
+        return order
@@ -1,7 +1,18 @@
+from django.db import (
+    transaction,
+)
 from django.db.models import (
+    Case,
+    F,
     Model,
+    Q,
+    Value,
+    When,
 )
 
+from apps.base.utils import (
+    UpsertUtil,
+)
 from apps.shop.exceptions import (
     NonPositiveCountException,
 )
@@ -46,3 +57,100 @@ class DeltaUtil:
                 )
             else:
                 raise NonPositiveCountException
+
+    @staticmethod
+    def atomic_delta(model: Model,
+                     identifier: dict,
+                     delta_field: str,
+                     delta_value):
+        """
+        Concurrency-safe smart_delta:\n
+        delta_value > 0: a single upsert,
+        `INSERT ... ON CONFLICT (identifier) DO UPDATE SET f = f + delta`
+        delta_value < 0: a conditional
+        `UPDATE ... SET f = f + delta WHERE f + delta >= 0`
+        (raises if no row matched), then a `DELETE ... WHERE f = 0`;
+        two statements, but the UPDATE keeps the row locked until the
+        transaction ends, so the DELETE sees the value it produced;
+        `identifier` fields must be unique together
+        """
+        with transaction.atomic():
+            if delta_value > 0:
+                UpsertUtil.upsert_increment(
+                    model,
+                    tuple(identifier),
+                    [{**identifier, delta_field: delta_value}],
+                    (delta_field,)
+                )
+                return
+
+            updated = model.objects.filter(
+                **identifier, **{f'{delta_field}__gte': -delta_value}
+            ).update(**{delta_field: F(delta_field) + delta_value})
+            if not updated:
+                raise NonPositiveCountException
+
+            model.objects.filter(**identifier, **{delta_field: 0}).delete()
+
+    @staticmethod
+    def atomic_bulk_delta(model: Model,
+                          identifier: dict,
+                          key_field: str,
+                          deltas: dict,
+                          delta_field: str,
+                          insert_values: dict = None):
+        """
+        atomic_delta for many `key_field` values at once, in one transaction:
+        deltas: {key: delta != 0},
+        insert_values: {key: {field: value}}, stored on insert only\n
+        one upsert for all the positive deltas,
+        one conditional UPDATE for all the negative ones (raises unless
+        every row matched), one DELETE of the rows that reached 0;
+        `identifier` fields + `key_field` must be unique together
+        """
+        positive = {key: delta for key, delta in deltas.items() if delta > 0}
+        negative = {key: delta for key, delta in deltas.items() if delta < 0}
+        insert_values = insert_values or {}
+        insert_fields = tuple(next(iter(insert_values.values()), ()))
+        key_attname = model._meta.get_field(key_field).attname
+
+        with transaction.atomic():
+            UpsertUtil.upsert_increment(
+                model,
+                (*identifier, key_field),
+                [
+                    {
+                        **identifier,
+                        key_field: key,
+                        delta_field: delta,
+                        **insert_values.get(key, {}),
+                    }
+                    for key, delta in positive.items()
+                ],
+                (delta_field,),
+                insert_fields
+            )
+
+            if not negative:
+                return
+
+            condition = Q()
+            for key, delta in negative.items():
+                condition |= Q(**{
+                    key_attname: key, f'{delta_field}__gte': -delta
+                })
+            updated = model.objects.filter(condition, **identifier).update(**{
+                delta_field: F(delta_field) + Case(
+                    *(
+                        When(**{key_attname: key}, then=Value(delta))
+                        for key, delta in negative.items()
+                    ),
+                    output_field=model._meta.get_field(delta_field)
+                )
+            })
+            if updated != len(negative):
+                raise NonPositiveCountException
+
+            model.objects.filter(**identifier, **{
+                f'{key_attname}__in': list(negative), delta_field: 0
+            }).delete()
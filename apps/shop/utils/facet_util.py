@@ -0,0 +1,166 @@
+import hashlib
+import json
+from decimal import Decimal
+
+from django.core.cache import (
+    cache,
+)
+from django.db.models import (
+    Count,
+    Max,
+    Min,
+    Q,
+    QuerySet,
+)
+
+from .category_tree_util import (
+    CategoryTreeUtil,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
+)
+from apps.shop.models import (
+    Product,
+)
+
+
+class ProductFacetUtil:
+    """Category and price facet counts of a filtered product queryset.\n
+    Category counts come from one GROUP BY query and are rolled up through
+    the cached category tree, price buckets from one aggregate query
+    (plus a MIN/MAX query for adaptive buckets). Results are cached per
+    normalized filter signature and catalog version.
+    """
+
+    FACET_CATEGORY = 'category'
+    FACET_PRICE = 'price'
+    FACETS = (FACET_CATEGORY, FACET_PRICE)
+
+    PRICE_BUCKETS_FIXED = 'fixed'
+    PRICE_BUCKETS_ADAPTIVE = 'adaptive'
+    PRICE_BUCKET_BOUNDARIES = (
+        Decimal(10), Decimal(50), Decimal(100), Decimal(500), Decimal(1000),
+    )
+    ADAPTIVE_PRICE_BUCKET_COUNT = 5
+
+    CACHE_KEY = 'product_facets:{product_version}:{tree_version}:{signature}'
+    CACHE_TIMEOUT = 10 * 60
+
+    @classmethod
+    def parse_facets(cls, value: str) -> tuple:
+        if not value:
+            return ()
+        requested = {facet.strip() for facet in value.split(',')}
+        return tuple(facet for facet in cls.FACETS if facet in requested)
+
+    @staticmethod
+    def get_signature(filter_params: dict) -> str:
+        """
+        filter_params: {filter name: [values]}, order-insensitive
+        """
+        normalized = sorted(
+            (name, sorted(values))
+            for name, values in filter_params.items() if values
+        )
+        return hashlib.md5(
+            json.dumps(normalized).encode('utf8')
+        ).hexdigest()
+
+    @classmethod
+    def get_facets(cls, queryset: QuerySet, facets: tuple, signature: str,
+                   price_buckets: str = PRICE_BUCKETS_FIXED) -> dict:
+        key = cls.CACHE_KEY.format(
+            product_version=CacheVersionUtil.get_model_version(Product),
+            tree_version=CacheVersionUtil.get_version(
+                CategoryTreeUtil.COLLECTION
+            ),
+            signature=f'{signature}:{",".join(facets)}:{price_buckets}',
+        )
+        result = cache.get(key)
+        if result is None:
+            queryset = queryset.order_by()
+            result = {}
+            if cls.FACET_CATEGORY in facets:
+                result[cls.FACET_CATEGORY] = \
+                    cls.get_category_counts(queryset)
+            if cls.FACET_PRICE in facets:
+                result[cls.FACET_PRICE] = \
+                    cls.get_price_buckets(queryset, price_buckets)
+            cache.set(key, result, cls.CACHE_TIMEOUT)
+
+        return result
+
+    @staticmethod
+    def get_category_counts(queryset: QuerySet) -> list:
+        """
+        `[{"id": <<int>>, "count": <<int>>} * n]`, a product is counted in
+        its category and in all of the category's ancestors
+        """
+        direct_counts = queryset \
+            .filter(category__isnull=False) \
+            .values_list('category') \
+            .annotate(count=Count('id'))
+
+        counts = {}
+        for category_id, count in direct_counts:
+            for ancestor_id in CategoryTreeUtil.get_ancestor_ids(category_id):
+                counts[ancestor_id] = counts.get(ancestor_id, 0) + count
+
+        return [
+            {'id': category_id, 'count': count}
+            for category_id, count in sorted(counts.items())
+        ]
+
+    @classmethod
+    def get_price_buckets(cls, queryset: QuerySet, price_buckets: str) \
+            -> list:
+        """
+        `[{"min": <<price | null>>, "max": <<price | null>>,
+        "count": <<int>>} * n]`, `min` inclusive, `max` exclusive
+        """
+        if price_buckets == cls.PRICE_BUCKETS_ADAPTIVE:
+            boundaries = cls.get_adaptive_boundaries(queryset)
+        else:
+            boundaries = cls.PRICE_BUCKET_BOUNDARIES
+
+        ranges = list(zip((None, *boundaries), (*boundaries, None)))
+        aggregates = {}
+        for i, (low, high) in enumerate(ranges):
+            price_filter = Q()
+            if low is not None:
+                price_filter &= Q(price__gte=low)
+            if high is not None:
+                price_filter &= Q(price__lt=high)
+            aggregates[f'bucket_{i}'] = Count('id', filter=price_filter)
+        counts = queryset.aggregate(**aggregates)
+
+        return [
+            {
+                'min': low if low is None else str(low),
+                'max': high if high is None else str(high),
+                'count': counts[f'bucket_{i}'],
+            }
+            for i, (low, high) in enumerate(ranges)
+            if counts[f'bucket_{i}']
+        ]
+
+    @classmethod
+    def get_adaptive_boundaries(cls, queryset: QuerySet) -> tuple:
+        """
+        Equal-width inner boundaries between the cheapest and the most
+        expensive product, rounded to whole currency units
+        """
+        prices = queryset.aggregate(min_price=Min('price'),
+                                    max_price=Max('price'))
+        if prices['min_price'] is None:
+            return ()
+
+        low = prices['min_price'].to_integral_value()
+        width = (prices['max_price'] - low) / cls.ADAPTIVE_PRICE_BUCKET_COUNT
+        boundaries = (
+            (low + width * i).to_integral_value()
+            for i in range(1, cls.ADAPTIVE_PRICE_BUCKET_COUNT)
+        )
+        return tuple(sorted({
+            boundary for boundary in boundaries if boundary > low
+        }))
@@ -0,0 +1,154 @@
+import json
+
+from django.db import (
+    transaction,
+)
+
+from .cart_cache_util import (
+    CartCacheUtil,
+)
+from apps.base.utils import (
+    UpsertUtil,
+)
+from apps.shop.exceptions import (
+    CartLimitException,
+    NonPositiveCountException,
+)
+from apps.shop.models import (
+    Cart,
+    CartProductM2M,
+    Product,
+)
+
+
+class GuestCartUtil:
+    """Carts of anonymous users, kept client-side in a signed cookie.\n
+    The cookie holds `{"<product_id>": <<product_count>>}` only, so
+    browsing as a guest never writes to the database; the guest cart is
+    merged into the user's persisted Cart on login.
+    """
+
+    COOKIE_NAME = 'guest_cart'
+    COOKIE_SALT = 'apps.shop.guest_cart'
+    COOKIE_MAX_AGE = 30 * 24 * 60 * 60
+    # keeps the cookie well below the 4KB browser limit
+    MAX_LINES = 100
+
+    @classmethod
+    def read(cls, request) -> dict:
+        """
+        `{product_id: product_count > 0}`, empty if the cookie is missing
+        or has been tampered with
+        """
+        value = request.get_signed_cookie(
+            cls.COOKIE_NAME, default=None, salt=cls.COOKIE_SALT,
+            max_age=cls.COOKIE_MAX_AGE
+        )
+        if value is None:
+            return {}
+
+        try:
+            return {
+                int(product_id): int(product_count)
+                for product_id, product_count in json.loads(value).items()
+                if int(product_count) > 0
+            }
+        except (ValueError, TypeError, AttributeError):
+            return {}
+
+    @classmethod
+    def write(cls, response, lines: dict):
+        if not lines:
+            cls.clear(response)
+            return
+
+        response.set_signed_cookie(
+            cls.COOKIE_NAME,
+            json.dumps(lines, separators=(',', ':')),
+            salt=cls.COOKIE_SALT,
+            max_age=cls.COOKIE_MAX_AGE,
+            httponly=True,
+            samesite='Lax',
+        )
+
+    @classmethod
+    def clear(cls, response):
+        response.delete_cookie(cls.COOKIE_NAME, samesite='Lax')
+
+    @classmethod
+    def apply_deltas(cls, lines: dict, deltas: dict) -> dict:
+        """
+        deltas: `{product_id: delta != 0}`, applied all or nothing;
+        may raise NonPositiveCountException, CartLimitException
+        """
+        lines = dict(lines)
+        for product_id, delta in deltas.items():
+            product_count = lines.get(product_id, 0) + delta
+            if product_count < 0:
+                raise NonPositiveCountException
+            elif product_count == 0:
+                lines.pop(product_id, None)
+            else:
+                lines[product_id] = product_count
+
+        if len(lines) > cls.MAX_LINES:
+            raise CartLimitException
+
+        return lines
+
+    @staticmethod
+    def get_snapshot(lines: dict) -> dict:
+        """
+        Same shape as CartCacheUtil snapshots, a single query
+        (deleted products are skipped)
+        """
+        products = Product.objects \
+            .filter(id__in=lines) \
+            .order_by('id') \
+            .values_list('id', 'name', 'price')
+
+        return CartCacheUtil.make_snapshot(
+            (product_id, lines[product_id], name, price)
+            for product_id, name, price in products
+        )
+
+    @classmethod
+    def merge(cls, user, lines: dict):
+        """
+        Adds the guest cart lines to the user's Cart (created if needed)
+        with a single bulk upsert; raises CartLimitException, merging
+        nothing, if the merged cart would have more than MAX_LINES lines
+        """
+        if not lines:
+            return
+
+        with transaction.atomic():
+            # products may have been deleted since they were added
+            product_ids = list(
+                Product.objects.filter(id__in=lines)
+                .values_list('id', flat=True)
+            )
+            cart, _ = Cart.objects.get_or_create(user=user)
+
+            merged_product_ids = set(product_ids).union(
+                CartProductM2M.objects.filter(cart=cart)
+                .values_list('product_id', flat=True)
+            )
+            if len(merged_product_ids) > cls.MAX_LINES:
+                raise CartLimitException
+
+            UpsertUtil.upsert_increment(
+                CartProductM2M,
+                ('cart', 'product'),
+                [
+                    {
+                        'cart': cart,
+                        'product': product_id,
+                        'product_count': lines[product_id],
+                    }
+                    for product_id in product_ids
+                ],
+                ('product_count',)
+            )
+
+        CartCacheUtil.invalidate(user.id)
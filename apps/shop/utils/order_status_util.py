@@ -0,0 +1,118 @@
+from typing import (
+    Iterable,
+)
+
+from django.db import (
+    transaction,
+)
+from django.utils import (
+    timezone,
+)
+
+from .sales_rollup_util import (
+    SalesRollupUtil,
+)
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.shop.models import (
+    Order,
+    ORDER_STATUS_CLOSED,
+    ORDER_STATUS_PAID,
+)
+
+
+class OrderStatusUtil:
+    """Bulk order status transitions.\n
+    Each chunk of ids is handled in its own transaction: the orders in the
+    source status are locked and moved with one conditional UPDATE, the
+    rest of the chunk is told apart into orders in another status and
+    missing ones. Closed orders are added to the sales rollups in the same
+    transaction.\n
+    Outcomes: `{"updated": [<<id>>], "wrong_status": [<<id>>],
+    "missing": [<<id>>]}`.
+    """
+
+    UPDATED = 'updated'
+    WRONG_STATUS = 'wrong_status'
+    MISSING = 'missing'
+
+    CHUNK_SIZE = 1000
+
+    @classmethod
+    def get_empty_outcomes(cls) -> dict:
+        return {cls.UPDATED: [], cls.WRONG_STATUS: [], cls.MISSING: []}
+
+    @classmethod
+    def transition(cls, order_ids: Iterable[int], from_status: str,
+                   to_status: str, chunk_size: int = None) -> dict:
+        outcomes = cls.get_empty_outcomes()
+        for chunk in StreamUtil.batched(
+                sorted(set(order_ids)), chunk_size or cls.CHUNK_SIZE):
+            for outcome, ids in cls.transition_chunk(
+                    chunk, from_status, to_status).items():
+                outcomes[outcome].extend(ids)
+
+        return outcomes
+
+    @classmethod
+    def transition_chunk(cls, order_ids: list, from_status: str,
+                         to_status: str) -> dict:
+        with transaction.atomic():
+            updated_ids = list(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids, status=from_status)
+                .order_by('id').values_list('id', flat=True)
+            )
+            now = timezone.now()
+            changes = {'status': to_status, 'updated_at': now}
+            if to_status == ORDER_STATUS_CLOSED:
+                changes['closed_at'] = now
+            # update() skips auto_now
+            Order.objects.filter(id__in=updated_ids).update(**changes)
+
+            if to_status == ORDER_STATUS_CLOSED:
+                SalesRollupUtil.add_orders(
+                    updated_ids, timezone.localdate(now)
+                )
+
+        rest = set(order_ids).difference(updated_ids)
+        existing_ids = set(
+            Order.objects.filter(id__in=rest).values_list('id', flat=True)
+        )
+
+        return {
+            cls.UPDATED: updated_ids,
+            cls.WRONG_STATUS: sorted(existing_ids),
+            cls.MISSING: sorted(rest - existing_ids),
+        }
+
+    @classmethod
+    def close(cls, order_ids: Iterable[int], chunk_size: int = None) \
+            -> dict:
+        """
+        paid -> closed
+        """
+        return cls.transition(
+            order_ids, ORDER_STATUS_PAID, ORDER_STATUS_CLOSED, chunk_size
+        )
+
+    @classmethod
+    def close_queryset(cls, queryset, chunk_size: int = None) -> dict:
+        """
+        Closes the paid orders of the queryset, reading its ids chunk by
+        chunk in id order
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        ids = queryset.filter(status=ORDER_STATUS_PAID) \
+            .order_by('id').values_list('id', flat=True)
+
+        outcomes = cls.get_empty_outcomes()
+        last_id = 0
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                return outcomes
+            for outcome, chunk_ids in cls.close(chunk).items():
+                outcomes[outcome].extend(chunk_ids)
+            last_id = chunk[-1]
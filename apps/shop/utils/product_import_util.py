@@ -0,0 +1,245 @@
+from decimal import (
+    Decimal,
+)
+from typing import (
+    Iterable,
+    Iterator,
+)
+
+from django.db import (
+    transaction,
+)
+from django.utils import (
+    timezone,
+)
+
+from .cart_cache_util import (
+    CartCacheUtil,
+)
+from .category_tree_util import (
+    CategoryTreeUtil,
+)
+from .search_util import (
+    ProductSearchUtil,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
+    StreamUtil,
+)
+from apps.shop.models import (
+    Category,
+    Product,
+)
+
+
+class ProductImportUtil:
+    """Streaming bulk import / export of products.\n
+    Rows: `{"id": <<int, optional>>, "name": <<str>>,
+    "description": <<html>>, "price": <<decimal>>,
+    "category": <<"<root>/.../<category>", optional>>}`.\n
+    Rows are parsed and validated without touching the database (so this
+    part can run in a process pool), then written batch by batch with one
+    `bulk_update` (rows with an id) and one `bulk_create` (rows without),
+    each batch in its own transaction.
+    """
+
+    FIELDNAMES = ('id', 'name', 'description', 'price', 'category')
+    CATEGORY_PATH_SEPARATOR = '/'
+
+    NAME_MAX_LENGTH = Product._meta.get_field('name').max_length
+    PRICE_FIELD = Product._meta.get_field('price')
+    PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+    MIN_PRICE = Decimal('0.01')
+
+    UPDATE_FIELDS = ('name', 'description', 'price', 'category',
+                     'search_document', 'updated_at')
+
+    @classmethod
+    def parse_row(cls, row: dict) -> dict:
+        """
+        Cleaned row, raises ValueError
+        """
+        row = StreamUtil.check_row(row)
+        product_id = row.get('id')
+        if product_id in (None, ''):
+            product_id = None
+        else:
+            product_id = int(product_id)
+
+        name = StreamUtil.get_text(row, 'name').strip()
+        if not name or len(name) > cls.NAME_MAX_LENGTH:
+            raise ValueError(
+                f'name must be 1 to {cls.NAME_MAX_LENGTH} characters long'
+            )
+
+        try:
+            price = Decimal(str(row.get('price')).strip())
+            if not price.is_finite():
+                raise ValueError('price must be a decimal number')
+            # never rounded: 12.345 is rejected, 12.340 accepted
+            quantized = price.quantize(cls.PRICE_QUANTUM)
+            if quantized != price:
+                raise ValueError(
+                    f'price must have at most '
+                    f'{cls.PRICE_FIELD.decimal_places} decimal places'
+                )
+        except ArithmeticError:
+            raise ValueError('price must be a decimal number')
+        price = quantized
+        if price < cls.MIN_PRICE or len(price.as_tuple().digits) \
+                > cls.PRICE_FIELD.max_digits:
+            raise ValueError('price out of range')
+
+        description = StreamUtil.get_text(row, 'description')
+        category_path = cls.CATEGORY_PATH_SEPARATOR.join(
+            part.strip() for part in StreamUtil.get_text(
+                row, 'category'
+            ).split(cls.CATEGORY_PATH_SEPARATOR) if part.strip()
+        )
+
+        return {
+            'id': product_id,
+            'name': name,
+            'description': description,
+            'price': price,
+            'category_path': category_path or None,
+            'search_document':
+                ProductSearchUtil.get_search_document(name, description),
+        }
+
+    @classmethod
+    def parse_batch(cls, batch: list) -> list:
+        """
+        [(line number, cleaned row or None, error or None)]
+        """
+        parsed = []
+        for line_number, row in batch:
+            try:
+                parsed.append((line_number, cls.parse_row(row), None))
+            except (ValueError, TypeError) as e:
+                parsed.append((line_number, None, str(e)))
+
+        return parsed
+
+    @classmethod
+    def import_rows(cls, rows: Iterable[dict], batch_size: int = 2000,
+                    workers: int = 1, create_categories: bool = False) \
+            -> Iterator[tuple]:
+        """
+        Yields `(created, updated, [(line number, error)])` per batch
+        """
+        category_ids = {
+            path: category_id for category_id, path
+            in CategoryTreeUtil.get_path_map(
+                cls.CATEGORY_PATH_SEPARATOR
+            ).items()
+        }
+
+        batches = StreamUtil.batched(enumerate(rows, start=1), batch_size)
+        try:
+            for parsed in StreamUtil.parallel_map(
+                    cls.parse_batch, batches, workers):
+                yield cls.write_batch(
+                    parsed, category_ids, create_categories
+                )
+        finally:
+            CacheVersionUtil.bump_model(Product)
+            CategoryTreeUtil.invalidate()
+
+    @classmethod
+    def write_batch(cls, parsed: list, category_ids: dict,
+                    create_categories: bool) -> tuple:
+        errors = []
+        products = []
+        now = timezone.now()
+        for line_number, row, error in parsed:
+            if error is None and row['category_path'] is not None:
+                category_id = cls.get_category_id(
+                    row['category_path'], category_ids, create_categories
+                )
+                if category_id is None:
+                    error = f'unknown category: {row["category_path"]}'
+            else:
+                category_id = None
+
+            if error is not None:
+                errors.append((line_number, error))
+                continue
+
+            products.append((line_number, Product(
+                id=row['id'],
+                name=row['name'],
+                description=row['description'],
+                price=row['price'],
+                category_id=category_id,
+                search_document=row['search_document'],
+                updated_at=now,
+            )))
+
+        with transaction.atomic():
+            existing_ids = set(Product.objects.filter(
+                id__in=[p.id for _, p in products if p.id is not None]
+            ).values_list('id', flat=True))
+
+            to_update = []
+            to_create = []
+            for line_number, product in products:
+                if product.id is None:
+                    to_create.append(product)
+                elif product.id in existing_ids:
+                    to_update.append(product)
+                else:
+                    errors.append((line_number, f'unknown id: {product.id}'))
+
+            Product.objects.bulk_update(to_update, cls.UPDATE_FIELDS)
+            Product.objects.bulk_create(to_create)
+            # bulk_update sends no post_save
+            CartCacheUtil.invalidate_products(
+                [product.id for product in to_update]
+            )
+
+            ProductSearchUtil.refresh_search_vectors(
+                Product.objects.filter(id__in=[
+                    product.id for product in to_update + to_create
+                    if product.id is not None
+                ])
+            )
+
+        return len(to_create), len(to_update), errors
+
+    @classmethod
+    def get_category_id(cls, path: str, category_ids: dict,
+                        create_categories: bool):
+        if path in category_ids or not create_categories:
+            return category_ids.get(path)
+
+        parent_path, _, name = path.rpartition(cls.CATEGORY_PATH_SEPARATOR)
+        parent_id = cls.get_category_id(
+            parent_path, category_ids, create_categories
+        ) if parent_path else None
+
+        category_ids[path] = Category.objects.create(
+            name=name, parent_id=parent_id
+        ).id
+        return category_ids[path]
+
+    @classmethod
+    def export_rows(cls, chunk_size: int = 2000) -> Iterator[dict]:
+        """
+        Streams all products, through a server-side cursor where supported
+        """
+        category_paths = CategoryTreeUtil.get_path_map(
+            cls.CATEGORY_PATH_SEPARATOR
+        )
+        products = Product.objects.order_by('id').values_list(
+            'id', 'name', 'description', 'price', 'category_id'
+        )
+        for product_id, name, description, price, category_id \
+                in products.iterator(chunk_size=chunk_size):
+            yield {
+                'id': product_id,
+                'name': name,
+                'description': description,
+                'price': str(price),
+                'category': category_paths.get(category_id, ''),
+            }
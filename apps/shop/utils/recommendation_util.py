@@ -0,0 +1,346 @@
+import datetime
+from typing import (
+    Iterator,
+)
+
+import numpy
+
+from django.db import (
+    transaction,
+)
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+from django.utils import (
+    timezone,
+)
+
+from apps.base.utils import (
+    CacheVersionUtil,
+    UpsertUtil,
+)
+from apps.shop.models import (
+    Category,
+    CoPurchaseWatermark,
+    Order,
+    OrderProductM2M,
+    ORDER_STATUS_CLOSED,
+    Product,
+    ProductCoPurchase,
+    ProductRecommendation,
+)
+
+
+class ProductRecommendationUtil:
+    """"Frequently bought together" products.\n
+    A batch job counts the product pairs of the orders closed since its
+    last run into ProductCoPurchase (a sparse, upper triangular item-item
+    matrix whose diagonal holds the per-product order counts), rescores
+    the products of those orders and their neighbours (cosine or lift)
+    and stores their top `top_k` neighbours in ProductRecommendation.
+    Serving is one lookup of that table, topped up with products of the
+    same category subtree when there are not enough co-purchases.\n
+    A neighbour's scores depend on the counts of the batch's products, so
+    it is rescored too and every ranking stays exact. Lift also scales
+    with the global order count: the rankings of the products left alone
+    are unaffected, but their stored lift values lag behind; run the
+    command with `--rebuild` periodically to refresh them.
+    """
+
+    METRIC_COSINE = 'cosine'
+    METRIC_LIFT = 'lift'
+    METRICS = (METRIC_COSINE, METRIC_LIFT)
+
+    TOP_K = 20
+    # pairs bought together less often are noise
+    MIN_PAIR_COUNT = 2
+    # bulk orders would add a quadratic number of meaningless pairs
+    MAX_ORDER_SIZE = 50
+    # orders closed (and still committing) this recently are left for
+    # the next run, so that none is skipped by the watermark
+    CLOSED_LAG = datetime.timedelta(minutes=1)
+    RESCORE_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def count_pairs(lines: numpy.ndarray, max_order_size: int) -> tuple:
+        """
+        lines: `[(order id, product id)]` sorted, without duplicates\n
+        Returns `(items, item counts, pairs, pair counts)`:
+        the orders containing each product and each product pair
+        `(a, b)` with a < b
+        """
+        orders = lines[:, 0]
+        starts = numpy.flatnonzero(numpy.r_[True, orders[1:] != orders[:-1]])
+        sizes = numpy.diff(numpy.r_[starts, len(orders)])
+        products = lines[numpy.repeat(sizes <= max_order_size, sizes), 1]
+        sizes = sizes[sizes <= max_order_size]
+
+        items, item_counts = numpy.unique(products, return_counts=True)
+
+        # every line is paired with the following lines of its order
+        group_ends = numpy.repeat(numpy.cumsum(sizes), sizes)
+        partners = group_ends - numpy.arange(len(products)) - 1
+        left = numpy.repeat(numpy.arange(len(products)), partners)
+        offsets = numpy.arange(len(left)) \
+            - numpy.repeat(numpy.cumsum(partners) - partners, partners)
+        pairs = numpy.stack(
+            (products[left], products[left + 1 + offsets]), axis=1
+        )
+        if not len(pairs):
+            return items, item_counts, pairs, numpy.zeros(0, dtype=int)
+
+        pairs, pair_counts = numpy.unique(pairs, axis=0, return_counts=True)
+        return items, item_counts, pairs, pair_counts
+
+    @classmethod
+    def get_scores(cls, co_counts, counts_a, counts_b, order_count,
+                   metric: str):
+        if metric == cls.METRIC_LIFT:
+            return co_counts * order_count / (counts_a * counts_b)
+        return co_counts / numpy.sqrt(counts_a * counts_b)
+
+    @staticmethod
+    def get_top_k(sources, targets, scores, top_k: int) -> tuple:
+        """
+        `(sources, targets, scores, ranks)` of the `top_k` best scored
+        targets of every source, ties broken by target id
+        """
+        order = numpy.lexsort((targets, -scores, sources))
+        sources, targets, scores = \
+            sources[order], targets[order], scores[order]
+
+        starts = numpy.flatnonzero(
+            numpy.r_[True, sources[1:] != sources[:-1]]
+        )
+        sizes = numpy.diff(numpy.r_[starts, len(sources)])
+        ranks = numpy.arange(len(sources)) - numpy.repeat(starts, sizes)
+
+        keep = ranks < top_k
+        return sources[keep], targets[keep], scores[keep], ranks[keep]
+
+    @classmethod
+    def rescore(cls, product_ids: list, order_count: int, metric: str,
+                top_k: int) -> int:
+        """
+        Replaces the recommendations of the products, returns the number
+        of rows written
+        """
+        pairs = numpy.array(list(
+            ProductCoPurchase.objects.filter(
+                Q(product_a__in=product_ids) | Q(product_b__in=product_ids),
+                count__gte=cls.MIN_PAIR_COUNT,
+            ).exclude(product_a=F('product_b'))
+            .values_list('product_a', 'product_b', 'count')
+        ), dtype=numpy.int64).reshape(-1, 3)
+
+        # both directions of the pairs, from the rescored products
+        is_rescored = numpy.isin(pairs[:, :2], product_ids)
+        sources = numpy.r_[pairs[is_rescored[:, 0], 0],
+                           pairs[is_rescored[:, 1], 1]]
+        targets = numpy.r_[pairs[is_rescored[:, 0], 1],
+                           pairs[is_rescored[:, 1], 0]]
+        co_counts = numpy.r_[pairs[is_rescored[:, 0], 2],
+                             pairs[is_rescored[:, 1], 2]]
+
+        item_counts = dict(
+            ProductCoPurchase.objects.filter(
+                product_a__in={*sources.tolist(), *targets.tolist()},
+                product_b=F('product_a'),
+            ).values_list('product_a', 'count')
+        )
+        counts = numpy.array([
+            [item_counts[source], item_counts[target]]
+            for source, target in zip(sources.tolist(), targets.tolist())
+        ], dtype=numpy.float64).reshape(-1, 2)
+
+        sources, targets, scores, ranks = cls.get_top_k(
+            sources, targets,
+            cls.get_scores(co_counts, counts[:, 0], counts[:, 1],
+                           order_count, metric),
+            top_k
+        )
+
+        ProductRecommendation.objects.filter(product_id__in=product_ids) \
+            .delete()
+        ProductRecommendation.objects.bulk_create(
+            ProductRecommendation(
+                product_id=source, related_product_id=target, rank=rank,
+                score=score
+            )
+            for source, target, score, rank in zip(
+                sources.tolist(), targets.tolist(), scores.tolist(),
+                ranks.tolist()
+            )
+        )
+        return len(sources)
+
+    @classmethod
+    def get_rescored_ids(cls, product_ids: list) -> list:
+        """
+        The products and their neighbours (the products paired with them
+        at least MIN_PAIR_COUNT times), sorted
+        """
+        rescored_ids = set(product_ids)
+        for start in range(0, len(product_ids), cls.RESCORE_CHUNK_SIZE):
+            chunk = product_ids[start:start + cls.RESCORE_CHUNK_SIZE]
+            for product_a, product_b in ProductCoPurchase.objects.filter(
+                Q(product_a__in=chunk) | Q(product_b__in=chunk),
+                count__gte=cls.MIN_PAIR_COUNT,
+            ).exclude(product_a=F('product_b')) \
+                    .values_list('product_a', 'product_b'):
+                rescored_ids.update((product_a, product_b))
+
+        return sorted(rescored_ids)
+
+    @staticmethod
+    def get_watermark() -> CoPurchaseWatermark:
+        """
+        The locked watermark row; call in a transaction
+        """
+        CoPurchaseWatermark.objects.get_or_create(id=1)
+        return CoPurchaseWatermark.objects.select_for_update().get(id=1)
+
+    @staticmethod
+    def get_new_orders(watermark: CoPurchaseWatermark,
+                       closed_before: datetime.datetime,
+                       batch_size: int) -> list:
+        """
+        `[(closed at, order id)]` of the next closed orders
+        """
+        orders = Order.objects.filter(
+            status=ORDER_STATUS_CLOSED, closed_at__lt=closed_before
+        )
+        if watermark.closed_at is not None:
+            orders = orders.filter(
+                Q(closed_at__gt=watermark.closed_at)
+                | Q(closed_at=watermark.closed_at, id__gt=watermark.order_id)
+            )
+
+        return list(orders.order_by('closed_at', 'id')
+                    .values_list('closed_at', 'id')[:batch_size])
+
+    @classmethod
+    def process_batch(cls, metric: str, top_k: int, batch_size: int,
+                      closed_before: datetime.datetime) -> tuple:
+        """
+        Counts and rescores the next batch of closed orders in one
+        transaction (the watermark row lock keeps runs from overlapping);
+        returns `(orders, products rescored, recommendations)`
+        """
+        with transaction.atomic():
+            watermark = cls.get_watermark()
+            orders = cls.get_new_orders(
+                watermark, closed_before, batch_size
+            )
+            if not orders:
+                return 0, 0, 0
+
+            lines = numpy.array(list(
+                OrderProductM2M.objects
+                .filter(order_id__in=[order_id for _, order_id in orders])
+                .order_by('order_id', 'product_id')
+                .values_list('order_id', 'product_id')
+            ), dtype=numpy.int64).reshape(-1, 2)
+            items, item_counts, pairs, pair_counts = cls.count_pairs(
+                lines, cls.MAX_ORDER_SIZE
+            )
+
+            UpsertUtil.upsert_increment(
+                ProductCoPurchase, ('product_a', 'product_b'), [
+                    {'product_a': a, 'product_b': b, 'count': count}
+                    for a, b, count in sorted([
+                        *zip(items.tolist(), items.tolist(),
+                             item_counts.tolist()),
+                        *((a, b, count) for (a, b), count in zip(
+                            pairs.tolist(), pair_counts.tolist()
+                        )),
+                    ])
+                ], ('count',)
+            )
+
+            watermark.closed_at, watermark.order_id = orders[-1]
+            watermark.order_count += len(orders)
+            watermark.save()
+
+            product_ids = cls.get_rescored_ids(items.tolist())
+            recommendations = 0
+            for start in range(0, len(product_ids), cls.RESCORE_CHUNK_SIZE):
+                recommendations += cls.rescore(
+                    product_ids[start:start + cls.RESCORE_CHUNK_SIZE],
+                    watermark.order_count, metric, top_k
+                )
+            CacheVersionUtil.bump_model(ProductRecommendation)
+
+        return len(orders), len(product_ids), recommendations
+
+    @classmethod
+    def update(cls, metric: str = METRIC_COSINE, top_k: int = TOP_K,
+               batch_size: int = 10000) -> Iterator[tuple]:
+        """
+        Processes the orders closed since the last run batch by batch,
+        yields `(orders, products rescored, recommendations)` per batch
+        """
+        closed_before = timezone.now() - cls.CLOSED_LAG
+        while True:
+            result = cls.process_batch(
+                metric, top_k, batch_size, closed_before
+            )
+            if not result[0]:
+                return
+            yield result
+
+    @staticmethod
+    def reset():
+        """
+        Forgets all the counts, the next update starts from scratch
+        """
+        with transaction.atomic():
+            CoPurchaseWatermark.objects.all().delete()
+            ProductCoPurchase.objects.all().delete()
+            ProductRecommendation.objects.all().delete()
+            CacheVersionUtil.bump_model(ProductRecommendation)
+
+    @staticmethod
+    def get_related(queryset, product_id: int, limit: int) -> list:
+        """
+        The recommended products of the (product) queryset, best first,
+        in a single query
+        """
+        return list(
+            queryset.filter(recommended_for__product_id=product_id)
+            .order_by('recommended_for__rank')[:limit]
+        )
+
+    @staticmethod
+    def get_fallback(queryset, product_id: int, exclude_ids: list,
+                     limit: int) -> list:
+        """
+        Products of the product's category, then of the rest of its
+        parent category's subtree
+        """
+        category_id, parent_id = Product.objects.filter(id=product_id) \
+            .values_list('category_id', 'category__parent_id').get()
+        if category_id is None:
+            return []
+
+        return list(
+            queryset.filter(Exists(
+                Category.objects.filter(
+                    id=parent_id or category_id,
+                    tree_id=OuterRef('category__tree_id'),
+                    lft__lte=OuterRef('category__lft'),
+                    rght__gte=OuterRef('category__rght'),
+                )
+            )).exclude(id__in=[product_id, *exclude_ids]).order_by(
+                Case(When(category_id=category_id, then=Value(0)),
+                     default=Value(1), output_field=IntegerField()),
+                'id'
+            )[:limit]
+        )
@@ -0,0 +1,221 @@
+import datetime
+from decimal import (
+    Decimal,
+)
+from typing import (
+    Iterator,
+)
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Count,
+    DecimalField,
+    F,
+    Sum,
+)
+from django.db.models.functions import (
+    TruncDate,
+)
+from django.utils import (
+    timezone,
+)
+
+from .category_tree_util import (
+    CategoryTreeUtil,
+)
+from apps.base.utils import (
+    UpsertUtil,
+)
+from apps.shop.models import (
+    CategorySalesDaily,
+    Order,
+    OrderProductM2M,
+    ORDER_STATUS_CLOSED,
+    ProductSalesDaily,
+)
+
+
+class SalesRollupUtil:
+    """Daily sales rollups of the closed orders (ProductSalesDaily,
+    CategorySalesDaily), so that reports never scan the order lines.\n
+    Closing orders adds their lines to the closing day's rows in the same
+    transaction (`add_orders`); `rebuild` recomputes whole days from the
+    closed orders and can be rerun at will. Category rows follow the
+    category tree at the time they are written: rebuild the affected days
+    after moving products or categories.\n
+    A day's rows are guarded by a transaction-level advisory lock of the
+    day (PostgreSQL), taken shared by `add_orders` and exclusive by
+    `rebuild_day`: a rebuild waits for the closes in flight to commit and
+    reads their orders, closes started meanwhile wait for the rebuild and
+    add to its rows, so an order is never dropped nor counted twice.
+    """
+
+    BATCH_SIZE = 1000
+
+    # first key of the (namespace, day) advisory locks
+    LOCK_NAMESPACE = 0x5a1e5
+
+    @classmethod
+    def lock_day(cls, day: datetime.date, shared: bool):
+        """
+        Takes the day's lock until the end of the current transaction;
+        a no-op off PostgreSQL (SQLite serializes the writers anyway)
+        """
+        if connection.vendor != 'postgresql':
+            return
+
+        function = 'pg_advisory_xact_lock_shared' if shared \
+            else 'pg_advisory_xact_lock'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {function}(%s, %s)',
+                (cls.LOCK_NAMESPACE, day.toordinal())
+            )
+
+    @staticmethod
+    def get_product_rows(lines, day: datetime.date) -> list:
+        """
+        The lines' totals per product, in product order
+        """
+        totals = lines.values('product_id', 'product__category_id').annotate(
+            units=Sum('product_count'),
+            revenue=Sum(
+                F('product_count') * F('unit_price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+            order_count=Count('order_id'),
+        ).order_by('product_id')
+
+        return [
+            {
+                'day': day,
+                'product': row['product_id'],
+                'category': row['product__category_id'],
+                'units': row['units'],
+                'revenue': row['revenue'],
+                'order_count': row['order_count'],
+            }
+            for row in totals
+        ]
+
+    @staticmethod
+    def get_category_rows(product_rows: list) -> list:
+        """
+        Category rows of the product rows' categories and their ancestors
+        """
+        totals = {}
+        for row in product_rows:
+            if row['category'] is None:
+                continue
+            for category_id in CategoryTreeUtil.get_ancestor_ids(
+                    row['category']):
+                units, revenue = totals.get(
+                    (row['day'], category_id), (0, Decimal('0.00'))
+                )
+                totals[row['day'], category_id] = \
+                    (units + row['units'], revenue + row['revenue'])
+
+        return [
+            {'day': day, 'category': category_id,
+             'units': units, 'revenue': revenue}
+            for (day, category_id), (units, revenue) in sorted(totals.items())
+        ]
+
+    @classmethod
+    def add_orders(cls, order_ids: list, day: datetime.date):
+        """
+        Adds the orders' lines to the day's rows;
+        call in the transaction that closes the orders
+        """
+        cls.lock_day(day, shared=True)
+        product_rows = cls.get_product_rows(
+            OrderProductM2M.objects.filter(order_id__in=order_ids), day
+        )
+
+        # rows are upserted in key order, so that concurrent closes
+        # lock them in the same order
+        UpsertUtil.upsert_increment(
+            ProductSalesDaily, ('day', 'product'), product_rows,
+            ('units', 'revenue', 'order_count')
+        )
+        UpsertUtil.upsert_increment(
+            CategorySalesDaily, ('day', 'category'),
+            cls.get_category_rows(product_rows), ('units', 'revenue')
+        )
+
+    @classmethod
+    def rebuild_day(cls, day: datetime.date) -> tuple:
+        """
+        Replaces the day's rows, returns
+        `(product rows, category rows)` written
+        """
+        start = timezone.make_aware(
+            datetime.datetime.combine(day, datetime.time.min)
+        )
+        closed_order_ids = Order.objects.filter(
+            status=ORDER_STATUS_CLOSED,
+            closed_at__gte=start,
+            closed_at__lt=start + datetime.timedelta(days=1),
+        ).values('id')
+
+        with transaction.atomic():
+            # the closed orders are read after the lock, so they include
+            # those of the closes it waited for
+            cls.lock_day(day, shared=False)
+            ProductSalesDaily.objects.filter(day=day).delete()
+            CategorySalesDaily.objects.filter(day=day).delete()
+
+            product_rows = cls.get_product_rows(
+                OrderProductM2M.objects.filter(
+                    order_id__in=closed_order_ids
+                ),
+                day
+            )
+            category_rows = cls.get_category_rows(product_rows)
+
+            ProductSalesDaily.objects.bulk_create((
+                ProductSalesDaily(
+                    day=day, product_id=row['product'], units=row['units'],
+                    revenue=row['revenue'], order_count=row['order_count']
+                )
+                for row in product_rows
+            ), batch_size=cls.BATCH_SIZE)
+            CategorySalesDaily.objects.bulk_create((
+                CategorySalesDaily(
+                    day=day, category_id=row['category'],
+                    units=row['units'], revenue=row['revenue']
+                )
+                for row in category_rows
+            ), batch_size=cls.BATCH_SIZE)
+
+        return len(product_rows), len(category_rows)
+
+    @classmethod
+    def rebuild(cls, date_from: datetime.date, date_to: datetime.date) \
+            -> Iterator[tuple]:
+        """
+        Rebuilds the days of the range (both ends included) one by one,
+        each in its own transaction; yields `(day, product rows,
+        category rows)`
+        """
+        day = date_from
+        while day <= date_to:
+            yield (day, *cls.rebuild_day(day))
+            day += datetime.timedelta(days=1)
+
+    @staticmethod
+    def get_closed_date_range() -> tuple:
+        """
+        `(first day, last day)` with closed orders, or `(None, None)`
+        """
+        closed_days = Order.objects.filter(
+            status=ORDER_STATUS_CLOSED, closed_at__isnull=False
+        ).annotate(day=TruncDate('closed_at')).values_list('day', flat=True)
+
+        return (
+            closed_days.order_by('closed_at').first(),
+            closed_days.order_by('-closed_at').first(),
+        )
@@ -0,0 +1,126 @@
+import re
+from html import unescape
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import (
+    connection,
+)
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    Q,
+    QuerySet,
+    TextField,
+    Value,
+    When,
+)
+from django.utils.html import (
+    strip_tags,
+)
+
+
+class ProductSearchUtil:
+    """Full-text search over Product name + plain text of description.\n
+    On PostgreSQL a precomputed `search_vector` (GIN indexed) is matched
+    with a prefix tsquery and ordered by relevance, `name` typos are
+    caught by a pg_trgm similarity match (GIN trigram index).
+    On other backends (e.g. SQLite in tests) the precomputed, normalized
+    `search_document` is matched term by term with LIKE.
+    """
+
+    SEARCH_CONFIG = 'simple'
+    TERM_REGEX = re.compile(r'\w+')
+
+    @staticmethod
+    def is_full_text_supported() -> bool:
+        return connection.vendor == 'postgresql'
+
+    @classmethod
+    def get_terms(cls, text: str) -> list:
+        return cls.TERM_REGEX.findall(text.lower())
+
+    @classmethod
+    def get_search_document(cls, name: str, description: str) -> str:
+        plain_description = unescape(strip_tags(description or ''))
+        return ' '.join(cls.get_terms(f'{name or ""} {plain_description}'))
+
+    @classmethod
+    def get_search_vector(cls, name: str, search_document: str):
+        """
+        Expression to be saved into `Product.search_vector`,
+        name is weighted above the description
+        """
+        return SearchVector(
+            Value(name, output_field=TextField()),
+            weight='A', config=cls.SEARCH_CONFIG
+        ) + SearchVector(
+            Value(search_document, output_field=TextField()),
+            weight='B', config=cls.SEARCH_CONFIG
+        )
+
+    @classmethod
+    def get_search_fields(cls, name: str, description: str) -> dict:
+        search_document = cls.get_search_document(name, description)
+        search_fields = {'search_document': search_document}
+        if cls.is_full_text_supported():
+            search_fields['search_vector'] = \
+                cls.get_search_vector(name, search_document)
+
+        return search_fields
+
+    @classmethod
+    def refresh_search_vectors(cls, queryset: QuerySet) -> int:
+        """
+        Recomputes `search_vector` from the stored `search_document`
+        in a single UPDATE, for writes that bypass `save()`
+        """
+        if not cls.is_full_text_supported():
+            return 0
+
+        return queryset.update(
+            search_vector=SearchVector(
+                'name', weight='A', config=cls.SEARCH_CONFIG
+            ) + SearchVector(
+                'search_document', weight='B', config=cls.SEARCH_CONFIG
+            )
+        )
+
+    @classmethod
+    def search(cls, queryset: QuerySet, value: str) -> QuerySet:
+        """
+        Filters queryset by `value` and annotates it with `search_rank`,
+        ordered by relevance
+        """
+        terms = cls.get_terms(value)
+        if not terms:
+            return queryset
+
+        if cls.is_full_text_supported():
+            query = SearchQuery(
+                ' & '.join(f'{term}:*' for term in terms),
+                search_type='raw', config=cls.SEARCH_CONFIG
+            )
+            queryset = queryset.annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+                + TrigramSimilarity('name', value)
+            ).filter(
+                Q(search_vector=query) | Q(name__trigram_similar=value)
+            )
+        else:
+            for term in terms:
+                queryset = queryset.filter(search_document__contains=term)
+            queryset = queryset.annotate(
+                search_rank=Case(
+                    When(name__icontains=value, then=Value(1.0)),
+                    default=Value(0.5),
+                    output_field=FloatField()
+                )
+            )
+
+        return queryset.order_by('-search_rank', 'id')
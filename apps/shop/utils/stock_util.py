@@ -0,0 +1,144 @@
+import random
+
+from django.db import (
+    transaction,
+)
+from django.db.models import (
+    F,
+    Sum,
+)
+
+from apps.shop.exceptions import (
+    OutOfStockException,
+)
+from apps.shop.models import (
+    Product,
+    ProductStockShard,
+)
+
+
+class StockUtil:
+    """Product stock, reserved at checkout.\n
+    Products with a None `stock` are not tracked. Reservations are
+    conditional decrements (`UPDATE ... SET stock = stock - n
+    WHERE stock >= n`) made product by product in id order, so concurrent
+    checkouts lock the rows in the same order and can't deadlock.\n
+    The stock of a hot product can be split over `stock_shard_count`
+    ProductStockShard rows: a reservation decrements one shard, picked at
+    random, so concurrent checkouts of the product mostly lock different
+    rows. Only when no single shard holds enough are all the shards locked
+    (in shard order) and drawn down together. Released stock goes back to
+    a random shard.
+    """
+
+    @staticmethod
+    def get_stock(product_id: int):
+        """
+        The available quantity, None if not tracked
+        """
+        stock, shard_count = Product.objects.filter(id=product_id) \
+            .values_list('stock', 'stock_shard_count').get()
+        if not shard_count:
+            return stock
+
+        return ProductStockShard.objects.filter(product_id=product_id) \
+            .aggregate(stock=Sum('stock'))['stock'] or 0
+
+    @staticmethod
+    def set_stock(product_id: int, quantity, shard_count: int = 0):
+        """
+        Replaces the product's stock (None to stop tracking it), split
+        evenly over `shard_count` shards if given
+        """
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(id=product_id)
+            ProductStockShard.objects.filter(product_id=product_id).delete()
+
+            if quantity is not None and shard_count:
+                share, rest = divmod(quantity, shard_count)
+                ProductStockShard.objects.bulk_create(
+                    ProductStockShard(
+                        product_id=product_id, shard=shard,
+                        stock=share + (shard < rest)
+                    )
+                    for shard in range(shard_count)
+                )
+                product.stock, product.stock_shard_count = None, shard_count
+            else:
+                product.stock, product.stock_shard_count = quantity, 0
+
+            product.save(update_fields=('stock', 'stock_shard_count'))
+
+    @staticmethod
+    def take_from_shards(product_id: int, count: int, shard_count: int) \
+            -> bool:
+        """
+        Single random shard first, all the shards if none has enough
+        """
+        start = random.randrange(shard_count)
+        for offset in range(shard_count):
+            if ProductStockShard.objects.filter(
+                product_id=product_id,
+                shard=(start + offset) % shard_count,
+                stock__gte=count,
+            ).update(stock=F('stock') - count):
+                return True
+
+        shards = list(
+            ProductStockShard.objects.select_for_update()
+            .filter(product_id=product_id).order_by('shard')
+            .values_list('id', 'stock')
+        )
+        if sum(stock for _, stock in shards) < count:
+            return False
+
+        for shard_id, stock in shards:
+            taken = min(stock, count)
+            if taken:
+                ProductStockShard.objects.filter(id=shard_id) \
+                    .update(stock=F('stock') - taken)
+                count -= taken
+            if not count:
+                break
+
+        return True
+
+    @classmethod
+    def reserve(cls, lines: list):
+        """
+        lines: `[(product id, count, product stock, product
+        stock_shard_count)]`; call in the checkout transaction.
+        Raises OutOfStockException (the transaction rolls the reservations
+        back) at the first product without enough stock
+        """
+        for product_id, count, stock, shard_count in sorted(lines):
+            if shard_count:
+                reserved = cls.take_from_shards(
+                    product_id, count, shard_count
+                )
+            elif stock is not None:
+                reserved = Product.objects.filter(
+                    id=product_id, stock__gte=count
+                ).update(stock=F('stock') - count)
+            else:
+                continue
+
+            if not reserved:
+                raise OutOfStockException([product_id])
+
+    @staticmethod
+    def release(lines: list):
+        """
+        lines: `[(product id, count, product stock, product
+        stock_shard_count)]`, as for `reserve`; gives the counts back,
+        product by product in id order
+        """
+        for product_id, count, stock, shard_count in sorted(lines):
+            if shard_count:
+                ProductStockShard.objects.filter(
+                    product_id=product_id,
+                    shard=random.randrange(shard_count),
+                ).update(stock=F('stock') + count)
+            elif stock is not None:
+                Product.objects.filter(id=product_id) \
+                    .update(stock=F('stock') + count)
@@ -1,7 +1,24 @@
-from django.shortcuts import (
-    get_object_or_404,
+from django.db import (
+    transaction,
+)
+from django.db.models import (
+    Sum,
+    prefetch_related_objects,
+)
+from django.http import (
+    Http404,
 )
 
+from rest_framework.decorators import (
+    action,
+)
+from rest_framework.exceptions import (
+    NotFound,
+    ValidationError,
+)
+from rest_framework.generics import (
+    ListAPIView,
+)
 from rest_framework.viewsets import (
     GenericViewSet,
     ModelViewSet,
@@ -21,39 +38,77 @@ from rest_framework.status import (
 from rest_framework.views import APIView
 
 from django_filters import rest_framework as rf_filters
+from django_filters.constants import (
+    EMPTY_VALUES,
+)
 
 from .filters import (
     CategoryFilterSet,
+    CategorySalesFilterSet,
+    OrderFilterSet,
     ProductFilterSet,
-    UserFilterSet,
+    ProductSalesFilterSet,
 )
 from .models import (
+    Cart,
     CartProductM2M,
     Category,
+    CategorySalesDaily,
     Order,
     OrderProductM2M,
     Product,
+    ProductRecommendation,
+    ProductSalesDaily,
     ORDER_STATUS_PAID,
-    ORDER_STATUS_CLOSED,
+)
+from .mixins import (
+    CartSnapshotMixin,
+    ProductDeltasMixin,
+    SalesReportMixin,
+)
+from .pagination import (
+    OrderPagination,
+    ProductPagination,
 )
 from .permissions import (
     CanChangeOrderPermission,
     IsOwnerPermission,
 )
 from .serializers import (
+    BulkCloseOrderSerializer,
+    CategorySalesSerializer,
     CategorySerializer,
     OrderSerializer,
     ProductCountSerializer,
+    ProductSalesSerializer,
     ProductSerializer,
 )
 from .utils import (
+    CartCacheUtil,
+    CategoryTreeUtil,
+    CheckoutUtil,
     DeltaUtil,
+    GuestCartUtil,
+    OrderStatusUtil,
+    OrderTotalsUtil,
+    ProductFacetUtil,
+    ProductRecommendationUtil,
+    StockUtil,
 )
 from apps.base.permissions import (
     IsReadOnlyPermission,
 )
+from apps.base.throttling import (
+    AccountTokenBucketThrottle,
+    IPTokenBucketThrottle,
+)
 from apps.base.mixins import (
+    ConditionalGetMixin,
     GetSerializerClassMixin,
+    SparseFieldsetMixin,
+)
+from apps.base.utils import (
+    CacheVersionUtil,
 )
 from apps.user.models import (
     ACCOUNT_TYPE_STANDARD,
@@ -64,18 +119,113 @@ from apps.user.permissions import (
 )
 
 
-class ProductViewset(ModelViewSet):
+class ProductViewset(ConditionalGetMixin, SparseFieldsetMixin, ModelViewSet):
     permission_classes = (
         IsReadOnlyPermission | IsAdminPermission | IsModeratorPermission,
     )
     filter_backends = (rf_filters.DjangoFilterBackend,)
     filterset_class = ProductFilterSet
+    pagination_class = ProductPagination
 
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
+    sparse_fieldset_actions = ('list', 'retrieve', 'related')
+    default_fieldsets = {
+        # listings never read the (large) HTML description
+        'list': ('id', 'category', 'name', 'price', 'updated_at'),
+        'related': ('id', 'category', 'name', 'price', 'updated_at'),
+    }
+    related_limit = 10
+    related_max_limit = 50
 
+    conditional_collections = (
+        CacheVersionUtil.get_model_collection(Product),
+        # facets
+        CategoryTreeUtil.COLLECTION,
+    )
 
-class CategoryViewset(ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        """
+        `?fields=id,name,...` selects the returned fields, the HTML
+        `description` is only returned when asked for;
+        `?facets=category,price` adds
+        `"facets": {"category": [...], "price": [...]}` to the page,
+        `?price_buckets=adaptive` spreads price buckets over the price range
+        of the filtered products
+        """
+        response = super().list(request, *args, **kwargs)
+
+        facets = ProductFacetUtil.parse_facets(
+            request.query_params.get('facets')
+        )
+        if facets:
+            response.data['facets'] = ProductFacetUtil.get_facets(
+                self.filter_queryset(self.get_queryset()),
+                facets,
+                ProductFacetUtil.get_signature({
+                    name: request.query_params.getlist(name)
+                    for name in self.filterset_class.base_filters
+                }),
+                request.query_params.get(
+                    'price_buckets', ProductFacetUtil.PRICE_BUCKETS_FIXED
+                ),
+            )
+
+        return response
+
+    def get_conditional_collections(self):
+        if self.action == 'related':
+            return (
+                *self.conditional_collections,
+                CacheVersionUtil.get_model_collection(ProductRecommendation),
+            )
+        return super().get_conditional_collections()
+
+    @action(detail=True, methods=('get',))
+    def related(self, request, *args, **kwargs):
+        """
+        Products frequently bought together with this one, best first,
+        topped up with products of its category subtree;
+        `?limit=<<int, 10>>` (at most 50), `?fields=` as `list`
+        """
+        return self.conditional_get(
+            self.get_related_response, request, *args, **kwargs
+        )
+
+    def get_related_response(self, request, pk=None, *args, **kwargs):
+        try:
+            product_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        try:
+            limit = int(request.query_params.get(
+                'limit', self.related_limit
+            ))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.related_max_limit:
+            raise ValidationError({
+                'limit': f'must be from 1 to {self.related_max_limit}'
+            })
+
+        queryset = self.get_queryset()
+        products = ProductRecommendationUtil.get_related(
+            queryset, product_id, limit
+        )
+        if len(products) < limit:
+            try:
+                products += ProductRecommendationUtil.get_fallback(
+                    queryset, product_id,
+                    [product.id for product in products],
+                    limit - len(products)
+                )
+            except Product.DoesNotExist:
+                raise NotFound()
+
+        return Response(self.get_serializer(products, many=True).data)
+
+
+class CategoryViewset(ConditionalGetMixin, ModelViewSet):
     permission_classes = (
         IsReadOnlyPermission | IsAdminPermission | IsModeratorPermission,
     )
@@ -85,43 +235,91 @@ class CategoryViewset(ModelViewSet):
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
 
+    conditional_collections = (
+        CacheVersionUtil.get_model_collection(Category),
+    )
+
+    def get_conditional_collections(self):
+        if self.action == 'tree':
+            return (CategoryTreeUtil.COLLECTION,)
+        return super().get_conditional_collections()
+
+    @action(detail=False, methods=('get',))
+    def tree(self, request, *args, **kwargs):
+        """
+        Returns the whole category tree:
+        `[{"id": <<int>>, "name": <<str>>, "product_count": <<int>>,
+        "total_product_count": <<int>>, "children": [...]} * n]`
+        """
+        return self.conditional_get(
+            lambda *args, **kwargs: Response(CategoryTreeUtil.get_tree()),
+            request, *args, **kwargs
+        )
 
-class CartProductsView(APIView):
-    permission_classes = (IsAuthenticated,)
+
+class CartProductsView(CartSnapshotMixin, ProductDeltasMixin, APIView):
+    throttle_classes = (IPTokenBucketThrottle, AccountTokenBucketThrottle)
+    throttle_scope = 'cart_write'
+
+    def get_throttles(self):
+        # reads are served from the cart snapshot
+        if self.request.method != 'PATCH':
+            return []
+        return super().get_throttles()
 
     def patch(self, request, *args, **kwargs):
         """
         Accepts `{"product_id": <<int>>, "product_count": <<int != 0>>}`
+        or a list of them, applied all at once; guests' carts are kept in
+        a signed cookie and merged into the User's Cart on login\n
+        Returns the resulting cart, as `get` does
         """
-        serializer = ProductCountSerializer(data=request.data)
-        if not serializer.is_valid():
+        product_deltas = self.get_product_deltas(request.data)
+        if product_deltas is None:
             return Response(status=HTTP_400_BAD_REQUEST)
+        deltas, _ = product_deltas
 
-        try:
-            DeltaUtil.smart_delta(
-                CartProductM2M,
-                {
-                    'cart': request.user.cart,
-                    'product': get_object_or_404(
-                        Product, id=serializer.validated_data['product_id']
-                    )
-                },
-                'product_count',
-                serializer.validated_data['product_count']
+        if not request.user.is_authenticated:
+            lines = GuestCartUtil.apply_deltas(
+                GuestCartUtil.read(request), deltas
             )
-        except AttributeError:
-            return Response(status=HTTP_400_BAD_REQUEST)
+            response = Response(GuestCartUtil.get_snapshot(lines)['lines'])
+            GuestCartUtil.write(response, lines)
+            return response
+
+        # the Cart is only created on the first persisted write
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        DeltaUtil.atomic_bulk_delta(
+            CartProductM2M,
+            {'cart': cart},
+            'product',
+            deltas,
+            'product_count'
+        )
+
+        return Response(CartCacheUtil.refresh(request.user.id)['lines'])
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns `[{"product_id": <<int>>, "product_count": <<int > 0>>,
+        "product_name": <<str>>} * n]`, served from the cart snapshot
+        """
+        return Response(self.get_cart_snapshot(request)['lines'])
 
-        return Response(status=HTTP_204_NO_CONTENT)
 
+class CartSummaryView(CartSnapshotMixin, APIView):
     def get(self, request, *args, **kwargs):
         """
-        Returns `[{"product_id": <<int>>, "product_count": <<int > 0>>} * n]`
+        Returns `{"line_count": <<int>>, "item_count": <<int>>,
+        "total": <<decimal str>>}`, served from the cart snapshot
+        (no SQL once cached)
         """
-        queryset = CartProductM2M.objects \
-            .filter(cart_id=request.user.cart.id) \
-            .select_related('product')
-        return Response(ProductCountSerializer(queryset, many=True).data)
+        snapshot = self.get_cart_snapshot(request)
+        return Response({
+            'line_count': snapshot['line_count'],
+            'item_count': snapshot['item_count'],
+            'total': snapshot['total'],
+        })
 
 
 class CartToOrderView(APIView):
@@ -129,46 +327,33 @@ class CartToOrderView(APIView):
 
     def post(self, request, *args, **kwargs):
         """
-        Creates a new Order belonging to the current User, with products and
-        product counts copied from User's Cart; Clears User's Cart.
+        Creates a new Order belonging to the current User, with products,
+        product counts and current prices copied from User's Cart;
+        Clears User's Cart. All in one transaction, with a single
+        `INSERT ... SELECT` for the order lines.
         """
-        cart_product_m2ms = request.user.cart.product_relations \
-            .select_related('product').all()
-        if cart_product_m2ms.exists():
-            order = Order(user=request.user)
-            order.save()
-
-            order_product_m2ms = (
-                OrderProductM2M(
-                    order=order,
-                    product=cart_product_m2m.product,
-                    product_count=cart_product_m2m.product_count
-                )
-                for cart_product_m2m
-                in cart_product_m2ms
-            )
-            OrderProductM2M.objects.bulk_create(order_product_m2ms)
-
-            cart_product_m2ms.delete()
-
-            return Response(status=HTTP_204_NO_CONTENT)
-
-        return Response(status=HTTP_400_BAD_REQUEST)
+        CheckoutUtil.checkout(request.user)
+        CartCacheUtil.set_empty(request.user.id)
+        return Response(status=HTTP_204_NO_CONTENT)
 
 
 class ClearCartView(APIView):
-    permission_classes = (IsAuthenticated,)
-
     def put(self, request, *args, **kwargs):
         """
-        Clears current User's Cart
+        Clears current User's (or guest's) Cart
         """
-        cart = request.user.cart
-        cart.products.clear()
-        return Response(status=HTTP_204_NO_CONTENT)
+        response = Response(status=HTTP_204_NO_CONTENT)
+        if not request.user.is_authenticated:
+            GuestCartUtil.clear(response)
+            return response
+
+        CartProductM2M.objects.filter(cart__user=request.user).delete()
+        CartCacheUtil.set_empty(request.user.id)
+        return response
 
 
-class OrderViewSet(ListModelMixin,
+class OrderViewSet(ProductDeltasMixin,
+                   ListModelMixin,
                    RetrieveModelMixin,
                    UpdateModelMixin,
                    DestroyModelMixin,
@@ -180,7 +365,8 @@ class OrderViewSet(ListModelMixin,
     )
 
     filter_backends = (rf_filters.DjangoFilterBackend,)
-    filterset_class = UserFilterSet
+    filterset_class = OrderFilterSet
+    pagination_class = OrderPagination
 
     serializer_class = OrderSerializer
     serializer_action_classes = {
@@ -188,6 +374,8 @@ class OrderViewSet(ListModelMixin,
     }
     queryset = Order.objects.all()
 
+    ORDER_PREFETCH = ('product_relations__product',)
+
     def get_queryset(self):
         queryset = super().get_queryset()
 
@@ -195,48 +383,196 @@ class OrderViewSet(ListModelMixin,
         if self.request.user.account_type == ACCOUNT_TYPE_STANDARD:
             queryset = queryset.filter(user=self.request.user)
 
-        queryset = queryset.prefetch_related('product_relations__product')
+        if self.action == 'queue':
+            queryset = queryset.filter(status=ORDER_STATUS_PAID)
 
-        if self.action == 'list':
-            queryset = queryset.prefetch_related('user')
+        if self.action in ('list', 'queue'):
+            # order lines are prefetched for the returned page only
+            queryset = queryset.select_related('user')
+        elif self.action != 'partial_update':
+            # partial_update prefetches when refetching the updated order
+            queryset = queryset.prefetch_related(*self.ORDER_PREFETCH)
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        Filters: `?user=`, `?status=<<status>>,...`,
+        `?created_after=<<datetime>>`, `?created_before=<<datetime>>`;
+        newest first
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        prefetch_related_objects(page, *self.ORDER_PREFETCH)
+
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+    @action(detail=False, methods=('get',),
+            permission_classes=(IsModeratorPermission | IsAdminPermission,))
+    def queue(self, request, *args, **kwargs):
+        """
+        The moderators' work queue: paid orders, oldest first,
+        keyset paginated over the (status, created_at, id) index
+        """
+        return self.list(request, *args, **kwargs)
+
     def partial_update(self, request, *args, **kwargs):
         """
         Accepts `{"product_id": <<int>>, "product_count": <<int != 0>>}`
+        or a list of them, applied all at once; added products are
+        reserved from the stock, removed ones released (409 when out of
+        stock)\n
+        Returns the resulting order
         """
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
-            return Response(status=HTTP_400_BAD_REQUEST)
+        # object permissions (404 / 403) come before input validation
+        order = self.get_object()
 
-        try:
-            DeltaUtil.smart_delta(
+        product_deltas = self.get_product_deltas(request.data)
+        if product_deltas is None:
+            return Response(status=HTTP_400_BAD_REQUEST)
+        deltas, prices = product_deltas
+
+        with transaction.atomic():
+            self.lock_order(order)
+            # one pass in product id order, as checkouts lock the stock
+            for product_id, stock, shard_count in Product.objects.filter(
+                id__in=deltas
+            ).order_by('id').values_list('id', 'stock', 'stock_shard_count'):
+                delta = deltas[product_id]
+                line = (product_id, abs(delta), stock, shard_count)
+                if delta > 0:
+                    StockUtil.reserve([line])
+                else:
+                    StockUtil.release([line])
+
+            DeltaUtil.atomic_bulk_delta(
                 OrderProductM2M,
-                {
-                    'order': self.get_object(),
-                    'product': get_object_or_404(
-                        Product, id=serializer.validated_data['product_id']
-                    )
-                },
+                {'order': order},
+                'product',
+                deltas,
                 'product_count',
-                serializer.validated_data['product_count']
+                # newly added lines are priced at the current price
+                {
+                    product_id: {'unit_price': prices[product_id]}
+                    for product_id in deltas
+                }
             )
-        except AttributeError:
-            return Response(status=HTTP_400_BAD_REQUEST)
+            OrderTotalsUtil.refresh([order.id])
 
-        return Response(status=HTTP_204_NO_CONTENT)
+        # the updated lines and totals, permissions are already checked
+        return Response(OrderSerializer(
+            self.get_queryset().select_related('user')
+            .prefetch_related(*self.ORDER_PREFETCH).get(id=order.id)
+        ).data)
+
+    @staticmethod
+    def lock_order(order: Order):
+        """
+        Serializes the line changes of the order with its deletion, so
+        that no line is added after the deletion released the stock
+        """
+        Order.objects.select_for_update().filter(id=order.id) \
+            .values_list('id', flat=True).first()
+
+    def perform_destroy(self, instance):
+        # the order's reserved stock is given back
+        with transaction.atomic():
+            self.lock_order(instance)
+            lines = OrderProductM2M.objects.select_for_update(of=('self',)) \
+                .filter(order=instance).select_related('product') \
+                .order_by('product_id')
+            StockUtil.release([
+                (line.product_id, line.product_count, line.product.stock,
+                 line.product.stock_shard_count)
+                for line in lines
+            ])
+            instance.delete()
 
 
 class AdminCloseOrderView(APIView):
     permission_classes = (IsModeratorPermission | IsAdminPermission,)
 
     def patch(self, request, order_id, *arge, **kwargs):
-        order = get_object_or_404(Order, id=order_id)
+        outcomes = OrderStatusUtil.close([order_id])
 
-        if order.status == ORDER_STATUS_PAID:
-            order.status = ORDER_STATUS_CLOSED
-            order.save(update_fields=('status',))
+        if outcomes[OrderStatusUtil.MISSING]:
+            raise Http404
+        if outcomes[OrderStatusUtil.UPDATED]:
             return Response(status=HTTP_204_NO_CONTENT)
 
         return Response(status=HTTP_400_BAD_REQUEST)
+
+
+class AdminBulkCloseOrderView(APIView):
+    permission_classes = (IsModeratorPermission | IsAdminPermission,)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Closes paid orders, given by id or by an order list filter.\n
+        Accepts `{"order_ids": [<<int>>]}` or
+        `{"filter": {"user": [<<int>>], "status": [<<str>>],
+        "created_after": <<datetime>>, "created_before": <<datetime>>}}`
+        (400 when the filter is empty or has unknown keys);
+        returns `{"updated": [<<id>>], "wrong_status": [<<id>>],
+        "missing": [<<id>>]}`
+        """
+        serializer = BulkCloseOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if 'order_ids' in serializer.validated_data:
+            return Response(OrderStatusUtil.close(
+                serializer.validated_data['order_ids']
+            ))
+
+        filterset = OrderFilterSet(
+            data=serializer.validated_data['filter'],
+            queryset=Order.objects.all()
+        )
+        if not filterset.is_valid():
+            return Response({'filter': filterset.errors},
+                            status=HTTP_400_BAD_REQUEST)
+        # blank values are ignored by the filters, like missing ones
+        if all(value in EMPTY_VALUES
+               for value in filterset.form.cleaned_data.values()):
+            return Response({'filter': ['must not be empty']},
+                            status=HTTP_400_BAD_REQUEST)
+
+        return Response(OrderStatusUtil.close_queryset(filterset.qs))
+
+
+class ProductSalesReportView(SalesReportMixin, ListAPIView):
+    """
+    Sales of the closed orders per product, from the daily rollups:
+    `?date_from=<<YYYY-MM-DD>>&date_to=<<YYYY-MM-DD>>` (required, both
+    included), `?product=`, `?category_tree=` filters,
+    `?daily=true`, `?limit=<<int, 100>>`
+    """
+    permission_classes = (IsModeratorPermission | IsAdminPermission,)
+    filter_backends = (rf_filters.DjangoFilterBackend,)
+    filterset_class = ProductSalesFilterSet
+
+    queryset = ProductSalesDaily.objects.all()
+    serializer_class = ProductSalesSerializer
+    group_by = ('product_id', 'product__name')
+    aggregates = {**SalesReportMixin.aggregates,
+                  'order_count': Sum('order_count')}
+
+
+class CategorySalesReportView(SalesReportMixin, ListAPIView):
+    """
+    Sales of the closed orders per category (including its descendants),
+    from the daily rollups:
+    `?date_from=<<YYYY-MM-DD>>&date_to=<<YYYY-MM-DD>>` (required, both
+    included), `?category=`, `?parent=<<category id>>` filters,
+    `?daily=true`, `?limit=<<int, 100>>`
+    """
+    permission_classes = (IsModeratorPermission | IsAdminPermission,)
+    filter_backends = (rf_filters.DjangoFilterBackend,)
+    filterset_class = CategorySalesFilterSet
+
+    queryset = CategorySalesDaily.objects.all()
+    serializer_class = CategorySalesSerializer
+    group_by = ('category_id', 'category__name')
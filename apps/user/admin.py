@@ -9,13 +9,20 @@ from .forms import (
     UserCreationForm,
 )
 from .models import (
+    EmailOutbox,
     User,
     UserProfile,
 )
+from .utils import (
+    UserSearchUtil,
+)
 from apps.shop.models import (
     Cart,
     CartProductM2M,
 )
+from apps.shop.utils import (
+    CartCacheUtil,
+)
 
 
 class UserProfileInline(nested_admin.NestedStackedInline):
@@ -59,10 +66,33 @@ class UserAdmin(nested_admin.NestedModelAdmin, BaseUserAdmin):
     list_display = ('email', 'account_type', 'registration_date', 'last_login',
                     'is_active', 'is_deleted')
     list_filter = ('account_type', 'is_active', 'is_deleted')
-    search_fields = ('email',)
+    search_fields = UserSearchUtil.SEARCH_FIELDS
     ordering = ('-id',)
     filter_horizontal = ()
 
+    def get_search_results(self, request, queryset, search_term):
+        # the indexed moderator search, instead of `icontains` per word
+        if not search_term:
+            return queryset, False
+        return UserSearchUtil.search(queryset, search_term), False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # cart lines edited through CartProductM2MInline
+        CartCacheUtil.invalidate(form.instance.id)
+
+
+class EmailOutboxAdmin(admin.ModelAdmin):
+    model = EmailOutbox
+
+    list_display = ('to_email', 'kind', 'created_at', 'sent_at', 'attempts')
+    list_filter = ('kind', 'sent_at')
+    search_fields = ('to_email',)
+    readonly_fields = ('dedupe_key', 'created_at', 'sent_at',
+                       'next_attempt_at', 'attempts', 'last_error')
+    raw_id_fields = ('user',)
+
 
 admin.site.register(User, UserAdmin)
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
 admin.site.unregister(Group)
@@ -0,0 +1,258 @@
+# Async variants of the password hashing views, for ASGI deployments:
+# under ASGI all the sync views share one thread, so ~100ms of PBKDF2 per
+# login blocks every one of them. These hash on PasswordHashingUtil's
+# bounded pool instead (503 when saturated); every other step is the
+# sync views' own (AuthUtil, the serializers, the views' throttles),
+# run through sync_to_async.
+import functools
+
+from asgiref.sync import sync_to_async
+
+from django.http import (
+    HttpResponse,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+
+from rest_framework import exceptions
+from rest_framework.parsers import (
+    FormParser,
+    JSONParser,
+    MultiPartParser,
+)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.status import (
+    HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_429_TOO_MANY_REQUESTS,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+
+from .authentication import (
+    ExpiringTokenAuthentication,
+)
+from .serializers import (
+    ChangePasswordSerializer,
+    LoginSerializer,
+    RegistrationSerializer,
+)
+from .utils import (
+    AuthUtil,
+    PasswordHashingOverloaded,
+    PasswordHashingUtil,
+)
+from .views import (
+    ObtainExpiringAuthTokenView,
+    RegisterView,
+)
+
+
+def async_api_view(methods: tuple):
+    """
+    Method check and CSRF exemption (as DRF's views have) for async views;
+    Django's own decorators would turn them into sync views
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapped_view(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+
+        wrapped_view.csrf_exempt = True
+        return wrapped_view
+
+    return decorator
+
+
+def get_request(request, authenticate: bool = False) -> Request:
+    return Request(
+        request,
+        parsers=(JSONParser(), FormParser(), MultiPartParser()),
+        authenticators=(ExpiringTokenAuthentication(),) if authenticate
+        else ()
+    )
+
+
+def check_throttles(request: Request, view_class) -> HttpResponse:
+    """
+    429 response if any of the sync view's throttles (with its
+    throttle_scope) denies the request, else None
+    """
+    for throttle_class in view_class.throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view_class):
+            response = JsonResponse(
+                {'detail': 'Request was throttled.'},
+                status=HTTP_429_TOO_MANY_REQUESTS
+            )
+            if throttle.wait() is not None:
+                response['Retry-After'] = str(int(throttle.wait()) + 1)
+            return response
+
+    return None
+
+
+def overloaded_response() -> HttpResponse:
+    response = JsonResponse(
+        {'detail': 'Server is busy, try again later.'},
+        status=HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+def finish_login(request, user) -> HttpResponse:
+    """
+    What ObtainExpiringAuthTokenView does once the password is checked
+    """
+    token_key = AuthUtil.get_token_key(user)
+    if token_key is None:
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+
+    response = JsonResponse({'token': token_key})
+    AuthUtil.merge_guest_cart(request, response, user)
+    return response
+
+
+@async_api_view(('POST',))
+async def login_view(request):
+    """
+    Async ObtainExpiringAuthTokenView.post:
+    accepts `{"username": <<email>>, "password": <<str>>}`
+    """
+    drf_request = get_request(request)
+    try:
+        data = drf_request.data
+    except exceptions.ParseError:
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+
+    throttled = await sync_to_async(check_throttles)(
+        drf_request, ObtainExpiringAuthTokenView
+    )
+    if throttled is not None:
+        return throttled
+
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    password = serializer.validated_data['password']
+
+    user = await sync_to_async(AuthUtil.get_login_user)(
+        serializer.validated_data['username']
+    )
+    try:
+        valid, must_update = await PasswordHashingUtil.run(
+            AuthUtil.verify_password, password, user and user.password
+        )
+        if valid and must_update:
+            await sync_to_async(AuthUtil.save_password_hash)(
+                user, await PasswordHashingUtil.make_password(password)
+            )
+    except PasswordHashingOverloaded:
+        return overloaded_response()
+
+    if not valid:
+        return JsonResponse(
+            {api_settings.NON_FIELD_ERRORS_KEY:
+                [AuthUtil.INVALID_CREDENTIALS_MESSAGE]},
+            status=HTTP_400_BAD_REQUEST
+        )
+
+    return await sync_to_async(finish_login)(request, user)
+
+
+@async_api_view(('POST',))
+async def register_view(request):
+    """
+    Async RegisterView.post
+    """
+    drf_request = get_request(request)
+    try:
+        data = drf_request.data
+    except exceptions.ParseError:
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+
+    throttled = await sync_to_async(check_throttles)(
+        drf_request, RegisterView
+    )
+    if throttled is not None:
+        return throttled
+
+    serializer = RegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+
+    try:
+        password_hash = await PasswordHashingUtil.make_password(
+            serializer.validated_data['password']
+        )
+    except PasswordHashingOverloaded:
+        return overloaded_response()
+
+    await sync_to_async(AuthUtil.register)(serializer, password_hash)
+
+    return HttpResponse(status=HTTP_204_NO_CONTENT)
+
+
+@async_api_view(('PUT',))
+async def change_password_view(request):
+    """
+    Async ChangePasswordView.put
+    """
+    drf_request = get_request(request, authenticate=True)
+
+    def get_user():
+        # authenticates, and loads what validate_password compares with
+        user = drf_request.user
+        if user.is_authenticated:
+            user.refresh_from_db(fields=('password', 'email'))
+        return user
+
+    try:
+        user = await sync_to_async(get_user)()
+    except exceptions.AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)},
+                            status=HTTP_401_UNAUTHORIZED)
+    if not user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=HTTP_401_UNAUTHORIZED
+        )
+
+    try:
+        serializer = ChangePasswordSerializer(data=drf_request.data)
+    except exceptions.ParseError:
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return HttpResponse(status=HTTP_400_BAD_REQUEST)
+
+    try:
+        valid, _ = await PasswordHashingUtil.run(
+            AuthUtil.verify_password,
+            serializer.data['old_password'], user.password
+        )
+        if not valid:
+            return JsonResponse(
+                {'error': AuthUtil.INCORRECT_OLD_PASSWORD_MESSAGE},
+                status=HTTP_400_BAD_REQUEST
+            )
+
+        errors = await sync_to_async(AuthUtil.get_new_password_errors)(
+            user, serializer.data['new_password']
+        )
+        if errors:
+            return JsonResponse({'password_validation_errors': errors},
+                                status=HTTP_400_BAD_REQUEST)
+
+        password_hash = await PasswordHashingUtil.make_password(
+            serializer.data['new_password']
+        )
+    except PasswordHashingOverloaded:
+        return overloaded_response()
+
+    await sync_to_async(AuthUtil.save_password_hash)(user, password_hash)
+
+    return HttpResponse(status=HTTP_204_NO_CONTENT)
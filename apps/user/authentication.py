@@ -1,18 +1,42 @@
 from rest_framework.authentication import TokenAuthentication
 from rest_framework import exceptions
 
-from .models import ExpiringAuthToken
+from .models import (
+    ExpiringAuthToken,
+    User,
+)
+from .utils import TokenCacheUtil
 
 
 class ExpiringTokenAuthentication(TokenAuthentication):
     model = ExpiringAuthToken
 
+    # relations of the user loaded together with it, in the same query
+    user_select_related = ()
+
     def authenticate_credentials(self, key):
-        model = self.get_model()
-        try:
-            token = model.objects.select_related('user').get(key=key)
-        except model.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Invalid token.')
+        entry = TokenCacheUtil.get(key)
+        if entry is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related(
+                    'user',
+                    *(f'user__{field}' for field in self.user_select_related)
+                ).get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+
+            TokenCacheUtil.set(token)
+        else:
+            token = TokenCacheUtil.get_token(entry)
+            if self.user_select_related:
+                # the whole user with its relations instead of the token
+                try:
+                    token.user = User.objects.select_related(
+                        *self.user_select_related
+                    ).get(id=token.user_id)
+                except User.DoesNotExist:
+                    raise exceptions.AuthenticationFailed('Invalid token.')
 
         if (not token.user.is_active) or token.user.is_deleted:
             raise exceptions.AuthenticationFailed('User inactive or deleted.')
@@ -21,3 +45,12 @@ class ExpiringTokenAuthentication(TokenAuthentication):
             raise exceptions.AuthenticationFailed('Expired token.')
 
         return (token.user, token)
+
+
+class ProfileExpiringTokenAuthentication(ExpiringTokenAuthentication):
+    """For views reading the current user's profile (and cart id):
+    a single query loads them all, `request.user.user_profile` and
+    `request.user.cart` are then free.
+    """
+
+    user_select_related = ('user_profile', 'cart')
@@ -0,0 +1,40 @@
+from django_filters import (
+    BooleanFilter,
+    CharFilter,
+    ChoiceFilter,
+    FilterSet,
+)
+
+from .models import (
+    ACCOUNT_TYPE_CHOICES,
+)
+from .utils import (
+    UserSearchUtil,
+)
+
+
+class UserSearchFilterSet(FilterSet):
+    search = CharFilter(
+        method='perform_search'
+    )
+    account_type = ChoiceFilter(
+        field_name='account_type', choices=ACCOUNT_TYPE_CHOICES
+    )
+    is_active = BooleanFilter(
+        field_name='is_active'
+    )
+    is_deleted = BooleanFilter(
+        field_name='is_deleted'
+    )
+
+    def filter_queryset(self, queryset):
+        # deleted users only on request: the list's keyset index
+        # (account_type, id) is partial, WHERE is_deleted = false
+        if self.form.cleaned_data.get('is_deleted') is None:
+            queryset = queryset.filter(is_deleted=False)
+
+        return super().filter_queryset(queryset)
+
+    @staticmethod
+    def perform_search(queryset, name, value):
+        return UserSearchUtil.search(queryset, value)
@@ -7,9 +7,6 @@ from .models import (
     User,
     UserProfile,
 )
-from apps.shop.models import (
-    Cart,
-)
 
 
 class UserCreationForm(UserCreationFormBase):
@@ -21,8 +18,6 @@ class UserCreationForm(UserCreationFormBase):
         user = super().save()
         if not hasattr(user, 'user_profile'):
             UserProfile.objects.create(user=user)
-        if not hasattr(user, 'cart'):
-            Cart.objects.create(user=user)
 
         return user
 
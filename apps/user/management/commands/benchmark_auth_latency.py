@@ -0,0 +1,119 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+)
+from django.test import (
+    AsyncClient,
+    override_settings,
+)
+
+from apps.user.models import (
+    User,
+)
+
+
+class Command(BaseCommand):
+    help = 'Measures the latency of another endpoint through the ASGI ' \
+           'handler while many logins run concurrently, with the async ' \
+           '(default) or the sync (--sync) login view. Creates and ' \
+           'removes a throwaway user: run it against a development ' \
+           'database.'
+
+    SYNC_LOGIN_PATH = '/users/login/'
+    ASYNC_LOGIN_PATH = '/users/async/login/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='logins in flight at once')
+        parser.add_argument('--probe-path', default='/shop/categories/')
+        parser.add_argument('--probe-interval', type=float, default=0.01)
+        parser.add_argument('--sync', action='store_true',
+                            help='log in through the sync view')
+
+    def handle(self, logins, concurrency, probe_path, probe_interval, sync,
+               **options):
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(
+            f'benchmark-{uuid.uuid4().hex}@example.invalid', password,
+            is_active=True
+        )
+        login_path = self.SYNC_LOGIN_PATH if sync else self.ASYNC_LOGIN_PATH
+
+        # no login throttling while benchmarking
+        rest_framework = {**settings.REST_FRAMEWORK,
+                          'DEFAULT_THROTTLE_RATES': {}}
+        try:
+            with override_settings(
+                    REST_FRAMEWORK=rest_framework,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                baseline, loaded, statuses, elapsed = asyncio.run(
+                    self.run_benchmark(
+                        login_path, user.email, password, logins,
+                        concurrency, probe_path, probe_interval
+                    )
+                )
+        finally:
+            user.delete()
+
+        self.stdout.write(
+            f'{logins} logins via {login_path} in {elapsed:.2f}s '
+            f'({logins / elapsed:.0f}/s), statuses: '
+            + ', '.join(f'{status}: {count}'
+                        for status, count in sorted(statuses.items()))
+        )
+        self.write_latencies(f'{probe_path} idle', baseline)
+        self.write_latencies(f'{probe_path} under logins', loaded)
+
+    async def run_benchmark(self, login_path, email, password, logins,
+                            concurrency, probe_path, probe_interval):
+        client = AsyncClient()
+
+        baseline = [await self.probe(client, probe_path) for _ in range(20)]
+
+        statuses = {}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    login_path, {'username': email, 'password': password},
+                    content_type='application/json'
+                )
+                statuses[response.status_code] = \
+                    statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        logins_task = asyncio.gather(*(login() for _ in range(logins)))
+
+        loaded = []
+        while not logins_task.done():
+            loaded.append(await self.probe(client, probe_path))
+            await asyncio.sleep(probe_interval)
+        await logins_task
+
+        return baseline, loaded, statuses, time.perf_counter() - started
+
+    @staticmethod
+    async def probe(client, path) -> float:
+        started = time.perf_counter()
+        await client.get(path)
+        return (time.perf_counter() - started) * 1000
+
+    def write_latencies(self, name, latencies):
+        if not latencies:
+            self.stdout.write(f'{name}: no samples')
+            return
+
+        latencies = sorted(latencies)
+        self.stdout.write(
+            f'{name}: {len(latencies)} requests, '
+            f'p50 {statistics.median(latencies):.1f}ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95)]:.1f}ms, '
+            f'max {latencies[-1]:.1f}ms'
+        )
@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.user.utils import (
+    UserProvisioningUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Creates users (and their profiles) from a CSV or JSON Lines ' \
+           'file ("-" for stdin); see UserProvisioningUtil for the fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=StreamUtil.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='processes validating rows and hashing plaintext passwords'
+        )
+        parser.add_argument(
+            '--create-carts', action='store_true',
+            help='create empty carts too (otherwise created on first use)'
+        )
+
+    def handle(self, path, format, batch_size, workers, create_carts,
+               **options):
+        try:
+            format_ = StreamUtil.get_format(path, format)
+        except ValueError as e:
+            raise CommandError(f'{e}, use --format')
+
+        file = sys.stdin if path == '-' \
+            else open(path, newline='', encoding='utf8')
+
+        created = failed = 0
+        try:
+            for batch_created, errors in UserProvisioningUtil.provision(
+                    StreamUtil.read_rows(file, format_),
+                    batch_size=batch_size,
+                    workers=workers,
+                    create_carts=create_carts,
+            ):
+                created += batch_created
+                failed += len(errors)
+                for line_number, error in errors:
+                    self.stderr.write(f'row {line_number}: {error}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{created} created, {failed} failed')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} created, {failed} failed'
+        ))
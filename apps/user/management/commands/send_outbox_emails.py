@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import (
+    BaseCommand,
+)
+
+from apps.user.utils import (
+    EmailOutboxUtil,
+    EmailUtil,
+)
+
+
+class Command(BaseCommand):
+    help = 'Sends the pending EmailOutbox emails in batches over a single ' \
+           'mail connection; with --loop keeps polling for new ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='seconds between polls, with --loop')
+
+    def handle(self, batch_size, loop, interval, **options):
+        while True:
+            sent = failed = 0
+            for batch_sent, batch_failed in EmailOutboxUtil.drain(
+                    batch_size, EmailUtil.get_content):
+                sent += batch_sent
+                failed += batch_failed
+
+            if sent or failed or not loop:
+                style = self.style.WARNING if failed else self.style.SUCCESS
+                self.stdout.write(style(f'{sent} sent, {failed} failed'))
+
+            if not loop:
+                return
+            time.sleep(interval)
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:01
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# UserSearchUtil: `UPPER(f) LIKE 'T%'` / `UPPER(f) LIKE '%TERM%'`
+POSTGRES_SEARCH_INDEXES = tuple(
+    index
+    for table, column in (
+        ('user_user', 'email'),
+        ('user_userprofile', 'first_name'),
+        ('user_userprofile', 'last_name'),
+        ('user_userprofile', 'phone_number'),
+    )
+    for index in (
+        (f'{table}_{column}_upper_prefix_idx', table,
+         f'btree (UPPER({column}) text_pattern_ops)'),
+        (f'{table}_{column}_upper_trgm_idx', table,
+         f'gin (UPPER({column}) gin_trgm_ops)'),
+    )
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, definition in POSTGRES_SEARCH_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} USING {definition}'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, _, _ in POSTGRES_SEARCH_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_email_outbox'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['account_type', 'id'], name='user_user_type_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_active=False), fields=['id'], name='user_user_inactive_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_deleted=True), fields=['id'], name='user_user_deleted_id_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emailoutbox',
+            name='user_emailoutbox_pending_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='emailoutbox',
+            name='user_emailoutbox_dedupe_idx',
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='dedupe_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='emailoutbox',
+            index=models.Index(condition=models.Q(sent_at__isnull=True), fields=['next_attempt_at', 'id'], name='user_emailoutbox_pending_idx'),
+        ),
+    ]
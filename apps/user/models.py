@@ -3,14 +3,11 @@ from django.contrib.auth.models import (
     BaseUserManager,
 )
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 from rest_framework.authtoken.models import Token
 
-from apps.shop.models import (
-    Cart,
-)
-
 
 ACCOUNT_TYPE_STANDARD = 'standard'
 ACCOUNT_TYPE_MODERATOR = 'moderator'
@@ -21,6 +18,11 @@ ACCOUNT_TYPE_CHOICES = [
     (ACCOUNT_TYPE_ADMIN, 'Admin'),
 ]
 
+EMAIL_KIND_ACTIVATION = 'activation'
+EMAIL_KIND_CHOICES = [
+    (EMAIL_KIND_ACTIVATION, 'Account activation'),
+]
+
 SEX_M = 'm'
 SEX_F = 'f'
 SEX_CHOICES = [
@@ -47,18 +49,23 @@ class ExpiringAuthToken(Token):
 class UserManager(BaseUserManager):
     use_in_migrations = True
 
-    def _create_user(self, email, password, **kwargs):
+    def _create_user(self, email, password, password_hash=None, **kwargs):
+        """
+        password_hash: an already hashed password (e.g. made off the
+        request thread), used instead of hashing `password`
+        """
         email = self.normalize_email(email)
         user_profile_data = kwargs.pop('user_profile', {})
 
         user = self.model(email=email, **kwargs)
-        user.set_password(password)
+        if password_hash is None:
+            user.set_password(password)
+        else:
+            user.password = password_hash
         user.save()
 
         UserProfile.objects.create(user=user, **user_profile_data)
 
-        Cart.objects.create(user=user)
-
         return user
 
     def create_user(self, email, password, **kwargs):
@@ -78,6 +85,16 @@ class User(AbstractBaseUser):
     class Meta:
         verbose_name = 'user'
         verbose_name_plural = 'users'
+        indexes = (
+            # moderator lists (UserSearchFilterSet), in keyset order
+            models.Index(fields=('account_type', 'id'),
+                         condition=Q(is_deleted=False),
+                         name='user_user_type_id_idx'),
+            models.Index(fields=('id',), condition=Q(is_active=False),
+                         name='user_user_inactive_id_idx'),
+            models.Index(fields=('id',), condition=Q(is_deleted=True),
+                         name='user_user_deleted_id_idx'),
+        )
 
     objects = UserManager()
 
@@ -119,3 +136,44 @@ class UserProfile(models.Model):
     avatar = models.ImageField(
         upload_to='user_avatars/', null=True, blank=True
     )
+
+
+class EmailOutbox(models.Model):
+    """Emails waiting to be sent by the `send_outbox_emails` worker,
+    so that requests never talk to the mail server.
+    """
+
+    class Meta:
+        verbose_name = 'outbox email'
+        verbose_name_plural = 'outbox emails'
+        indexes = (
+            # the worker's queue
+            models.Index(fields=('next_attempt_at', 'id'),
+                         condition=Q(sent_at__isnull=True),
+                         name='user_emailoutbox_pending_idx'),
+        )
+
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE,
+                             related_name='outbox_emails',
+                             null=True, blank=True)
+    kind = models.CharField(max_length=32, choices=EMAIL_KIND_CHOICES)
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+
+    # kind, user and time window of the email; a second email of the same
+    # window is rejected by the unique index
+    dedupe_key = models.CharField(max_length=64, unique=True, null=True,
+                                  blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # claimed by a worker or backing off after a failure until then
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.kind} - {self.to_email}'
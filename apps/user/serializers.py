@@ -37,14 +37,29 @@ class RegistrationSerializer(serializers.ModelSerializer):
 
         return super().validate(attrs)
 
-    def save(self):
+    def save(self, password_hash: str = None):
+        """
+        password_hash: the already hashed password, if hashed elsewhere
+        """
         return User.objects.create(
             email=self.validated_data['email'],
             password=self.validated_data['password'],
+            password_hash=password_hash,
             user_profile=self.validated_data.get('user_profile', {})
         )
 
 
+class LoginSerializer(serializers.Serializer):
+    """Login input, as AuthTokenSerializer's; the credentials are checked
+    by AuthUtil.
+    """
+
+    username = serializers.CharField(label='Email')
+    password = serializers.CharField(
+        style={'input_type': 'password'}, trim_whitespace=False
+    )
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     password_max_length = User._meta.get_field('password').max_length
     old_password = serializers.CharField(max_length=password_max_length)
@@ -0,0 +1,37 @@
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+)
+from django.dispatch import (
+    receiver,
+)
+
+from .models import (
+    ExpiringAuthToken,
+    User,
+)
+from .utils import (
+    TokenCacheUtil,
+)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    # activation, deletion, account type or password changes, admin edits
+    if not created:
+        TokenCacheUtil.invalidate_user(instance.id)
+
+
+@receiver(post_init, sender=ExpiringAuthToken)
+def remember_token_key(sender, instance, **kwargs):
+    instance._loaded_key = instance.__dict__.get('key')
+
+
+@receiver(post_save, sender=ExpiringAuthToken)
+@receiver(post_delete, sender=ExpiringAuthToken)
+def invalidate_token(sender, instance, **kwargs):
+    # ExpiringAuthToken.update() replaces the key
+    if instance._loaded_key:
+        TokenCacheUtil.invalidate(instance._loaded_key)
+    instance._loaded_key = instance.key
@@ -1,3 +1,248 @@
-from django.test import TestCase  # noqa
+from datetime import (
+    timedelta,
+)
+from io import (
+    StringIO,
+)
 
-# Create your tests here.
+from django.conf import (
+    settings,
+)
+from django.core import (
+    mail,
+)
+from django.core.cache import (
+    cache,
+)
+from django.core.management import (
+    call_command,
+)
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.utils import (
+    timezone,
+)
+from rest_framework.test import (
+    APIClient,
+)
+
+from apps.base.throttling import (
+    TokenBucketThrottle,
+)
+from apps.user.models import (
+    ACCOUNT_TYPE_MODERATOR,
+    EMAIL_KIND_ACTIVATION,
+    EmailOutbox,
+    ExpiringAuthToken,
+    User,
+)
+from apps.user.utils import (
+    EmailOutboxUtil,
+    TokenCacheUtil,
+    UserProvisioningUtil,
+)
+
+
+class CurrentUserQueriesTestCase(TestCase):
+    """The current user's token, profile and cart come from one query,
+    whether the token is cached or not.
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(
+            'current@example.com', 'password', is_active=True
+        )
+        token, _ = ExpiringAuthToken.objects.get_or_create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def tearDown(self):
+        self.clear_token_cache()
+
+    @staticmethod
+    def clear_token_cache():
+        cache.clear()
+        with TokenCacheUtil._lock:
+            TokenCacheUtil._local.clear()
+
+    def assert_single_query(self, url):
+        for cached in (False, True):
+            if not cached:
+                self.clear_token_cache()
+            with self.subTest(cached=cached), self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_detail(self):
+        self.assert_single_query('/users/current/detail/')
+
+    def test_profile(self):
+        self.assert_single_query('/users/current/profile/')
+
+
+class UserProvisioningTestCase(TestCase):
+    def provision(self, emails: list) -> tuple:
+        created = 0
+        errors = []
+        for batch_created, batch_errors in UserProvisioningUtil.provision(
+                {'email': email} for email in emails):
+            created += batch_created
+            errors += batch_errors
+
+        return created, [line_number for line_number, _ in errors]
+
+    def test_existing_emails_are_matched_case_insensitively(self):
+        # the unique constraint lets case variants coexist
+        User.objects.create_user('Case@example.com', None)
+        User.objects.create_user('case@example.com', None)
+
+        self.assertEqual(
+            self.provision(['CASE@example.com', 'new@example.com']),
+            (1, [1])
+        )
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+    def test_existing_email_with_differently_uppercased_characters(self):
+        # Python uppercases ß to SS, SQL UPPER() may leave it
+        User.objects.create_user('a@straße.de', None)
+
+        self.assertEqual(self.provision(['a@straße.de']), (0, [1]))
+        self.assertEqual(User.objects.count(), 1)
+
+
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def register(self, email: str):
+        response = APIClient().post('/users/register/', {
+            'email': email, 'password': 'Fr0m-the-outbox'
+        })
+        self.assertEqual(response.status_code, 204)
+
+    def test_activation_email_is_sent_by_the_worker(self):
+        self.register('outbox@example.com')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+        stdout = StringIO()
+        call_command('send_outbox_emails', stdout=stdout)
+        self.assertIn('1 sent, 0 failed', stdout.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['outbox@example.com'])
+        self.assertIsNotNone(EmailOutbox.objects.get().sent_at)
+
+        call_command('send_outbox_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_email_backs_off(self):
+        email = EmailOutboxUtil.enqueue(
+            EMAIL_KIND_ACTIVATION, 'failing@example.com', 'subject', 'body'
+        )
+
+        def get_content(email):
+            raise RuntimeError('no content')
+
+        self.assertEqual(
+            list(EmailOutboxUtil.drain(get_content=get_content)), [(0, 1)]
+        )
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'RuntimeError: no content')
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertFalse(EmailOutboxUtil.get_pending().exists())
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now()
+                                   - timedelta(seconds=1))
+        self.assertEqual(list(EmailOutboxUtil.drain()), [(1, 0)])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'login': '5/m', 'login_account': '2/m'},
+})
+class LoginThrottleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        TokenBucketThrottle._denied_until.clear()
+        self.client = APIClient()
+
+    def login(self, username: str):
+        return self.client.post('/users/login/', {
+            'username': username, 'password': 'wrong'
+        })
+
+    def test_account_bucket(self):
+        for _ in range(2):
+            self.assertEqual(self.login('bucket@example.com').status_code, 400)
+
+        # emails are matched case-insensitively
+        response = self.login('Bucket@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        self.assertEqual(self.login('other@example.com').status_code, 400)
+
+    def test_ip_bucket(self):
+        statuses = [
+            self.login(f'{i // 2}@example.com').status_code for i in range(7)
+        ]
+        self.assertEqual(statuses, [400, 400, 400, 400, 400, 429, 429])
+
+
+class UserSearchTestCase(TestCase):
+    def setUp(self):
+        moderator = User.objects.create_user(
+            'moderator@example.com', None,
+            account_type=ACCOUNT_TYPE_MODERATOR
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(moderator)
+
+        for email, first_name, last_name, phone_number in (
+                ('smith@example.com', 'John', 'Smith', '+1555000'),
+                ('doe@example.com', 'John', 'Doe', '+1777000'),
+                ('major@example.com', 'Ann', 'Major', None)):
+            User.objects.create_user(email, None, user_profile={
+                'first_name': first_name,
+                'last_name': last_name,
+                'phone_number': phone_number,
+            })
+
+    def search(self, query: str) -> set:
+        response = self.client.get(f'/users/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {user['email'] for user in response.data['results']}
+
+    def test_every_term_must_match(self):
+        self.assertEqual(
+            self.search('search=john'),
+            {'smith@example.com', 'doe@example.com'}
+        )
+        self.assertEqual(self.search('search=john smi'), {'smith@example.com'})
+        self.assertEqual(self.search('search=555'), {'smith@example.com'})
+
+    def test_short_terms_are_prefixes(self):
+        self.assertEqual(
+            self.search('search=jo'),
+            {'smith@example.com', 'doe@example.com'}
+        )
+        self.assertEqual(self.search('search=aj'), set())
+        self.assertEqual(self.search('search=ajo'), {'major@example.com'})
+
+    def test_deleted_users_only_on_request(self):
+        User.objects.filter(email='doe@example.com').update(is_deleted=True)
+
+        self.assertEqual(self.search('search=john'), {'smith@example.com'})
+        self.assertEqual(
+            self.search('search=john&is_deleted=true'), {'doe@example.com'}
+        )
+
+    def test_standard_users_are_forbidden(self):
+        self.client.force_authenticate(
+            User.objects.get(email='smith@example.com')
+        )
+        self.assertEqual(self.client.get('/users/').status_code, 403)
@@ -1,5 +1,8 @@
 from django.urls import path
 
+from . import (
+    async_views,
+)
 from .views import (
     ChangePasswordView,
     ObtainExpiringAuthTokenView,
@@ -7,6 +10,7 @@ from .views import (
     ActivateUserView,
     DeleteUserView,
     ProfileView,
+    TokenCacheStatsView,
     UserDetailView,
     UserListView,
 )
@@ -20,5 +24,12 @@ urlpatterns = [
     path('current/profile/', ProfileView.as_view()),
     path('current/change_password/', ChangePasswordView.as_view()),
     path('current/detail/', UserDetailView.as_view()),
+    path('token_cache/stats/', TokenCacheStatsView.as_view()),
     path('', UserListView.as_view()),
+
+    # ASGI: password hashing off the shared sync thread
+    path('async/login/', async_views.login_view),
+    path('async/register/', async_views.register_view),
+    path('async/current/change_password/',
+         async_views.change_password_view),
 ]
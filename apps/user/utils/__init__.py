@@ -1,3 +1,12 @@
 # flake8: noqa
 from .activation_token_util import ActivationTokenUtil
-from .email_util import EmailUtil
\ No newline at end of file
+from .auth_util import AuthUtil
+from .email_outbox_util import EmailOutboxUtil
+from .email_util import EmailUtil
+from .password_hashing_util import (
+    PasswordHashingOverloaded,
+    PasswordHashingUtil,
+)
+from .token_cache_util import TokenCacheUtil
+from .user_provisioning_util import UserProvisioningUtil
+from .user_search_util import UserSearchUtil
@@ -0,0 +1,146 @@
+from django.contrib.auth.hashers import (
+    check_password,
+    make_password,
+)
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+
+from .email_util import EmailUtil
+from apps.shop.exceptions import (
+    CartLimitException,
+)
+from apps.shop.utils import (
+    GuestCartUtil,
+)
+from apps.user.backends import AuthBackend
+from apps.user.models import (
+    ExpiringAuthToken,
+    User,
+)
+
+
+class AuthUtil:
+    """Login, registration and password change steps shared by the sync
+    views and their async variants.\n
+    The password hashing steps (`verify_password`, `make_password`) are
+    plain functions: the sync views call them inline, the async views run
+    them on PasswordHashingUtil's pool and the other steps through
+    `sync_to_async`.
+    """
+
+    INVALID_CREDENTIALS_MESSAGE = \
+        'Unable to log in with provided credentials.'
+    INCORRECT_OLD_PASSWORD_MESSAGE = 'Incorrect old password'
+
+    @staticmethod
+    def get_login_user(email: str):
+        """
+        The user who may log in with the email, None if there is none
+        """
+        try:
+            user = User._default_manager.get_by_natural_key(email)
+        except User.DoesNotExist:
+            return None
+
+        return user if AuthBackend().user_can_authenticate(user) else None
+
+    @staticmethod
+    def verify_password(password: str, encoded) -> tuple:
+        """
+        `(valid, must be rehashed)`; hashes anyway for a missing user
+        (`encoded` None, as ModelBackend does), so that unknown emails
+        can't be told apart by the response time
+        """
+        if encoded is None:
+            make_password(password)
+            return False, False
+
+        must_update = []
+        valid = check_password(
+            password, encoded, setter=lambda _: must_update.append(True)
+        )
+        return valid, bool(must_update)
+
+    @staticmethod
+    def make_password(password: str) -> str:
+        return make_password(password)
+
+    @staticmethod
+    def save_password_hash(user: User, password_hash: str):
+        user.password = password_hash
+        user.save(update_fields=('password',))
+
+    @classmethod
+    def authenticate(cls, email: str, password: str):
+        """
+        The user if the credentials are valid, else None; outdated hashes
+        are upgraded (what ModelBackend.authenticate does)
+        """
+        user = cls.get_login_user(email)
+        valid, must_update = cls.verify_password(
+            password, user and user.password
+        )
+        if not valid:
+            return None
+
+        if must_update:
+            cls.save_password_hash(user, cls.make_password(password))
+        return user
+
+    @staticmethod
+    def get_token_key(user: User):
+        """
+        The user's (renewed if expired) auth token key; None for inactive
+        users, who are sent the activation email again
+        """
+        if not user.is_active:
+            EmailUtil.enqueue_activation_email(user)
+            return None
+
+        token, created = ExpiringAuthToken.objects.get_or_create(user=user)
+
+        if not created:
+            if token.expired():
+                token.update()
+                token.save()
+
+        return token.key
+
+    @staticmethod
+    def merge_guest_cart(request, response, user: User):
+        """
+        Merges the guest cart built before logging in into the user's
+        Cart and clears its cookie; a cart with too many lines to merge
+        is kept as is
+        """
+        guest_cart = GuestCartUtil.read(request)
+        if not guest_cart:
+            return
+
+        try:
+            GuestCartUtil.merge(user, guest_cart)
+            GuestCartUtil.clear(response)
+        except CartLimitException:
+            pass
+
+    @staticmethod
+    def register(serializer, password_hash: str = None) -> User:
+        """
+        Saves a valid RegistrationSerializer (with an already hashed
+        password if given), enqueues the activation email
+        """
+        user = serializer.save(password_hash=password_hash)
+        EmailUtil.enqueue_activation_email(user)
+        return user
+
+    @staticmethod
+    def get_new_password_errors(user: User, new_password: str) -> list:
+        """
+        Password validation messages, empty if the password is valid
+        """
+        try:
+            validate_password(new_password, user)
+        except ValidationError as e:
+            return e.messages
+
+        return []
@@ -0,0 +1,172 @@
+from datetime import timedelta
+from typing import (
+    Callable,
+)
+
+from django.conf import settings
+from django.core.mail import (
+    EmailMultiAlternatives,
+    get_connection,
+)
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from apps.user.models import EmailOutbox
+
+
+class EmailOutboxUtil:
+    """Enqueues emails into the EmailOutbox table and drains it in batches
+    over a single mail connection (whatever EMAIL_BACKEND is configured).\n
+    A worker claims a batch (`SELECT ... FOR UPDATE SKIP LOCKED`, then
+    `next_attempt_at` is pushed CLAIM_TIMEOUT ahead) in a short
+    transaction and sends it after the commit, so no lock is held while
+    talking to the mail server; a crashed worker's batch is picked up
+    again once the claim expires. Failed emails are retried with an
+    exponential backoff.
+    """
+
+    MAX_ATTEMPTS = 5
+    CLAIM_TIMEOUT = timedelta(minutes=5)
+    RETRY_BACKOFF = timedelta(minutes=1)
+
+    @staticmethod
+    def get_dedupe_key(kind: str, user_id: int, period_in_seconds: int) \
+            -> str:
+        window = int(timezone.now().timestamp()) // period_in_seconds
+        return f'{kind}:{user_id}:{period_in_seconds}:{window}'
+
+    @classmethod
+    def enqueue(cls, kind: str, to_email: str, subject: str, body: str,
+                html_body: str = '', user=None,
+                dedupe_period_in_seconds: int = None):
+        """
+        Returns the new EmailOutbox, None if an email of the same kind has
+        already been enqueued for the user in the current dedupe period
+        (fixed windows of that length, enforced by a unique index)
+        """
+        dedupe_key = None
+        if user is not None and dedupe_period_in_seconds:
+            dedupe_key = cls.get_dedupe_key(
+                kind, user.id, dedupe_period_in_seconds
+            )
+
+        try:
+            with transaction.atomic():
+                return EmailOutbox.objects.create(
+                    user=user,
+                    kind=kind,
+                    to_email=to_email,
+                    subject=subject,
+                    body=body,
+                    html_body=html_body,
+                    dedupe_key=dedupe_key,
+                )
+        except IntegrityError:
+            if dedupe_key is None:
+                raise
+            return None
+
+    @classmethod
+    def get_pending(cls):
+        """
+        Unsent emails due now, neither claimed nor backing off
+        """
+        return EmailOutbox.objects \
+            .filter(sent_at__isnull=True, attempts__lt=cls.MAX_ATTEMPTS,
+                    next_attempt_at__lte=timezone.now()) \
+            .order_by('next_attempt_at', 'id')
+
+    @staticmethod
+    def get_content(email: EmailOutbox) -> tuple:
+        """
+        `(subject, body, html body)` as enqueued
+        """
+        return email.subject, email.body, email.html_body
+
+    @staticmethod
+    def get_message(email: EmailOutbox, content: tuple,
+                    connection) -> EmailMultiAlternatives:
+        subject, body, html_body = content
+        message = EmailMultiAlternatives(
+            subject, body, settings.EMAIL_HOST_USER,
+            [email.to_email], connection=connection
+        )
+        if html_body:
+            message.attach_alternative(html_body, 'text/html')
+        return message
+
+    @classmethod
+    def claim_batch(cls, batch_size: int) -> list:
+        """
+        Up to `batch_size` pending emails, claimed for CLAIM_TIMEOUT
+        (other workers skip them meanwhile)
+        """
+        with transaction.atomic():
+            emails = list(
+                cls.get_pending().select_for_update(skip_locked=True)
+                [:batch_size]
+            )
+            EmailOutbox.objects.filter(id__in=[e.id for e in emails]).update(
+                next_attempt_at=timezone.now() + cls.CLAIM_TIMEOUT,
+                attempts=F('attempts') + 1
+            )
+
+        return emails
+
+    @classmethod
+    def send_batch(cls, connection, batch_size: int,
+                   get_content: Callable = None) -> tuple:
+        """
+        Claims and sends up to `batch_size` pending emails, their content
+        built by `get_content(email)` right before sending;
+        returns `(sent, failed)`
+        """
+        get_content = get_content or cls.get_content
+        sent_ids = []
+        failed = []
+        for email in cls.claim_batch(batch_size):
+            try:
+                cls.get_message(
+                    email, get_content(email), connection
+                ).send()
+                sent_ids.append(email.id)
+            except Exception as e:
+                failed.append((email, f'{type(e).__name__}: {e}'))
+
+        now = timezone.now()
+        EmailOutbox.objects.filter(id__in=sent_ids).update(sent_at=now)
+        for email, error in failed:
+            # the claim already counted this attempt
+            EmailOutbox.objects.filter(id=email.id).update(
+                last_error=error,
+                next_attempt_at=now
+                + cls.RETRY_BACKOFF * 2 ** email.attempts
+            )
+
+        return len(sent_ids), len(failed)
+
+    @classmethod
+    def drain(cls, batch_size: int = 100, get_content: Callable = None):
+        """
+        Sends all the pending emails over one connection,
+        yields `(sent, failed)` per batch; failed emails wait for their
+        backoff, they are not retried by the same drain
+        """
+        connection = get_connection()
+        connection.open()
+        try:
+            while True:
+                sent, failed = cls.send_batch(
+                    connection, batch_size, get_content
+                )
+                if sent or failed:
+                    yield sent, failed
+                # nothing left, or the mail server is failing
+                if not sent or sent + failed < batch_size:
+                    return
+        finally:
+            connection.close()
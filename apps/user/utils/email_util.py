@@ -1,26 +1,51 @@
 from django.conf import settings
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
 from .activation_token_util import ActivationTokenUtil
+from .email_outbox_util import EmailOutboxUtil
+from apps.user.models import (
+    EMAIL_KIND_ACTIVATION,
+    EmailOutbox,
+)
 
 
 class EmailUtil:
+    # repeated registration / login attempts enqueue one email per period
+    ACTIVATION_EMAIL_DEDUPE_PERIOD_IN_SECONDS = 10 * 60
+
+    @classmethod
+    def enqueue_activation_email(cls, user):
+        """
+        Enqueues the activation email, sent by `send_outbox_emails`;
+        its link is made at send time, the token expiring
+        USER_ACTIVATION_EXPIRATION_PERIOD_IN_SECONDS after that
+        """
+        return EmailOutboxUtil.enqueue(
+            EMAIL_KIND_ACTIVATION,
+            user.email,
+            'Account activation',
+            '...',
+            user=user,
+            dedupe_period_in_seconds=cls.ACTIVATION_EMAIL_DEDUPE_PERIOD_IN_SECONDS  # noqa
+        )
+
     @staticmethod
-    def send_activation_email(user, raise_exception=True):
-        try:
-            send_mail(
-                'Account activation',
-                '...',
-                settings.EMAIL_HOST_USER,
-                [user.email],
-                html_message=render_to_string(
-                    'activation_email.html',
-                    {'link':
-                        f'{settings.USER_ACTIVATION_URI}'
-                        f'{ActivationTokenUtil.get_encrypted_token_string(user.id)}'}  # noqa
-                )
-            )
-        except Exception as e:
-            if raise_exception:
-                raise e
+    def get_activation_html_body(user_id: int) -> str:
+        return render_to_string(
+            'activation_email.html',
+            {'link':
+                f'{settings.USER_ACTIVATION_URI}'
+                f'{ActivationTokenUtil.get_encrypted_token_string(user_id)}'}
+        )
+
+    @classmethod
+    def get_content(cls, email: EmailOutbox) -> tuple:
+        """
+        For EmailOutboxUtil.drain: `(subject, body, html body)`,
+        activation links with a fresh token
+        """
+        if email.kind == EMAIL_KIND_ACTIVATION and email.user_id is not None:
+            return (email.subject, email.body,
+                    cls.get_activation_html_body(email.user_id))
+
+        return EmailOutboxUtil.get_content(email)
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    make_password,
+)
+
+
+class PasswordHashingOverloaded(Exception):
+    pass
+
+
+class PasswordHashingUtil:
+    """Runs password hashing (PBKDF2, ~100ms of CPU) for async views on a
+    dedicated, bounded thread pool, off the event loop and off the thread
+    that runs the sync views under ASGI.\n
+    At most PASSWORD_HASHING_MAX_PENDING hashes may be running or queued,
+    further calls raise PasswordHashingOverloaded (to be answered
+    with 503) instead of queueing without bound.
+    """
+
+    WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS',
+                      None) or os.cpu_count() or 1
+    MAX_PENDING = getattr(settings, 'PASSWORD_HASHING_MAX_PENDING',
+                          None) or 4 * WORKERS
+
+    _executor = None
+    _pending = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.WORKERS,
+                    thread_name_prefix='password-hashing'
+                )
+            return cls._executor
+
+    @classmethod
+    def get_pending(cls) -> int:
+        return cls._pending
+
+    @classmethod
+    async def run(cls, function, *args, **kwargs):
+        """
+        May raise PasswordHashingOverloaded
+        """
+        with cls._lock:
+            if cls._pending >= cls.MAX_PENDING:
+                raise PasswordHashingOverloaded
+            cls._pending += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                cls.get_executor(),
+                functools.partial(function, *args, **kwargs)
+            )
+        finally:
+            with cls._lock:
+                cls._pending -= 1
+
+    @classmethod
+    async def make_password(cls, password: str) -> str:
+        return await cls.run(make_password, password)
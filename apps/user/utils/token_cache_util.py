@@ -0,0 +1,182 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.base.utils import (
+    CacheVersionUtil,
+)
+from apps.user.models import (
+    ExpiringAuthToken,
+    User,
+)
+
+
+class TokenCacheUtil:
+    """Two-tier cache of auth token lookups:
+    a per-worker LRU with a short TTL in front of the shared cache.\n
+    An entry holds what authentication needs (user id, account_type,
+    is_active, is_deleted and the token creation time), so a cached
+    request builds `request.user` without a query (other User fields are
+    deferred and loaded on access).\n
+    Entries also hold the version of their user (a CacheVersionUtil
+    counter, bumped whenever the user is saved: deactivation, deletion,
+    account type or password changes), checked on every hit of either
+    tier, so a changed user is never authenticated from a stale entry on
+    any worker. Token changes drop the token's entry from the shared
+    cache and from the local LRU of the current worker; other workers may
+    keep serving a replaced token for at most LOCAL_TIMEOUT seconds.
+    """
+
+    KEY_PREFIX = 'auth_token'
+    SHARED_TIMEOUT = 5 * 60
+    LOCAL_TIMEOUT = 5
+    LOCAL_MAX_SIZE = 1024
+
+    USER_FIELDS = ('id', 'account_type', 'is_active', 'is_deleted')
+
+    _local = OrderedDict()
+    _lock = threading.Lock()
+    _stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @classmethod
+    def get_key(cls, token_key: str) -> str:
+        # raw tokens are never stored in the shared cache
+        digest = hashlib.sha256(token_key.encode('utf8')).hexdigest()
+        return f'{cls.KEY_PREFIX}:{digest}'
+
+    @classmethod
+    def count(cls, stat: str):
+        with cls._lock:
+            cls._stats[stat] += 1
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """
+        Counters of the current worker
+        """
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats['local_size'] = len(cls._local)
+
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = \
+            (lookups - stats['misses']) / lookups if lookups else None
+        return stats
+
+    @classmethod
+    def get(cls, token_key: str):
+        """
+        Cached entry of the token, None on a miss
+        """
+        key = cls.get_key(token_key)
+        now = time.monotonic()
+        with cls._lock:
+            local = cls._local.get(key)
+            if local is not None:
+                local_expires_at, entry = local
+                if local_expires_at > now:
+                    cls._local.move_to_end(key)
+                else:
+                    del cls._local[key]
+                    entry = None
+            else:
+                entry = None
+
+        if entry is not None and cls.is_current(entry):
+            cls.count('local_hits')
+            return entry
+
+        entry = cache.get(key)
+        if entry is None or not cls.is_current(entry):
+            cls.count('misses')
+            return None
+
+        cls.count('shared_hits')
+        cls.set_local(key, entry)
+        return entry
+
+    @staticmethod
+    def get_user_collection(user_id: int) -> str:
+        return f'auth_user:{user_id}'
+
+    @classmethod
+    def is_current(cls, entry: dict) -> bool:
+        return entry['user_version'] == CacheVersionUtil.get_version(
+            cls.get_user_collection(entry['id'])
+        )
+
+    @classmethod
+    def set(cls, token: ExpiringAuthToken) -> dict:
+        user_version = CacheVersionUtil.get_version(
+            cls.get_user_collection(token.user_id)
+        )
+        entry = {
+            'key': token.key,
+            'created': token.created.timestamp(),
+            'user_version': user_version,
+            **{
+                field: getattr(token.user, field)
+                for field in cls.USER_FIELDS
+            },
+        }
+        key = cls.get_key(token.key)
+        cache.set(key, entry, cls.SHARED_TIMEOUT)
+        cls.set_local(key, entry)
+        return entry
+
+    @classmethod
+    def set_local(cls, key: str, entry: dict):
+        with cls._lock:
+            cls._local[key] = (time.monotonic() + cls.LOCAL_TIMEOUT, entry)
+            cls._local.move_to_end(key)
+            while len(cls._local) > cls.LOCAL_MAX_SIZE:
+                cls._local.popitem(last=False)
+
+    @classmethod
+    def get_token(cls, entry: dict) -> ExpiringAuthToken:
+        """
+        Token (with its user) rebuilt from the entry, without a query
+        """
+        # from_db() expects the values in concrete field order
+        field_names = tuple(
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in cls.USER_FIELDS
+        )
+        user = User.from_db(
+            None, field_names, tuple(entry[field] for field in field_names)
+        )
+        token = ExpiringAuthToken(
+            key=entry['key'],
+            user=user,
+            created=datetime.fromtimestamp(entry['created'], tz=timezone.utc)
+        )
+        token._state.adding = False
+        return token
+
+    @classmethod
+    def invalidate_now(cls, token_key: str):
+        key = cls.get_key(token_key)
+        cache.delete(key)
+        with cls._lock:
+            cls._local.pop(key, None)
+
+    @classmethod
+    def invalidate(cls, token_key: str):
+        """
+        Drops the entry once the current transaction is committed
+        """
+        transaction.on_commit(lambda: cls.invalidate_now(token_key))
+
+    @classmethod
+    def invalidate_user(cls, user_id: int):
+        """
+        Outdates the entries of all the user's tokens, on every worker,
+        once the current transaction is committed
+        """
+        CacheVersionUtil.bump(cls.get_user_collection(user_id))
@@ -0,0 +1,220 @@
+from typing import (
+    Iterable,
+    Iterator,
+)
+
+from django.contrib.auth.hashers import (
+    identify_hasher,
+    make_password,
+)
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+from apps.base.utils import (
+    StreamUtil,
+)
+from apps.shop.models import (
+    Cart,
+)
+from apps.user.models import (
+    ACCOUNT_TYPE_CHOICES,
+    ACCOUNT_TYPE_STANDARD,
+    User,
+    UserProfile,
+)
+
+
+class UserProvisioningUtil:
+    """Bulk creation of users (with their profiles, optionally carts).\n
+    Rows: `{"email": <<str>>, "password": <<str, optional>>,
+    "password_hash": <<Django password hash, optional>>,
+    "account_type": <<str, optional>>, "is_active": <<bool, optional>>,
+    "first_name": ..., "last_name": ..., "phone_number": ...}`;
+    rows with neither password get an unusable one.\n
+    Rows are parsed, validated and their plaintext passwords hashed
+    without touching the database (so this part can run in a process
+    pool), then written batch by batch with one `bulk_create` per table,
+    each batch in its own transaction.
+    """
+
+    FIELDNAMES = ('email', 'password', 'password_hash', 'account_type',
+                  'is_active', 'first_name', 'last_name', 'phone_number')
+    PROFILE_FIELDS = ('first_name', 'last_name', 'phone_number')
+
+    ACCOUNT_TYPES = frozenset(value for value, _ in ACCOUNT_TYPE_CHOICES)
+    TRUE_VALUES = frozenset(('1', 'true', 'yes', 'y'))
+    # a batch losing a race for an email is rechecked and written again
+    MAX_WRITE_ATTEMPTS = 3
+
+    @classmethod
+    def parse_row(cls, row: dict) -> dict:
+        """
+        Cleaned row, raises ValueError
+        """
+        row = StreamUtil.check_row(row)
+        email = User.objects.normalize_email(
+            StreamUtil.get_text(row, 'email').strip()
+        )
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValueError(f'invalid email: {email}')
+
+        account_type = StreamUtil.get_text(row, 'account_type') \
+            or ACCOUNT_TYPE_STANDARD
+        if account_type not in cls.ACCOUNT_TYPES:
+            raise ValueError(f'unknown account_type: {account_type}')
+
+        is_active = row.get('is_active')
+        if not isinstance(is_active, bool):
+            is_active = str(is_active or '').strip().lower() \
+                in cls.TRUE_VALUES
+
+        plain_password = StreamUtil.get_text(row, 'password')
+        password_hash = StreamUtil.get_text(row, 'password_hash')
+        if plain_password:
+            password = make_password(plain_password)
+        elif password_hash:
+            password = password_hash
+            try:
+                identify_hasher(password)
+            except ValueError:
+                raise ValueError('unknown password_hash algorithm')
+        else:
+            password = make_password(None)
+
+        profile = {}
+        for field in cls.PROFILE_FIELDS:
+            value = StreamUtil.get_text(row, field).strip() or None
+            max_length = UserProfile._meta.get_field(field).max_length
+            if value is not None and len(value) > max_length:
+                raise ValueError(f'{field} is longer than {max_length}')
+            profile[field] = value
+
+        return {
+            'email': email,
+            'password': password,
+            'account_type': account_type,
+            'is_active': is_active,
+            'profile': profile,
+        }
+
+    @classmethod
+    def parse_batch(cls, batch: list) -> list:
+        """
+        [(line number, cleaned row or None, error or None)]
+        """
+        parsed = []
+        for line_number, row in batch:
+            try:
+                parsed.append((line_number, cls.parse_row(row), None))
+            except (ValueError, TypeError) as e:
+                parsed.append((line_number, None, str(e)))
+
+        return parsed
+
+    @classmethod
+    def provision(cls, rows: Iterable[dict], batch_size: int = 2000,
+                  workers: int = 1, create_carts: bool = False) \
+            -> Iterator[tuple]:
+        """
+        Yields `(created, [(line number, error)])` per batch
+        """
+        batches = StreamUtil.batched(enumerate(rows, start=1), batch_size)
+        for parsed in StreamUtil.parallel_map(
+                cls.parse_batch, batches, workers):
+            yield cls.write_batch(parsed, create_carts)
+
+    @staticmethod
+    def get_email_key(email: str) -> str:
+        """
+        Case-insensitive comparison key, as `UPPER(email)` (indexed)
+        """
+        return email.upper()
+
+    @classmethod
+    def write_batch(cls, parsed: list, create_carts: bool) -> tuple:
+        errors = [
+            (line_number, error)
+            for line_number, _, error in parsed if error is not None
+        ]
+        rows = {}
+        for line_number, row, error in parsed:
+            if error is not None:
+                continue
+            key = cls.get_email_key(row['email'])
+            if key in rows:
+                errors.append(
+                    (line_number, f'duplicate email: {row["email"]}')
+                )
+            else:
+                rows[key] = (line_number, row)
+
+        for attempt in range(1, cls.MAX_WRITE_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    created = cls.write_rows(rows, errors, create_carts)
+                break
+            except IntegrityError:
+                # an email inserted concurrently: the next attempt finds
+                # it among the existing ones
+                if attempt == cls.MAX_WRITE_ATTEMPTS:
+                    raise
+
+        return created, sorted(errors)
+
+    @classmethod
+    def write_rows(cls, rows: dict, errors: list, create_carts: bool) \
+            -> int:
+        """
+        Drops the rows of existing emails (case-insensitively) into
+        `errors`, creates the rest; call in a transaction
+        """
+        # several existing emails may share a key (the unique constraint
+        # is case-sensitive), and SQL and Python disagree on the case of
+        # some characters (UPPER('ß') is 'ß'): rows are matched on both
+        # keys, and on the exact email
+        existing = User.objects \
+            .annotate(email_key=Upper('email')) \
+            .filter(
+                Q(email_key__in=list(rows))
+                | Q(email__in=[row['email'] for _, row in rows.values()])
+            ).values_list('email', 'email_key')
+        for email, email_key in existing:
+            for key in (email_key, cls.get_email_key(email)):
+                line_number, _ = rows.pop(key, (None, None))
+                if line_number is not None:
+                    errors.append(
+                        (line_number, f'email already exists: {email}')
+                    )
+
+        User.objects.bulk_create(
+            User(
+                email=row['email'],
+                password=row['password'],
+                account_type=row['account_type'],
+                is_active=row['is_active'],
+            )
+            for _, row in rows.values()
+        )
+        # bulk_create doesn't return ids on every backend
+        user_ids = dict(User.objects.filter(
+            email__in=[row['email'] for _, row in rows.values()]
+        ).values_list('email', 'id'))
+
+        UserProfile.objects.bulk_create(
+            UserProfile(user_id=user_ids[row['email']], **row['profile'])
+            for _, row in rows.values()
+        )
+        if create_carts:
+            Cart.objects.bulk_create(
+                Cart(user_id=user_id) for user_id in user_ids.values()
+            )
+
+        return len(user_ids)
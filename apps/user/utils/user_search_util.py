@@ -0,0 +1,66 @@
+from django.db.models import (
+    Q,
+    QuerySet,
+)
+
+from apps.user.models import (
+    User,
+    UserProfile,
+)
+
+
+class UserSearchUtil:
+    """Moderator search over email and profile names / phone number.\n
+    Every whitespace separated term must match one of the user's
+    USER_SEARCH_FIELDS or PROFILE_SEARCH_FIELDS: terms shorter than a
+    trigram are matched as prefixes (`UPPER(f) LIKE 'T%'`, btree
+    text_pattern_ops indexes), longer ones anywhere
+    (`UPPER(f) LIKE '%TERM%'`, GIN trigram indexes). Each table is
+    searched on its own and the matching ids are UNIONed, so that every
+    branch can use its indexes (an OR across the joined tables can't);
+    the indexes are PostgreSQL only, see migration
+    0004_user_search_indexes.
+    """
+
+    USER_SEARCH_FIELDS = (
+        'email',
+    )
+    PROFILE_SEARCH_FIELDS = (
+        'first_name',
+        'last_name',
+        'phone_number',
+    )
+    # the same fields through the User, for the admin's search
+    SEARCH_FIELDS = USER_SEARCH_FIELDS + tuple(
+        f'user_profile__{field}' for field in PROFILE_SEARCH_FIELDS
+    )
+    MIN_CONTAINS_LENGTH = 3
+
+    @staticmethod
+    def get_term_filter(fields: tuple, lookup: str, term: str) -> Q:
+        term_filter = Q()
+        for field in fields:
+            term_filter |= Q(**{f'{field}__{lookup}': term})
+
+        return term_filter
+
+    @classmethod
+    def get_term_user_ids(cls, term: str) -> QuerySet:
+        """
+        `SELECT id FROM user ... UNION SELECT user_id FROM profile ...`
+        """
+        lookup = 'icontains' if len(term) >= cls.MIN_CONTAINS_LENGTH \
+            else 'istartswith'
+
+        return User.objects.filter(
+            cls.get_term_filter(cls.USER_SEARCH_FIELDS, lookup, term)
+        ).values('id').union(UserProfile.objects.filter(
+            cls.get_term_filter(cls.PROFILE_SEARCH_FIELDS, lookup, term)
+        ).values('user_id'))
+
+    @classmethod
+    def search(cls, queryset: QuerySet, value: str) -> QuerySet:
+        for term in value.split():
+            queryset = queryset.filter(id__in=cls.get_term_user_ids(term))
+
+        return queryset
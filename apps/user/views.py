@@ -1,22 +1,27 @@
-from django.contrib.auth.password_validation import validate_password
-from django.core.exceptions import ValidationError
-
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import (
     ListAPIView,
 )
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.status import (
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
 )
 from rest_framework.views import APIView
 
+from django_filters import rest_framework as rf_filters
+
+from .authentication import (
+    ProfileExpiringTokenAuthentication,
+)
+from .filters import (
+    UserSearchFilterSet,
+)
 from .models import (
-    ExpiringAuthToken,
     User,
-    UserProfile,
 )
 from .permissions import (
     IsAdminPermission,
@@ -24,46 +29,63 @@ from .permissions import (
 )
 from .serializers import (
     ChangePasswordSerializer,
+    LoginSerializer,
     UserDetailSerializer,
     RegistrationSerializer,
     FullUserDetailSerializer,
     UserProfileSerializer,
 )
 from .utils import (
-    EmailUtil,
+    AuthUtil,
     ActivationTokenUtil,
+    TokenCacheUtil,
+)
+from apps.base.pagination import (
+    KeysetPagination,
+)
+from apps.base.throttling import (
+    AccountTokenBucketThrottle,
+    IPTokenBucketThrottle,
 )
 
 
 class ObtainExpiringAuthTokenView(ObtainAuthToken):
+    serializer_class = LoginSerializer
+    throttle_classes = (IPTokenBucketThrottle, AccountTokenBucketThrottle)
+    throttle_scope = 'login'
+
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data['user']
-
-        if not user.is_active:
-            EmailUtil.send_activation_email(user, raise_exception=False)
+        user = AuthUtil.authenticate(
+            serializer.validated_data['username'],
+            serializer.validated_data['password']
+        )
+        if user is None:
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY:
+                    [AuthUtil.INVALID_CREDENTIALS_MESSAGE]
+            }, code='authorization')
+
+        token_key = AuthUtil.get_token_key(user)
+        if token_key is None:
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        token, created = ExpiringAuthToken.objects.get_or_create(user=user)
-
-        if not created:
-            if token.expired():
-                token.update()
-                token.save()
-
-        return Response({'token': token.key})
+        response = Response({'token': token_key})
+        AuthUtil.merge_guest_cart(request, response, user)
+        return response
 
 
 class RegisterView(APIView):
+    throttle_classes = (IPTokenBucketThrottle, AccountTokenBucketThrottle)
+    throttle_scope = 'register'
+
     def post(self, request, *args, **kwargs):
         serializer = RegistrationSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        user = serializer.save()
-
-        EmailUtil.send_activation_email(user, raise_exception=False)
+        AuthUtil.register(serializer)
 
         return Response(status=HTTP_204_NO_CONTENT)
 
@@ -96,18 +118,17 @@ class DeleteUserView(APIView):
 
 
 class ProfileView(APIView):
+    authentication_classes = (ProfileExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
         return Response(
-            UserProfileSerializer(
-                UserProfile.objects.get(user=request.user)
-            ).data
+            UserProfileSerializer(request.user.user_profile).data
         )
 
     def patch(self, request, *args, **kwargs):
         serializer = UserProfileSerializer(
-            UserProfile.objects.get(user=request.user), data=request.data
+            request.user.user_profile, data=request.data
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -125,23 +146,29 @@ class ChangePasswordView(APIView):
         if not serializer.is_valid():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        if not user.check_password(serializer.data['old_password']):
-            return Response({'error': 'Incorrect old password'},
+        valid, _ = AuthUtil.verify_password(
+            serializer.data['old_password'], user.password
+        )
+        if not valid:
+            return Response({'error': AuthUtil.INCORRECT_OLD_PASSWORD_MESSAGE},
                             status=HTTP_400_BAD_REQUEST)
 
-        try:
-            validate_password(serializer.data['new_password'], user)
-        except ValidationError as e:
-            return Response({'password_validation_errors': e},
+        errors = AuthUtil.get_new_password_errors(
+            user, serializer.data['new_password']
+        )
+        if errors:
+            return Response({'password_validation_errors': errors},
                             status=HTTP_400_BAD_REQUEST)
 
-        user.set_password(serializer.data['new_password'])
-        user.save()
+        AuthUtil.save_password_hash(
+            user, AuthUtil.make_password(serializer.data['new_password'])
+        )
 
         return Response(status=HTTP_204_NO_CONTENT)
 
 
 class UserDetailView(APIView):
+    authentication_classes = (ProfileExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
@@ -149,7 +176,27 @@ class UserDetailView(APIView):
 
 
 class UserListView(ListAPIView):
+    """
+    `?search=<<terms>>` over email, profile names and phone number,
+    `?account_type=`, `?is_active=`, `?is_deleted=` filters;
+    deleted users are left out unless `?is_deleted=` is given
+    """
     permission_classes = (IsModeratorPermission | IsAdminPermission,)
+    filter_backends = (rf_filters.DjangoFilterBackend,)
+    filterset_class = UserSearchFilterSet
 
     queryset = User.objects.all()
     serializer_class = UserDetailSerializer
+    pagination_class = KeysetPagination
+
+
+class TokenCacheStatsView(APIView):
+    permission_classes = (IsAdminPermission,)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the auth token cache counters of the serving worker:
+        `{"local_hits": <<int>>, "shared_hits": <<int>>, "misses": <<int>>,
+        "local_size": <<int>>, "hit_ratio": <<float | null>>}`
+        """
+        return Response(TokenCacheUtil.get_stats())
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'django_filters',
     'mptt',
@@ -101,6 +102,17 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/ref/settings/#caches
+# Must be shared by all the workers (collection versions, category tree,
+# throttling, token cache), e.g. redis://localhost:6379/0; the default
+# locmemcache:// is only fit for a single process
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -125,7 +137,17 @@ USER_ACTIVATION_URI = 'http://localhost:8000/users/activate/'
 # key\/ must be 32 bytes
 USER_ACTIVATION_ENCRYPTION_KEY = env('USER_ACTIVATION_ENCRYPTION_KEY')
 USER_ACTIVATION_EXPIRATION_PERIOD_IN_SECONDS = 1800  # 30 mins
-
+# apps.user.utils.PasswordHashingUtil (async views), None: CPU count
+PASSWORD_HASHING_WORKERS = env.int('PASSWORD_HASHING_WORKERS', default=None)
+# running + queued hashes before answering 503, None: 4 * workers
+PASSWORD_HASHING_MAX_PENDING = env.int('PASSWORD_HASHING_MAX_PENDING',
+                                       default=None)
+
+# e.g. django.core.mail.backends.filebased.EmailBackend in development
+EMAIL_BACKEND = env(
+    'EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend'
+)
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 EMAIL_HOST = 'smtp.mail.ru'
 EMAIL_PORT = '465'
 EMAIL_HOST_USER = env('EMAIL_ADDRESS')
@@ -159,5 +181,14 @@ MEDIA_URL = '/media/'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'apps.user.authentication.ExpiringTokenAuthentication',
-    ]
+    ],
+    # apps.base.throttling.TokenBucketThrottle: "<scope>[_account]"
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '30/m',
+        'login_account': '10/m',
+        'register': '20/h',
+        'register_account': '5/h',
+        'cart_write': '120/m',
+        'cart_write_account': '60/m',
+    },
 }